@@ -0,0 +1,133 @@
+# adr_cache.py - Bounded LRU cache of ADR decisions keyed on quantized link state
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ADRDecisionCache:
+    def __init__(self,
+                 maxsize: int = 4096,
+                 snr_step: float = 0.5,
+                 rssi_step: float = 1.0,
+                 velocity_step: float = 0.5):
+        """
+        LRU cache of ADR decisions for gateways serving many similar links
+
+        The link state (SNR min/max, RSSI min, velocity, current SF/BW/TP) is
+        quantized with the configured step sizes, so nearly identical windows
+        share one decision and the common case becomes a dictionary lookup.
+
+        Args:
+            maxsize (int): Maximum number of cached decisions
+            snr_step (float): Quantization step for SNR values in dB
+            rssi_step (float): Quantization step for RSSI values in dB
+            velocity_step (float): Quantization step for the velocity
+        """
+        self.maxsize = maxsize
+        self.snr_step = snr_step
+        self.rssi_step = rssi_step
+        self.velocity_step = velocity_step
+
+        self.tuning: Tuple = ()
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    @staticmethod
+    def _quantize(value: float, step: float) -> int:
+        return int(round(value / step)) if step > 0 else value
+
+    def key(self,
+            snr_min: float,
+            snr_max: float,
+            rssi_min: float,
+            velocity: float,
+            sf: int,
+            bw: int,
+            tp: float) -> Tuple:
+        """
+        Quantized cache key of a link state
+
+        Returns:
+            Hashable key tuple
+        """
+        return (
+            self._quantize(snr_min, self.snr_step),
+            self._quantize(snr_max, self.snr_step),
+            self._quantize(rssi_min, self.rssi_step),
+            self._quantize(velocity, self.velocity_step),
+            sf,
+            bw,
+            tp,
+        )
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Cached decision for key
+
+        Args:
+            key (Hashable): Key from key()
+
+        Returns:
+            The decision, or None on a miss
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Store a decision, evicting the least recently used one when full
+
+        Only decisions that completed in time should be stored.
+
+        Args:
+            key (Hashable): Key from key()
+            value: The decision
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def set_tuning(self, **constants) -> bool:
+        """
+        Record the ADR tuning constants the cached decisions were made with
+
+        Cached decisions are dropped when any constant changes.
+
+        Args:
+            **constants: Tuning constants such as margin_db, d0 and min_sensi
+
+        Returns:
+            True if the cache was invalidated
+        """
+        tuning = tuple(sorted(constants.items()))
+        if tuning == self.tuning:
+            return False
+        self.tuning = tuning
+        self.invalidate()
+        return True
+
+    def invalidate(self):
+        """
+        Drop all cached decisions
+        """
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """
+        Cache counters
+
+        Returns:
+            Dictionary with size, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
@@ -0,0 +1,416 @@
+# adr_search.py - Parallel grid, random and Bayesian search over ADR tuning constants
+import os
+import json
+import math
+import random
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from adr_benchmark import run_scenario
+from offline_eval import replay_policy
+from sim_channel import SCENARIOS
+
+# Knob -> (low, high, type); margins and sensitivity go to mobile_adr, the
+# window and period to LoRaADRManager
+SEARCH_SPACE: Dict[str, Tuple[float, float, type]] = {
+    'margin_db': (2.0, 10.0, float),
+    'd0': (0.5, 20.0, float),
+    'min_sensi': (-145.0, -125.0, float),
+    'adjust_every': (2, 40, int),
+    'max_history': (5, 80, int),
+}
+
+DEFAULT_GRID: Dict[str, List[float]] = {
+    'margin_db': [3.0, 5.0, 8.0],
+    'd0': [1.0, 5.0],
+    'min_sensi': [-140.0, -137.0, -134.0],
+    'adjust_every': [5, 10, 20],
+    'max_history': [10, 20, 40],
+}
+
+# Simulated scenario name, or a mission returned by offline_eval.load_mission
+Channel = Union[str, Dict]
+
+
+def config_policy(config: Dict[str, float]) -> Dict[str, Dict]:
+    """
+    Split a configuration into LoRaADRManager arguments and mobile_adr tuning
+
+    The upper margin bound follows margin_db at the default 5 dB distance.
+
+    Args:
+        config (dict): Values for some or all of the SEARCH_SPACE knobs
+
+    Returns:
+        Policy dictionary with 'manager_kwargs' and 'tuning'
+    """
+    tuning = {k: config[k] for k in ('margin_db', 'd0', 'min_sensi') if k in config}
+    if 'margin_db' in tuning:
+        tuning['max_margin_db'] = tuning['margin_db'] + 5.0
+    manager_kwargs = {k: int(config[k]) for k in ('adjust_every', 'max_history') if k in config}
+    return {'manager_kwargs': manager_kwargs, 'tuning': tuning}
+
+
+def _channel_id(channel: Channel) -> str:
+    return channel if isinstance(channel, str) else channel['name']
+
+
+def _init_worker():
+    logging.getLogger('lora_adr_manager').setLevel(logging.CRITICAL)
+
+
+def _run_point(config: Dict[str, float], channel: Channel, seed: int, run_kwargs: Dict) -> Dict:
+    policy = config_policy(config)
+    if isinstance(channel, str):
+        return run_scenario(SCENARIOS[channel], seed=seed,
+                            manager_kwargs=policy['manager_kwargs'],
+                            tuning=policy['tuning'], **run_kwargs)
+    return replay_policy(channel, policy, **run_kwargs)
+
+
+def pareto_front(points: Iterable[Dict]) -> List[Dict]:
+    """
+    Points not dominated in (higher goodput, lower energy per delivered byte)
+
+    Args:
+        points (iterable): Evaluated points with goodput_bps and energy_per_byte_j
+
+    Returns:
+        Non-dominated points, sorted by energy per byte
+    """
+    points = list(points)
+    front = []
+    for p in points:
+        dominated = any(
+            q['goodput_bps'] >= p['goodput_bps'] and q['energy_per_byte_j'] <= p['energy_per_byte_j']
+            and (q['goodput_bps'] > p['goodput_bps'] or q['energy_per_byte_j'] < p['energy_per_byte_j'])
+            for q in points)
+        if not dominated:
+            front.append(p)
+    return sorted(front, key=lambda p: p['energy_per_byte_j'])
+
+
+def _cholesky(a: List[List[float]]) -> List[List[float]]:
+    n = len(a)
+    L = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            s = a[i][j] - sum(L[i][k] * L[j][k] for k in range(j))
+            L[i][j] = math.sqrt(max(s, 1e-12)) if i == j else s / L[j][j]
+    return L
+
+
+def _solve_lower(L: List[List[float]], b: List[float]) -> List[float]:
+    x = []
+    for i, row in enumerate(L):
+        x.append((b[i] - sum(row[k] * x[k] for k in range(i))) / row[i])
+    return x
+
+
+def _solve_upper_t(L: List[List[float]], b: List[float]) -> List[float]:
+    # Solves L^T x = b
+    n = len(L)
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (b[i] - sum(L[k][i] * x[k] for k in range(i + 1, n))) / L[i][i]
+    return x
+
+
+class _GaussianProcess:
+    """
+    Minimal Gaussian process regressor with an RBF kernel on the unit cube
+    """
+    def __init__(self, length_scale: float = 0.3, noise: float = 1e-3):
+        self.length_scale = length_scale
+        self.noise = noise
+
+    def _kernel(self, a: Sequence[float], b: Sequence[float]) -> float:
+        d2 = sum((x - y) ** 2 for x, y in zip(a, b))
+        return math.exp(-0.5 * d2 / self.length_scale ** 2)
+
+    def fit(self, xs: List[List[float]], ys: List[float]):
+        self.xs = xs
+        self.mean = sum(ys) / len(ys)
+        self.scale = math.sqrt(sum((y - self.mean) ** 2 for y in ys) / len(ys)) or 1.0
+        targets = [(y - self.mean) / self.scale for y in ys]
+        K = [[self._kernel(a, b) + (self.noise if i == j else 0.0)
+              for j, b in enumerate(xs)] for i, a in enumerate(xs)]
+        self.L = _cholesky(K)
+        self.alpha = _solve_upper_t(self.L, _solve_lower(self.L, targets))
+        return self
+
+    def predict(self, x: Sequence[float]) -> Tuple[float, float]:
+        k = [self._kernel(x, b) for b in self.xs]
+        mu = sum(ki * ai for ki, ai in zip(k, self.alpha))
+        v = _solve_lower(self.L, k)
+        var = max(1.0 - sum(vi * vi for vi in v), 1e-12)
+        return self.mean + self.scale * mu, self.scale * math.sqrt(var)
+
+
+def _expected_improvement(mu: float, sigma: float, best: float) -> float:
+    # For minimisation
+    z = (best - mu) / sigma
+    cdf = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+    pdf = math.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+    return (best - mu) * cdf + sigma * pdf
+
+
+class ADRSearch:
+    def __init__(self,
+                 channels: Optional[List[Channel]] = None,
+                 space: Optional[Dict[str, Tuple[float, float, type]]] = None,
+                 seeds: Sequence[int] = (0,),
+                 max_workers: Optional[int] = None,
+                 cache_file: Optional[str] = None,
+                 **run_kwargs):
+        """
+        Search ADR tuning constants for the goodput/energy trade-off
+
+        Every configuration is run through each channel (and each seed of
+        the simulated ones) in a process pool. Metrics are pooled over the
+        runs: goodput is delivered bits over mission time, energy is joules
+        per delivered byte. Evaluated points are cached in memory and,
+        if cache_file is given, in a JSON file reused by later searches over
+        the same channels.
+
+        Args:
+            channels (list): Scenario names from sim_channel.SCENARIOS and/or
+                missions from offline_eval.load_mission (default all scenarios)
+            space (dict): Knob -> (low, high, type) (default SEARCH_SPACE)
+            seeds (sequence): Channel seeds of the simulated scenarios
+            max_workers (int): Worker processes (default: number of cores)
+            cache_file (str): JSON file persisting evaluated points
+            **run_kwargs: Passed through to adr_benchmark.run_scenario
+        """
+        self.channels = channels or list(SCENARIOS)
+        self.space = space or SEARCH_SPACE
+        self.seeds = list(seeds)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache_file = cache_file
+        self.run_kwargs = run_kwargs
+        self.cache: Dict[str, Dict] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._load_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.save_cache()
+
+    def _signature(self) -> Dict:
+        return {'channels': [_channel_id(c) for c in self.channels],
+                'seeds': self.seeds,
+                'run_kwargs': self.run_kwargs}
+
+    def _load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        with open(self.cache_file) as f:
+            stored = json.load(f)
+        if stored.get('signature') == json.loads(json.dumps(self._signature())):
+            self.cache = stored.get('points', {})
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        with open(self.cache_file, 'w') as f:
+            json.dump({'signature': self._signature(), 'points': self.cache}, f)
+
+    def _normalize(self, config: Dict[str, float]) -> Dict[str, float]:
+        normalized = {}
+        for name, value in config.items():
+            low, high, kind = self.space[name]
+            value = min(max(value, low), high)
+            normalized[name] = int(round(value)) if kind is int else round(float(value), 3)
+        return normalized
+
+    @staticmethod
+    def _key(config: Dict[str, float]) -> str:
+        return json.dumps(config, sort_keys=True)
+
+    def evaluate(self, configs: Iterable[Dict[str, float]]) -> List[Dict]:
+        """
+        Evaluate configurations in parallel, skipping cached ones
+
+        Args:
+            configs (iterable): Configurations to evaluate
+
+        Returns:
+            One point per configuration: config, goodput_bps,
+            energy_per_byte_j and per
+        """
+        configs = [self._normalize(c) for c in configs]
+        pending = {}
+        for config in configs:
+            key = self._key(config)
+            if key not in self.cache and key not in pending:
+                pending[key] = config
+
+        if pending:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 initializer=_init_worker)
+            jobs = {
+                key: [self._pool.submit(_run_point, config, channel, seed, self.run_kwargs)
+                      for channel in self.channels
+                      for seed in (self.seeds if isinstance(channel, str) else [0])]
+                for key, config in pending.items()
+            }
+            for key, futures in jobs.items():
+                self.cache[key] = self._pool_metrics(pending[key], [f.result() for f in futures])
+
+        return [self.cache[self._key(c)] for c in configs]
+
+    @staticmethod
+    def _pool_metrics(config: Dict[str, float], runs: List[Dict]) -> Dict:
+        sent = sum(r['packets_sent'] for r in runs)
+        delivered_bytes = sum(r['delivered_bytes'] for r in runs)
+        elapsed = sum(r['elapsed_s'] for r in runs)
+        energy = sum(r['energy_j'] for r in runs)
+        return {
+            'config': config,
+            'goodput_bps': 8 * delivered_bytes / elapsed if elapsed else 0.0,
+            'energy_per_byte_j': energy / delivered_bytes if delivered_bytes else float('inf'),
+            'per': sum(r['per'] * r['packets_sent'] for r in runs) / sent if sent else 1.0,
+        }
+
+    def grid(self, grid: Optional[Dict[str, List[float]]] = None) -> List[Dict]:
+        """
+        Evaluate the Cartesian product of knob values
+
+        Args:
+            grid (dict): Knob -> list of values (default DEFAULT_GRID)
+
+        Returns:
+            Evaluated points
+        """
+        grid = grid or DEFAULT_GRID
+        names = list(grid)
+        return self.evaluate(dict(zip(names, values))
+                             for values in itertools.product(*(grid[n] for n in names)))
+
+    def _sample(self, rng: random.Random) -> Dict[str, float]:
+        return self._from_unit([rng.random() for _ in self.space])
+
+    def _from_unit(self, x: Sequence[float]) -> Dict[str, float]:
+        return self._normalize({name: low + u * (high - low)
+                                for u, (name, (low, high, _)) in zip(x, self.space.items())})
+
+    def _to_unit(self, config: Dict[str, float]) -> List[float]:
+        return [(config[name] - low) / (high - low) if high > low else 0.0
+                for name, (low, high, _) in self.space.items()]
+
+    def random(self, n: int = 64, seed: int = 0) -> List[Dict]:
+        """
+        Evaluate configurations drawn uniformly from the search space
+
+        Args:
+            n (int): Number of configurations
+            seed (int): Random seed
+
+        Returns:
+            Evaluated points
+        """
+        rng = random.Random(seed)
+        return self.evaluate(self._sample(rng) for _ in range(n))
+
+    def bayesian(self,
+                 n_iter: int = 48,
+                 n_init: int = 12,
+                 batch: Optional[int] = None,
+                 candidates: int = 256,
+                 seed: int = 0) -> List[Dict]:
+        """
+        Multi-objective Bayesian optimisation (ParEGO)
+
+        Each proposal draws a random goodput/energy weight, scalarises the
+        normalised objectives with an augmented Tchebycheff function, fits a
+        Gaussian process to it and picks the random candidate with the
+        highest expected improvement. A batch of proposals with different
+        weights is evaluated in parallel per round, so the search spreads
+        along the Pareto front.
+
+        Args:
+            n_iter (int): Configurations to evaluate after the initial design
+            n_init (int): Random configurations of the initial design
+            batch (int): Proposals per round (default: worker count)
+            candidates (int): Random candidates scored per proposal
+            seed (int): Random seed
+
+        Returns:
+            All evaluated points of this search
+        """
+        rng = random.Random(seed)
+        batch = batch or self.max_workers
+        points = self.evaluate(self._sample(rng) for _ in range(n_init))
+
+        while len(points) < n_init + n_iter:
+            finite = [p for p in points if math.isfinite(p['energy_per_byte_j'])]
+            g_max = max((p['goodput_bps'] for p in points), default=0.0) or 1.0
+            log_e = [math.log(p['energy_per_byte_j']) for p in finite]
+            e_min, e_max = (min(log_e), max(log_e)) if log_e else (0.0, 1.0)
+            e_span = (e_max - e_min) or 1.0
+
+            xs = [self._to_unit(p['config']) for p in points]
+            pool = [[rng.random() for _ in self.space] for _ in range(candidates)]
+            seen = {self._key(p['config']) for p in points}
+            proposals = []
+
+            for _ in range(min(batch, n_init + n_iter - len(points))):
+                w = rng.random()
+                ys = []
+                for p in points:
+                    g = 1 - p['goodput_bps'] / g_max
+                    e = ((math.log(p['energy_per_byte_j']) - e_min) / e_span
+                         if math.isfinite(p['energy_per_byte_j']) else 1.0)
+                    ys.append(max(w * g, (1 - w) * e) + 0.05 * (w * g + (1 - w) * e))
+                gp = _GaussianProcess().fit(xs, ys)
+                best = min(ys)
+
+                scored = sorted(pool, reverse=True,
+                                key=lambda x: _expected_improvement(*gp.predict(x), best))
+                for x in scored:
+                    config = self._from_unit(x)
+                    if self._key(config) not in seen:
+                        seen.add(self._key(config))
+                        proposals.append(config)
+                        break
+
+            if not proposals:
+                break
+            points += self.evaluate(proposals)
+        return points
+
+    def pareto_front(self) -> List[Dict]:
+        """
+        Pareto-optimal points among everything evaluated (including the cache)
+        """
+        return pareto_front(self.cache.values())
+
+
+def print_front(front: List[Dict]):
+    names = list(SEARCH_SPACE)
+    print("".join(f"{n:>14}" for n in names) + f"{'Goodput (bps)':>15}{'mJ/byte':>10}{'PER':>8}")
+    for p in front:
+        values = "".join(f"{p['config'].get(n, ''):>14}" for n in names)
+        print(f"{values}{p['goodput_bps']:>15.1f}{p['energy_per_byte_j'] * 1000:>10.4f}{p['per']:>8.3f}")
+
+
+def main():
+    with ADRSearch(num_packets=300, cache_file='adr_search_cache.json') as search:
+        search.random(n=16)
+        search.bayesian(n_iter=32)
+        print_front(search.pareto_front())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# adr_state.py - Crash-safe ADR state checkpoint in a double-buffered memory-mapped file
+import os
+import mmap
+import struct
+import zlib
+from typing import Dict, List, Optional
+
+STATE_MAGIC = b"ADRS"
+# Slot header: magic, sequence number, payload length, CRC-32 of (seq, length, payload)
+HEADER_FORMAT = '<4sQII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# Payload: current SF, CR, BW, TX power, last known-good SF, CR, BW, TX power,
+# packets since the last adjustment, forward-link losses, history length,
+# then the SNR and RSSI histories
+STATE_FORMAT = '<BBIfBBIfHIB'
+STATE_SIZE = struct.calcsize(STATE_FORMAT)
+
+
+def _power(tp: float):
+    # TX power is usually a whole number of dBm; keep it an int for the radio
+    return int(tp) if tp.is_integer() else tp
+
+
+class ADRStateFile:
+    def __init__(self, path: str, max_history: int = 20, sync: bool = False):
+        """
+        Two checkpoint slots in a small memory-mapped file, written alternately
+
+        Each save goes to the slot not holding the latest state: payload
+        first, header last. The header's CRC covers the sequence number,
+        length and payload, so a save torn by a crash fails the check and
+        load falls back to the other slot. Writes land in the page cache,
+        which survives a process crash; sync=True also flushes them to
+        storage on every save (survives power loss, costs an msync).
+
+        Args:
+            path (str): Checkpoint file (created if missing)
+            max_history (int): Longest SNR/RSSI history to store (at most 255)
+            sync (bool): Flush every save to storage
+        """
+        if not 0 < max_history <= 255:
+            raise ValueError("ADR state history limited to 1-255 samples")
+        self.path = path
+        self.max_history = max_history
+        self.sync = sync
+        self.slot_size = HEADER_SIZE + STATE_SIZE + 8 * max_history
+        size = 2 * self.slot_size
+
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        self._file = open(path, mode)
+        if os.path.getsize(path) < size:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self.seq = 0
+        self._slot = 1
+        self.saves = 0
+
+    def _read_slot(self, slot: int) -> Optional[tuple]:
+        offset = slot * self.slot_size
+        magic, seq, length, crc = struct.unpack_from(HEADER_FORMAT, self._map, offset)
+        if magic != STATE_MAGIC or length > self.slot_size - HEADER_SIZE:
+            return None
+        payload = self._map[offset + HEADER_SIZE:offset + HEADER_SIZE + length]
+        if zlib.crc32(struct.pack('<QI', seq, length) + payload) != crc:
+            return None
+        return seq, payload
+
+    def load(self) -> Optional[Dict]:
+        """
+        Latest intact checkpoint
+
+        Returns:
+            State dictionary as passed to save(), or None if no slot is valid
+        """
+        slots = [(s, self._read_slot(s)) for s in (0, 1)]
+        slots = [(s, r) for s, r in slots if r is not None]
+        if not slots:
+            return None
+        slot, (seq, payload) = max(slots, key=lambda item: item[1][0])
+        self.seq, self._slot = seq, slot
+
+        (sf, cr, bw, tp, good_sf, good_cr, good_bw, good_tp,
+         since_adjust, forward_lost, n) = struct.unpack_from(STATE_FORMAT, payload)
+        history = struct.unpack_from(f'<{2 * n}f', payload, STATE_SIZE)
+        return {
+            'params': (sf, cr, bw, _power(tp)),
+            'last_good_params': (good_sf, good_cr, good_bw, _power(good_tp)),
+            'packets_since_adjust': since_adjust,
+            'forward_lost': forward_lost,
+            'snr_history': list(history[:n]),
+            'rssi_history': list(history[n:]),
+        }
+
+    def save(self,
+             params: tuple,
+             last_good_params: tuple,
+             snr_history: List[float],
+             rssi_history: List[float],
+             packets_since_adjust: int = 0,
+             forward_lost: int = 0):
+        """
+        Write a checkpoint into the older slot
+
+        Args:
+            params (tuple): Current (sf, cr, bw, tx_power)
+            last_good_params (tuple): Last known-good (sf, cr, bw, tx_power)
+            snr_history (list): SNR samples, oldest first
+            rssi_history (list): RSSI samples, oldest first
+            packets_since_adjust (int): Packets since the last ADR adjustment
+            forward_lost (int): Forward-link losses reported by the peer
+        """
+        n = min(len(snr_history), len(rssi_history), self.max_history)
+        snr = snr_history[len(snr_history) - n:]
+        rssi = rssi_history[len(rssi_history) - n:]
+        payload = struct.pack(STATE_FORMAT, *params, *last_good_params,
+                              min(packets_since_adjust, 0xFFFF), forward_lost, n)
+        payload += struct.pack(f'<{2 * n}f', *snr, *rssi)
+
+        self.seq += 1
+        self._slot ^= 1
+        offset = self._slot * self.slot_size
+        crc = zlib.crc32(struct.pack('<QI', self.seq, len(payload)) + payload)
+        self._map[offset + HEADER_SIZE:offset + HEADER_SIZE + len(payload)] = payload
+        struct.pack_into(HEADER_FORMAT, self._map, offset, STATE_MAGIC, self.seq, len(payload), crc)
+        if self.sync:
+            self._map.flush()
+        self.saves += 1
+
+    def close(self):
+        self._map.close()
+        self._file.close()
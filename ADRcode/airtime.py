@@ -0,0 +1,141 @@
+# airtime.py - LoRa time-on-air and transmit energy calculations
+import math
+from typing import Dict
+
+# RadioHead header the adafruit_rfm9x driver prepends to every payload
+RADIOHEAD_HEADER_LEN = 4
+
+# Demodulation SNR floor per spreading factor (SX127x datasheet, dB)
+SNR_FLOOR: Dict[int, float] = {
+    6: -5.0,
+    7: -7.5,
+    8: -10.0,
+    9: -12.5,
+    10: -15.0,
+    11: -17.5,
+    12: -20.0,
+}
+
+# Supply current (mA) of the SX127x/RFM9x at a given output power (dBm)
+# from the datasheet; values in between are interpolated linearly
+TX_CURRENT_MA: Dict[int, float] = {
+    5: 20.0,
+    7: 20.0,
+    13: 29.0,
+    17: 87.0,
+    20: 120.0,
+    23: 120.0,
+}
+
+SUPPLY_VOLTAGE = 3.3
+
+
+def symbol_time(sf: int, bw: int) -> float:
+    """
+    Duration of one LoRa symbol
+
+    Args:
+        sf (int): Spreading Factor (6-12)
+        bw (int): Bandwidth in Hz
+
+    Returns:
+        Symbol duration in seconds
+    """
+    return (2 ** sf) / bw
+
+
+def time_on_air(payload_len: int,
+                sf: int,
+                bw: int,
+                cr: int,
+                preamble_len: int = 8,
+                crc: bool = True,
+                explicit_header: bool = True,
+                header_len: int = RADIOHEAD_HEADER_LEN) -> float:
+    """
+    Time on air of a LoRa packet (Semtech AN1200.13)
+
+    Args:
+        payload_len (int): Application payload length in bytes
+        sf (int): Spreading Factor (6-12)
+        bw (int): Bandwidth in Hz
+        cr (int): Coding Rate (5-8, i.e. 4/5 to 4/8)
+        preamble_len (int): Programmed preamble length in symbols
+        crc (bool): Whether the payload CRC is enabled
+        explicit_header (bool): Whether the explicit LoRa header is used
+        header_len (int): Driver header bytes added in front of the payload
+
+    Returns:
+        Time on air in seconds
+    """
+    t_sym = symbol_time(sf, bw)
+    low_dr_optimize = 1 if t_sym > 0.016 else 0
+
+    pl = payload_len + header_len
+    numerator = 8 * pl - 4 * sf + 28 + 16 * int(crc) - 20 * (0 if explicit_header else 1)
+    denominator = 4 * (sf - 2 * low_dr_optimize)
+    payload_symbols = 8 + max(math.ceil(numerator / denominator) * cr, 0)
+
+    t_preamble = (preamble_len + 4.25) * t_sym
+    return t_preamble + payload_symbols * t_sym
+
+
+def tx_current_ma(tx_power: float) -> float:
+    """
+    Supply current drawn while transmitting at the given power
+
+    Args:
+        tx_power (float): Transmission power in dBm
+
+    Returns:
+        Supply current in mA
+    """
+    levels = sorted(TX_CURRENT_MA)
+    if tx_power <= levels[0]:
+        return TX_CURRENT_MA[levels[0]]
+    if tx_power >= levels[-1]:
+        return TX_CURRENT_MA[levels[-1]]
+
+    for low, high in zip(levels, levels[1:]):
+        if low <= tx_power <= high:
+            frac = (tx_power - low) / (high - low)
+            return TX_CURRENT_MA[low] + frac * (TX_CURRENT_MA[high] - TX_CURRENT_MA[low])
+    return TX_CURRENT_MA[levels[-1]]
+
+
+def tx_energy(payload_len: int,
+              sf: int,
+              bw: int,
+              cr: int,
+              tx_power: float,
+              voltage: float = SUPPLY_VOLTAGE) -> float:
+    """
+    Energy spent by the radio to transmit one packet
+
+    Args:
+        payload_len (int): Application payload length in bytes
+        sf (int): Spreading Factor (6-12)
+        bw (int): Bandwidth in Hz
+        cr (int): Coding Rate (5-8)
+        tx_power (float): Transmission power in dBm
+        voltage (float): Supply voltage in V
+
+    Returns:
+        Energy in joules
+    """
+    toa = time_on_air(payload_len, sf, bw, cr)
+    return voltage * tx_current_ma(tx_power) / 1000.0 * toa
+
+
+def noise_floor(bw: int, noise_figure: float = 6.0) -> float:
+    """
+    Thermal noise floor of the receiver
+
+    Args:
+        bw (int): Bandwidth in Hz
+        noise_figure (float): Receiver noise figure in dB
+
+    Returns:
+        Noise power in dBm
+    """
+    return -174.0 + 10 * math.log10(bw) + noise_figure
@@ -0,0 +1,409 @@
+# arq.py - Sliding-window selective-repeat ARQ with cumulative and selective acks
+import math
+import time
+import random
+import struct
+from typing import Callable, Dict, Iterable, List, Optional
+
+from airtime import time_on_air
+
+# Frames start with a magic byte (0xFA data, 0xFB ack); like the FEC and
+# telemetry magics these never start UTF-8 text.
+# Data: magic, poll id (0 = no ack requested), sequence number, payload.
+# Ack: magic, echoed poll id, next expected sequence number, and a bitmap
+# of the SACK_BITS sequence numbers after it that were received out of order.
+DATA_MAGIC = 0xFA
+ACK_MAGIC = 0xFB
+DATA_HEADER_FORMAT = '>BBH'
+ACK_FORMAT = '>BBHI'
+DATA_HEADER_SIZE = struct.calcsize(DATA_HEADER_FORMAT)
+SACK_BITS = 32
+MAX_FRAME = 252
+MAX_PAYLOAD = MAX_FRAME - DATA_HEADER_SIZE
+SEQ_MOD = 1 << 16
+# Timeouts at the largest RTO before an unanswering receiver is given up on
+MAX_RTO_TIMEOUTS = 8
+
+
+def seq_offset(seq: int, base: int) -> int:
+    """
+    Distance from base to seq modulo the sequence space (negative if seq is older)
+    """
+    offset = (seq - base) % SEQ_MOD
+    return offset - SEQ_MOD if offset >= SEQ_MOD // 2 else offset
+
+
+def encode_ack(poll: int, expected: int, received: Iterable[int]) -> bytes:
+    bitmap = 0
+    for seq in received:
+        offset = seq_offset(seq, expected) - 1
+        if 0 <= offset < SACK_BITS:
+            bitmap |= 1 << offset
+    return struct.pack(ACK_FORMAT, ACK_MAGIC, poll, expected, bitmap)
+
+
+def decode_ack(frame: Optional[bytes]):
+    """
+    Parse an ack frame
+
+    Returns:
+        Tuple of (poll id, next expected sequence, selectively acked sequences),
+        or None if the frame is not an ack
+    """
+    if not frame or len(frame) != struct.calcsize(ACK_FORMAT) or frame[0] != ACK_MAGIC:
+        return None
+    _, poll, expected, bitmap = struct.unpack(ACK_FORMAT, bytes(frame))
+    sacked = [(expected + 1 + i) % SEQ_MOD for i in range(SACK_BITS) if bitmap >> i & 1]
+    return poll, expected, sacked
+
+
+class ARQSender:
+    def __init__(self,
+                 radio,
+                 window: int = 8,
+                 initial_rto: float = 1.0,
+                 min_rto: float = 0.2,
+                 max_rto: float = 60.0,
+                 granularity: float = 0.01,
+                 max_timeouts: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Reliable sender for a half-duplex link
+
+        Frames go out in bursts of up to `window` unacknowledged frames;
+        the last frame of each burst carries a poll id that asks the
+        receiver for an ack. The ack holds the receiver's next expected
+        sequence number plus a bitmap of later frames it already has, so
+        after it arrives every frame of the window it does not cover is
+        known to be lost and only those are sent again. The ack echoes the
+        poll id, which gives unambiguous round-trip samples even for
+        retransmitted polls. The retransmission timeout follows RFC 6298;
+        a timeout doubles it and re-polls with a single frame. The transfer
+        is abandoned only after max_timeouts timeouts in a row without any
+        ack advancing it. The default scales with the backoff: the timeouts
+        that double the RTO from min_rto to max_rto, plus MAX_RTO_TIMEOUTS
+        more at max_rto.
+
+        With window=1 every frame is acked before the next one, i.e. plain
+        stop-and-wait.
+
+        Args:
+            radio: Radio with send(bytes) and receive(timeout=...)
+            window (int): Maximum unacknowledged frames (1-32)
+            initial_rto (float): Retransmission timeout before the first round trip is measured
+            min_rto (float): Lower bound of the retransmission timeout in seconds
+            max_rto (float): Upper bound of the retransmission timeout in seconds
+            granularity (float): Clock granularity G of RFC 6298 in seconds
+            max_timeouts (int): Consecutive timeouts without ack progress before
+                the transfer is abandoned (default: scaled with the backoff)
+            clock (Callable): Monotonic clock (replaceable in simulations)
+        """
+        if not 1 <= window <= SACK_BITS:
+            raise ValueError(f"ARQ window must be 1-{SACK_BITS} frames")
+        self.radio = radio
+        self.window = window
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.granularity = granularity
+        if max_timeouts is None:
+            max_timeouts = math.ceil(math.log2(max_rto / min_rto)) + MAX_RTO_TIMEOUTS
+        self.max_timeouts = max_timeouts
+        self.clock = clock
+
+        self.rto = initial_rto
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.next_seq = 0
+        self._poll = 0
+
+        self.frames_sent = 0
+        self.retransmissions = 0
+        self.timeouts = 0
+        self.rtt_samples = 0
+
+    def _next_poll(self) -> int:
+        self._poll = self._poll % 255 + 1
+        return self._poll
+
+    def _sample_rtt(self, rtt: float):
+        self.rtt_samples += 1
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        rto = self.srtt + max(self.granularity, 4 * self.rttvar)
+        self.rto = min(max(rto, self.min_rto), self.max_rto)
+
+    def _send(self, seq: int, payload: bytes, poll: int = 0):
+        self.radio.send(struct.pack(DATA_HEADER_FORMAT, DATA_MAGIC, poll, seq) + payload)
+        self.frames_sent += 1
+
+    def transfer(self, payloads: Iterable[bytes]) -> Dict[str, float]:
+        """
+        Deliver payloads reliably and in order
+
+        Args:
+            payloads (iterable): Payloads of at most MAX_PAYLOAD bytes
+
+        Returns:
+            Dictionary of transfer statistics; 'complete' is False if the
+            receiver stopped answering
+        """
+        pending = list(payloads)
+        if any(len(p) > MAX_PAYLOAD for p in pending):
+            raise ValueError(f"ARQ payload limited to {MAX_PAYLOAD} bytes")
+        pending.reverse()
+        outstanding: Dict[int, bytes] = {}
+        lost: List[int] = []
+        start = self.clock()
+        delivered_bytes = 0
+        consecutive_timeouts = 0
+        complete = True
+
+        while pending or outstanding:
+            burst = sorted(lost, key=lambda s: seq_offset(s, self.next_seq))
+            self.retransmissions += len(burst)
+            while pending and len(outstanding) < self.window:
+                outstanding[self.next_seq] = pending.pop()
+                burst.append(self.next_seq)
+                self.next_seq = (self.next_seq + 1) % SEQ_MOD
+            if not burst:
+                # Every frame is in flight and the last ack never came: re-poll
+                newest = max(outstanding, key=lambda s: seq_offset(s, self.next_seq))
+                burst = [newest]
+                self.retransmissions += 1
+            lost = []
+
+            for seq in burst[:-1]:
+                self._send(seq, outstanding[seq])
+            poll = self._next_poll()
+            self._send(burst[-1], outstanding[burst[-1]], poll)
+            polled_at = self.clock()
+
+            # Wait for the ack answering this poll; older acks still carry news
+            deadline = polled_at + self.rto
+            answered = False
+            while not answered:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                ack = decode_ack(self.radio.receive(timeout=remaining))
+                if ack is None:
+                    continue
+                echo, expected, sacked = ack
+                for seq in list(outstanding):
+                    if seq_offset(seq, expected) < 0 or seq in sacked:
+                        delivered_bytes += len(outstanding.pop(seq))
+                        consecutive_timeouts = 0
+                if echo == poll:
+                    answered = True
+                    self._sample_rtt(self.clock() - polled_at)
+
+            if answered:
+                consecutive_timeouts = 0
+                lost = list(outstanding)
+            else:
+                self.timeouts += 1
+                consecutive_timeouts += 1
+                self.rto = min(2 * self.rto, self.max_rto)
+                if consecutive_timeouts > self.max_timeouts:
+                    complete = False
+                    break
+
+        elapsed = self.clock() - start
+        return {
+            'complete': complete,
+            'delivered_bytes': delivered_bytes,
+            'elapsed_s': elapsed,
+            'goodput_bps': 8 * delivered_bytes / elapsed if elapsed > 0 else 0.0,
+            'frames_sent': self.frames_sent,
+            'retransmissions': self.retransmissions,
+            'timeouts': self.timeouts,
+            'srtt_s': self.srtt,
+            'rto_s': self.rto,
+        }
+
+
+class ARQReceiver:
+    def __init__(self, radio, clock: Callable[[], float] = time.monotonic):
+        """
+        Receiver side of ARQSender: reorders frames and answers polls
+
+        Args:
+            radio: Radio with send(bytes) and receive(timeout=...)
+            clock (Callable): Monotonic clock (replaceable in simulations)
+        """
+        self.radio = radio
+        self.clock = clock
+        self.expected = 0
+        self._buffer: Dict[int, bytes] = {}
+        self.duplicates = 0
+        self.acks_sent = 0
+        self.first_delivery: Optional[float] = None
+        self.last_delivery: Optional[float] = None
+
+    def handle(self, frame: Optional[bytes]) -> List[bytes]:
+        """
+        Process one received frame, sending an ack if it carries a poll
+
+        Args:
+            frame (bytes): Received frame (non-ARQ frames are ignored)
+
+        Returns:
+            Payloads that became deliverable in order
+        """
+        if not frame or len(frame) < DATA_HEADER_SIZE or frame[0] != DATA_MAGIC:
+            return []
+        _, poll, seq = struct.unpack_from(DATA_HEADER_FORMAT, frame)
+        offset = seq_offset(seq, self.expected)
+
+        delivered = []
+        if offset < 0 or seq in self._buffer or offset > SACK_BITS:
+            self.duplicates += 1
+        else:
+            self._buffer[seq] = bytes(frame[DATA_HEADER_SIZE:])
+            while self.expected in self._buffer:
+                delivered.append(self._buffer.pop(self.expected))
+                self.expected = (self.expected + 1) % SEQ_MOD
+            if delivered:
+                self.last_delivery = self.clock()
+                if self.first_delivery is None:
+                    self.first_delivery = self.last_delivery
+
+        if poll:
+            self.radio.send(encode_ack(poll, self.expected, self._buffer))
+            self.acks_sent += 1
+        return delivered
+
+    def receive(self, count: int, idle_timeout: float = 30.0, linger: float = 1.0) -> List[bytes]:
+        """
+        Receive payloads until `count` have been delivered in order
+
+        After the last payload the receiver keeps answering polls for
+        `linger` seconds of silence, in case its final ack was lost.
+
+        Args:
+            count (int): Payloads to deliver
+            idle_timeout (float): Give up after this long without a frame
+            linger (float): Silence that ends the transfer once complete
+
+        Returns:
+            Delivered payloads in order (fewer than count if the sender went silent)
+        """
+        payloads: List[bytes] = []
+        while len(payloads) < count:
+            frame = self.radio.receive(timeout=idle_timeout)
+            if frame is None:
+                break
+            payloads += self.handle(frame)
+        if len(payloads) >= count:
+            frame = self.radio.receive(timeout=linger)
+            while frame is not None:
+                self.handle(frame)
+                frame = self.radio.receive(timeout=linger)
+        return payloads
+
+
+class SimulatedLink:
+    def __init__(self,
+                 sf: int = 7,
+                 bw: int = 125000,
+                 cr: int = 5,
+                 loss: float = 0.1,
+                 turnaround: float = 0.05,
+                 seed: int = 0):
+        """
+        Half-duplex point-to-point link with independent frame loss
+
+        Time advances by the airtime of every frame. The receiver handles
+        data frames as they arrive; its acks reach the sender after the
+        turnaround time (mode switching and processing) plus their airtime.
+
+        Args:
+            sf (int): Spreading factor
+            bw (int): Bandwidth in Hz
+            cr (int): Coding rate
+            loss (float): Probability that a frame (data or ack) is lost
+            turnaround (float): Receiver processing and RX/TX switching time in seconds
+            seed (int): Random seed
+        """
+        self.sf, self.bw, self.cr = sf, bw, cr
+        self.loss = loss
+        self.turnaround = turnaround
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self._acks: List[tuple] = []
+        self.receiver = ARQReceiver(self, clock=self.clock)
+        self.delivered: List[bytes] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def airtime(self, payload_len: int) -> float:
+        return time_on_air(payload_len, self.sf, self.bw, self.cr)
+
+    def send(self, data: bytes) -> bool:
+        if data[0] == ACK_MAGIC:
+            # Called by the receiver
+            if self.rng.random() >= self.loss:
+                arrival = self.now + self.turnaround + self.airtime(len(data))
+                self._acks.append((arrival, data))
+            return True
+        self.now += self.airtime(len(data))
+        if self.rng.random() >= self.loss:
+            self.delivered += self.receiver.handle(data)
+        return True
+
+    def receive(self, timeout: float = 0.5) -> Optional[bytes]:
+        if self._acks and self._acks[0][0] <= self.now + timeout:
+            arrival, ack = self._acks.pop(0)
+            self.now = max(self.now, arrival)
+            return ack
+        self.now += timeout
+        return None
+
+
+def simulate_transfer(window: int,
+                      num_packets: int = 100,
+                      payload_len: int = 200,
+                      **link_kwargs) -> Dict[str, float]:
+    """
+    Transfer packets over a SimulatedLink and compare with the channel goodput
+
+    Args:
+        window (int): Sender window (1 = stop-and-wait)
+        num_packets (int): Packets to deliver
+        payload_len (int): Payload size in bytes
+        **link_kwargs: Keyword arguments for SimulatedLink
+
+    Returns:
+        Transfer statistics plus 'channel_bps', the payload rate of
+        back-to-back frames on a loss-free link, and 'efficiency', the
+        fraction of it achieved (at most 1)
+    """
+    link = SimulatedLink(**link_kwargs)
+    payloads = [bytes([i % 256]) * payload_len for i in range(num_packets)]
+    result = ARQSender(link, window=window, clock=link.clock).transfer(payloads)
+    if link.delivered != payloads[:len(link.delivered)]:
+        raise AssertionError("ARQ delivered payloads out of order")
+    frame_time = link.airtime(payload_len + DATA_HEADER_SIZE)
+    result['channel_bps'] = 8 * payload_len / frame_time
+    result['efficiency'] = result['goodput_bps'] / result['channel_bps']
+    return result
+
+
+def main():
+    print(f"{'Setting':>12}{'Loss':>6}{'Window':>8}{'Goodput (bps)':>15}{'Efficiency':>12}"
+          f"{'Retx':>6}{'Timeouts':>10}{'SRTT (s)':>10}")
+    for sf, bw in ((7, 500000), (9, 125000), (12, 125000)):
+        for loss in (0.0, 0.1, 0.3):
+            for window in (1, 4, 8, 16):
+                r = simulate_transfer(window, sf=sf, bw=bw, loss=loss)
+                print(f"{f'SF{sf}/{bw // 1000}k':>12}{loss:>6.1f}{window:>8}{r['goodput_bps']:>15.1f}"
+                      f"{r['efficiency']:>12.2f}{r['retransmissions']:>6}{r['timeouts']:>10}"
+                      f"{r['srtt_s']:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# async_logging.py - Queue-based, rate-limited logging that keeps console I/O off the packet loop
+import sys
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import Dict, Optional, Tuple
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue: Optional[queue.Queue] = None
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, rate: float = 1.0, burst: int = 5, max_level: int = logging.INFO):
+        """
+        Token-bucket limit per message template, with suppressed-count summaries
+
+        Records are grouped by logger and unformatted message, so lazy
+        %-style calls such as logger.info("Sent packet %d", n) share one
+        bucket however the arguments vary. Each bucket lets `burst` records
+        through at once and refills at `rate` records per second. The next
+        record let through after a suppression reports how many were
+        dropped. Records above max_level (warnings and errors by default)
+        are never suppressed.
+
+        Args:
+            rate (float): Records per second let through per template
+            burst (int): Records let through back to back before limiting
+            max_level (int): Highest level that is rate-limited
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        # (logger name, template) -> [tokens, last refill time, suppressed]
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        now = time.monotonic()
+        key = (record.name, str(record.msg))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            self.suppressed += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.getMessage()} ({bucket[2]} similar messages suppressed)"
+            record.args = None
+            bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks or formats in the logging thread
+
+    The stock handler merges the message arguments before enqueueing,
+    which is the formatting work this module moves off the packet loop;
+    here the record is queued as is and formatted by the listener. Log
+    arguments must therefore not be mutated after the call (numbers and
+    strings never are). When the queue is full the record is dropped and
+    counted instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(format: str = DEFAULT_FORMAT,
+                  level: int = logging.INFO,
+                  rate: float = 1.0,
+                  burst: int = 5,
+                  queue_size: int = 10000,
+                  stream=None) -> Optional[logging.handlers.QueueListener]:
+    """
+    Route the root logger through a queue to a background writer thread
+
+    Like logging.basicConfig this does nothing if the root logger already
+    has handlers, so each entry point can call it with its own format and
+    the first call wins.
+
+    Args:
+        format (str): Log record format
+        level (int): Root logger level
+        rate (float): Records per second let through per message template
+        burst (int): Records per template let through back to back
+        queue_size (int): Records buffered before new ones are dropped
+        stream: Output stream (default: sys.stderr)
+
+    Returns:
+        The started QueueListener, or None if logging was already configured
+    """
+    global _listener, _queue
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    _queue = queue.Queue(queue_size)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(format))
+    handler = NonBlockingQueueHandler(_queue)
+    handler.addFilter(RateLimitFilter(rate=rate, burst=burst))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(_queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def flush_logging():
+    """
+    Wait until every queued record has been written
+
+    Call before printing directly to the console so the output stays in order.
+    """
+    if _queue is not None and _listener is not None:
+        _queue.join()
+
+
+def stop_logging():
+    """
+    Write the remaining records and stop the writer thread
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
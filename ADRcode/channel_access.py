@@ -0,0 +1,403 @@
+# channel_access.py - Listen-before-talk with CAD or RSSI sensing and randomized exponential backoff
+import math
+import time
+import heapq
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+from airtime import symbol_time, time_on_air
+
+# SX127x registers and flags used for sensing (RFM9x driver does not expose CAD)
+REG_12_IRQ_FLAGS = 0x12
+REG_1B_RSSI_VALUE = 0x1B
+IRQ_CAD_DONE = 0x04
+IRQ_CAD_DETECTED = 0x01
+CAD_MODE = 0b111
+
+
+def cad_detect(radio, timeout: float = 0.1) -> bool:
+    """
+    Run one channel activity detection on an RFM9x
+
+    CAD listens for a LoRa preamble at the current SF/BW for about two
+    symbols and reports whether one was found.
+
+    Args:
+        radio: adafruit_rfm9x.RFM9x instance
+        timeout (float): Maximum time to wait for CadDone in seconds
+
+    Returns:
+        True if activity was detected
+    """
+    radio.idle()
+    radio._write_u8(REG_12_IRQ_FLAGS, 0xFF)
+    radio.operation_mode = CAD_MODE
+    deadline = time.monotonic() + timeout
+    flags = 0
+    while time.monotonic() < deadline:
+        flags = radio._read_u8(REG_12_IRQ_FLAGS)
+        if flags & IRQ_CAD_DONE:
+            break
+    radio._write_u8(REG_12_IRQ_FLAGS, 0xFF)
+    radio.idle()
+    return bool(flags & IRQ_CAD_DETECTED)
+
+
+def instant_rssi(radio, settle: float = 0.001) -> float:
+    """
+    Current (not last-packet) RSSI of an RFM9x in dBm
+
+    Args:
+        radio: adafruit_rfm9x.RFM9x instance
+        settle (float): Time in RX mode before sampling in seconds
+
+    Returns:
+        RSSI in dBm (register 0x1B minus 164 in the low-frequency band, 157 otherwise)
+    """
+    radio.listen()
+    time.sleep(settle)
+    raw = radio._read_u8(REG_1B_RSSI_VALUE)
+    radio.idle()
+    return raw - (164 if radio.low_frequency_mode else 157)
+
+
+class ListenBeforeTalk:
+    def __init__(self,
+                 radio,
+                 method: str = 'cad',
+                 rssi_threshold: float = -100.0,
+                 backoff_unit: float = 0.05,
+                 max_exponent: int = 6,
+                 max_attempts: int = 8,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        """
+        Check the channel before each transmission and back off while it is busy
+
+        After the n-th busy check the sender waits a random time in
+        [0, backoff_unit * 2^min(n, max_exponent)). After max_attempts busy
+        checks it transmits anyway, so a noisy channel cannot block it
+        forever.
+
+        Radios providing cad() / instant_rssi() methods (e.g. simulated
+        ones) are sensed through them; an RFM9x through its registers.
+
+        Args:
+            radio: RFM9x (or simulated) radio
+            method (str): 'cad' or 'rssi'
+            rssi_threshold (float): RSSI above which the channel is busy in dBm
+            backoff_unit (float): Backoff window of the first deferral in seconds
+            max_exponent (int): Largest backoff window exponent
+            max_attempts (int): Busy checks before transmitting anyway
+            sleep (Callable): Sleep function (replaceable in simulations)
+            rng (random.Random): Random source of the backoff
+        """
+        if method not in ('cad', 'rssi'):
+            raise ValueError(f"Unknown channel sensing method: {method}")
+        self.radio = radio
+        self.method = method
+        self.rssi_threshold = rssi_threshold
+        self.backoff_unit = backoff_unit
+        self.max_exponent = max_exponent
+        self.max_attempts = max_attempts
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+        self.transmissions = 0
+        self.deferrals = 0
+        self.forced = 0
+        self.expired = 0
+        self.total_backoff = 0.0
+
+    def sense(self) -> bool:
+        """
+        Whether the channel is busy right now
+        """
+        if self.method == 'cad':
+            cad = getattr(self.radio, 'cad', None)
+            return cad() if cad else cad_detect(self.radio)
+        sample = getattr(self.radio, 'instant_rssi', None)
+        rssi = sample() if sample else instant_rssi(self.radio)
+        return rssi > self.rssi_threshold
+
+    def defer(self, attempt: int) -> Optional[float]:
+        """
+        Record a busy check and draw the backoff before the next one
+
+        Args:
+            attempt (int): Busy checks so far for this packet (0 for the first)
+
+        Returns:
+            Backoff in seconds, or None if the packet should go out anyway
+        """
+        if attempt + 1 >= self.max_attempts:
+            self.forced += 1
+            return None
+        self.deferrals += 1
+        window = self.backoff_unit * 2 ** min(attempt, self.max_exponent)
+        backoff = self.rng.uniform(0.0, window)
+        self.total_backoff += backoff
+        return backoff
+
+    def acquire(self, budget: Optional[float] = None) -> Optional[bool]:
+        """
+        Wait until the channel is clear (or the attempts run out)
+
+        Args:
+            budget (float): Longest total backoff in seconds, e.g. the time
+                left in a transmit slot (default: unlimited)
+
+        Returns:
+            True if the channel was clear, False if transmitting anyway,
+            None if the channel was still busy when the budget ran out
+            (the packet should not be sent)
+        """
+        self.transmissions += 1
+        attempt = 0
+        waited = 0.0
+        while self.sense():
+            backoff = self.defer(attempt)
+            if backoff is None:
+                return False
+            if budget is not None and waited + backoff > budget:
+                # This backoff is never waited out
+                self.total_backoff -= backoff
+                self.expired += 1
+                return None
+            self.sleep(backoff)
+            waited += backoff
+            attempt += 1
+        return True
+
+    def send(self, data: bytes) -> bool:
+        """
+        Listen before talking, then send through the radio
+
+        Args:
+            data (bytes): Packet payload
+
+        Returns:
+            Return value of radio.send
+        """
+        self.acquire()
+        return self.radio.send(data)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'transmissions': self.transmissions,
+            'deferrals': self.deferrals,
+            'forced': self.forced,
+            'expired': self.expired,
+            'mean_backoff_s': self.total_backoff / self.transmissions if self.transmissions else 0.0,
+        }
+
+
+class SharedMedium:
+    def __init__(self,
+                 num_nodes: int,
+                 hidden_probability: float = 0.0,
+                 cad_miss_probability: float = 0.05,
+                 rssi_dbm: float = -95.0,
+                 noise_dbm: float = -117.0,
+                 seed: int = 0):
+        """
+        Simulated shared channel for many transmitters and one gateway
+
+        Every node reaches the gateway. Pairs of nodes hear each other unless
+        they are hidden from one another.
+
+        Args:
+            num_nodes (int): Number of nodes
+            hidden_probability (float): Probability that two nodes cannot hear each other
+            cad_miss_probability (float): Probability that CAD misses an audible packet
+            rssi_dbm (float): Level of an audible transmission at another node
+            noise_dbm (float): Channel noise level
+            seed (int): Random seed
+        """
+        self.rng = random.Random(seed)
+        self.cad_miss_probability = cad_miss_probability
+        self.rssi_dbm = rssi_dbm
+        self.noise_dbm = noise_dbm
+        self.hears = [[True] * num_nodes for _ in range(num_nodes)]
+        for i in range(num_nodes):
+            for j in range(i + 1, num_nodes):
+                self.hears[i][j] = self.hears[j][i] = self.rng.random() >= hidden_probability
+        self.transmissions: List[Tuple[float, float, int]] = []
+        self.finished: List[Tuple[float, float, int]] = []
+
+    def active(self, node: int, t: float, min_age: float = 0.0) -> int:
+        """
+        Transmissions audible at node that are on the air at time t
+
+        Args:
+            node (int): Listening node
+            t (float): Time in seconds
+            min_age (float): Only count transmissions that started at least this long ago
+
+        Returns:
+            Number of transmissions
+        """
+        return sum(1 for start, end, other in self.transmissions
+                   if other != node and start <= t - min_age and t < end and self.hears[node][other])
+
+    def retire(self, before: float):
+        # Transmissions that ended cannot be sensed any more
+        keep = []
+        for tx in self.transmissions:
+            (self.finished if tx[1] < before else keep).append(tx)
+        self.transmissions = keep
+
+    def collisions(self) -> Tuple[int, int]:
+        """
+        Transmissions so far and how many of them overlapped another one
+
+        Returns:
+            Tuple of (transmissions, collided)
+        """
+        txs = sorted(self.finished + self.transmissions)
+        collided = [False] * len(txs)
+        for i, (_, end, _) in enumerate(txs):
+            j = i + 1
+            while j < len(txs) and txs[j][0] < end:
+                collided[i] = collided[j] = True
+                j += 1
+        return len(txs), sum(collided)
+
+
+class MediumRadio:
+    def __init__(self, medium: SharedMedium, node: int, sf: int = 9, bw: int = 125000, cr: int = 5):
+        """
+        Simulated radio of one node on a SharedMedium
+
+        The simulation sets `now` before each call; send only registers the
+        transmission, the caller advances time.
+
+        Args:
+            medium (SharedMedium): Channel shared by all nodes
+            node (int): Node index
+            sf (int): Spreading factor
+            bw (int): Bandwidth in Hz
+            cr (int): Coding rate
+        """
+        self.medium = medium
+        self.node = node
+        self.spreading_factor = sf
+        self.signal_bandwidth = bw
+        self.coding_rate = cr
+        self.now = 0.0
+
+    def cad_duration(self) -> float:
+        # Two symbols plus the 32-chip processing overhead
+        return (2 ** self.spreading_factor + 32) / self.signal_bandwidth + symbol_time(
+            self.spreading_factor, self.signal_bandwidth)
+
+    def cad(self) -> bool:
+        # A preamble is only detectable once CAD has seen it for its full duration
+        busy = self.medium.active(self.node, self.now, min_age=self.cad_duration()) > 0
+        return busy and self.medium.rng.random() >= self.medium.cad_miss_probability
+
+    def instant_rssi(self) -> float:
+        count = self.medium.active(self.node, self.now)
+        power = 10 ** (self.medium.noise_dbm / 10) + count * 10 ** (self.medium.rssi_dbm / 10)
+        return 10 * math.log10(power)
+
+    def airtime(self, payload_len: int) -> float:
+        return time_on_air(payload_len, self.spreading_factor, self.signal_bandwidth, self.coding_rate)
+
+    def send(self, data: bytes) -> bool:
+        self.medium.transmissions.append((self.now, self.now + self.airtime(len(data)), self.node))
+        return True
+
+
+def simulate_access(method: Optional[str],
+                    num_nodes: int = 50,
+                    packet_rate: float = 1 / 30.0,
+                    duration: float = 3600.0,
+                    payload_len: int = 32,
+                    sf: int = 9,
+                    hidden_probability: float = 0.1,
+                    seed: int = 0,
+                    **lbt_kwargs) -> Dict[str, float]:
+    """
+    Compare pure ALOHA (method None) with listen-before-talk on a shared medium
+
+    Each node generates its next packet an exponential time after the
+    previous one went out. Overlapping packets at the gateway are lost
+    (no capture), so collisions are the only loss.
+
+    Args:
+        method (str): None for ALOHA, 'cad' or 'rssi' for listen-before-talk
+        num_nodes (int): Number of nodes
+        packet_rate (float): Packets per second per node
+        duration (float): Simulated time in seconds
+        payload_len (int): Payload size in bytes
+        sf (int): Spreading factor of all nodes
+        hidden_probability (float): Probability that two nodes cannot hear each other
+        seed (int): Random seed
+        **lbt_kwargs: Extra keyword arguments for ListenBeforeTalk
+
+    Returns:
+        Dictionary of access metrics
+    """
+    rng = random.Random(seed)
+    medium = SharedMedium(num_nodes, hidden_probability=hidden_probability, seed=seed)
+    radios = [MediumRadio(medium, n, sf=sf) for n in range(num_nodes)]
+    lbt_kwargs.setdefault('backoff_unit', radios[0].airtime(payload_len))
+    lbts = [ListenBeforeTalk(r, method, rng=random.Random(seed * 7919 + n), **lbt_kwargs)
+            if method else None for n, r in enumerate(radios)]
+    data = bytes(payload_len)
+
+    # Events: (time, node, attempt, time the packet was generated)
+    events = [(rng.expovariate(packet_rate), n, 0, None) for n in range(num_nodes)]
+    heapq.heapify(events)
+    delay = 0.0
+    while events:
+        t, node, attempt, created = heapq.heappop(events)
+        if t >= duration:
+            continue
+        created = t if created is None else created
+        radio, lbt = radios[node], lbts[node]
+        radio.now = t
+        medium.retire(t)
+
+        if lbt is not None:
+            if attempt == 0:
+                lbt.transmissions += 1
+            t += radio.cad_duration() if method == 'cad' else 0.001
+            radio.now = t
+            if lbt.sense():
+                backoff = lbt.defer(attempt)
+                if backoff is not None:
+                    heapq.heappush(events, (t + backoff, node, attempt + 1, created))
+                    continue
+
+        radio.send(data)
+        delay += t - created
+        end = t + radio.airtime(payload_len)
+        heapq.heappush(events, (end + rng.expovariate(packet_rate), node, 0, None))
+
+    sent, collided = medium.collisions()
+    delivered = sent - collided
+    deferrals = sum(l.deferrals for l in lbts if l)
+    return {
+        'method': method or 'aloha',
+        'packets_sent': sent,
+        'per': 1 - delivered / sent if sent else 0.0,
+        'throughput_bps': 8 * payload_len * delivered / duration,
+        'deferrals_per_packet': deferrals / sent if sent else 0.0,
+        'mean_access_delay_s': delay / sent if sent else 0.0,
+    }
+
+
+def main():
+    print(f"{'Nodes':>6}{'Method':>8}{'Sent':>7}{'PER':>8}{'Goodput (bps)':>15}"
+          f"{'Deferrals':>11}{'Delay (s)':>11}")
+    for nodes in (10, 50, 100):
+        for method in (None, 'cad', 'rssi'):
+            r = simulate_access(method, num_nodes=nodes)
+            print(f"{nodes:>6}{r['method']:>8}{r['packets_sent']:>7}{r['per']:>8.3f}"
+                  f"{r['throughput_bps']:>15.1f}{r['deferrals_per_packet']:>11.2f}"
+                  f"{r['mean_access_delay_s']:>11.3f}")
+
+if __name__ == "__main__":
+    main()
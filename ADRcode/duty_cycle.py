@@ -0,0 +1,117 @@
+# duty_cycle.py - Token-bucket transmit scheduler keyed on time on air
+import time
+from typing import Callable, Optional
+
+from airtime import time_on_air
+
+# Longest frame the radio sends: 251-byte payload at SF12, 125 kHz, CR 4/8
+MAX_FRAME_AIRTIME = time_on_air(251, 12, 125000, 8)
+
+
+class DutyCycleScheduler:
+    def __init__(self,
+                 duty_cycle: float = 0.1,
+                 window: float = 3600.0,
+                 burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Pace transmissions so airtime stays within a regional duty cycle
+
+        The bucket holds airtime credit in seconds and starts empty. Every
+        transmission spends its time on air, so the sender can transmit
+        back to back only while credit is available. Credit left in a full
+        bucket could be spent on top of a window's own allowance, so the
+        bucket refills at (duty_cycle * window - burst) / window seconds per
+        second: any `window` seconds then hold at most duty_cycle * window
+        seconds of airtime.
+
+        Args:
+            duty_cycle (float): Allowed fraction of airtime (0.1 = 10 %)
+            window (float): Regulatory averaging window in seconds
+            burst (float): Bucket capacity in seconds of airtime
+                (default: three maximum-size frames, at most half the window's allowance)
+            clock (Callable): Monotonic time source in seconds
+            sleep (Callable): Function used to wait for credit
+        """
+        if not 0 < duty_cycle <= 1:
+            raise ValueError(f"duty_cycle must be in (0, 1], got {duty_cycle}")
+        allowance = duty_cycle * window
+        if burst is None:
+            burst = min(3 * MAX_FRAME_AIRTIME, allowance / 2)
+        if not 0 < burst < allowance:
+            raise ValueError(f"burst must be in (0, {allowance:.3f}) s, got {burst}")
+
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.capacity = burst
+        self.rate = (allowance - burst) / window
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = 0.0
+        self.last_refill = clock()
+        self.total_airtime = 0.0
+        self.total_wait = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def delay(self, airtime: float) -> float:
+        """
+        Time to wait before a packet with the given airtime may be sent
+
+        Args:
+            airtime (float): Time on air of the next packet in seconds
+
+        Returns:
+            Required wait in seconds (0 if the packet may go now)
+        """
+        if airtime > self.capacity:
+            raise ValueError(f"Packet airtime {airtime:.3f} s exceeds bucket capacity "
+                             f"{self.capacity:.3f} s")
+        self._refill()
+        deficit = airtime - self.tokens
+        return max(0.0, deficit / self.rate)
+
+    def next_allowed_time(self, airtime: float) -> float:
+        """
+        Earliest clock time at which a packet with the given airtime may be sent
+
+        Args:
+            airtime (float): Time on air of the next packet in seconds
+
+        Returns:
+            Time on the scheduler's clock
+        """
+        return self.clock() + self.delay(airtime)
+
+    def consume(self, airtime: float):
+        """
+        Spend credit for a packet that is being transmitted
+
+        Args:
+            airtime (float): Time on air of the packet in seconds
+        """
+        self._refill()
+        self.tokens -= airtime
+        self.total_airtime += airtime
+
+    def wait(self, airtime: float) -> float:
+        """
+        Sleep exactly as long as needed, then spend credit for the packet
+
+        Args:
+            airtime (float): Time on air of the packet in seconds
+
+        Returns:
+            Time slept in seconds
+        """
+        wait_time = self.delay(airtime)
+        if wait_time > 0:
+            self.sleep(wait_time)
+            self.total_wait += wait_time
+        self.consume(airtime)
+        return wait_time
@@ -0,0 +1,179 @@
+# energy_ledger.py - Per-packet airtime and energy accounting for ADR missions
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from airtime import SUPPLY_VOLTAGE, time_on_air, tx_current_ma
+
+Setting = Tuple[int, int, int, float]
+
+
+class LedgerTotals:
+    """
+    Running totals for one mission, node or radio setting
+    """
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.airtime = 0.0
+        self.energy = 0.0
+        self.delivered_packets = 0
+        self.delivered_bytes = 0
+        self.undelivered_packets = 0
+
+    def add(self, payload_len: int, airtime: float, energy: float):
+        self.packets += 1
+        self.bytes += payload_len
+        self.airtime += airtime
+        self.energy += energy
+
+    def deliver(self, payload_len: int):
+        self.delivered_packets += 1
+        self.delivered_bytes += payload_len
+
+    def miss(self):
+        self.undelivered_packets += 1
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'airtime_s': self.airtime,
+            'energy_j': self.energy,
+            'delivered_packets': self.delivered_packets,
+            'delivered_bytes': self.delivered_bytes,
+            'undelivered_packets': self.undelivered_packets,
+            'joules_per_delivered_byte': (self.energy / self.delivered_bytes
+                                          if self.delivered_bytes else None),
+        }
+
+
+class EnergyLedger:
+    def __init__(self,
+                 voltage: float = SUPPLY_VOLTAGE,
+                 max_pending: int = 1024):
+        """
+        Ledger turning every transmission into time on air and energy
+
+        Totals are accumulated per mission, per node and per radio setting
+        (SF, BW, CR, TX power). Entries stay pending until the caller confirms
+        delivery, so joules per delivered byte only counts confirmed bytes.
+        When more than max_pending entries are waiting, the oldest is
+        counted as undelivered and its own, late confirmation is ignored.
+
+        Args:
+            voltage (float): Radio supply voltage in V
+            max_pending (int): Maximum number of unconfirmed entries kept
+        """
+        self.voltage = voltage
+        self.max_pending = max_pending
+        self.mission = 'default'
+
+        self.by_mission: Dict[str, LedgerTotals] = {}
+        self.by_node: Dict[str, LedgerTotals] = {}
+        self.by_setting: Dict[Setting, LedgerTotals] = {}
+
+        self._pending: 'OrderedDict[int, Tuple[str, str, Setting, int]]' = OrderedDict()
+        self._next_id = 0
+        self.evicted = 0
+
+    def start_mission(self, name: str):
+        """
+        Attribute subsequent transmissions to a new mission
+
+        Args:
+            name (str): Mission name
+        """
+        self.mission = name
+
+    def record(self,
+               payload_len: int,
+               sf: int,
+               bw: int,
+               cr: int,
+               tx_power: float,
+               node: str = 'local',
+               delivered: Optional[bool] = None) -> int:
+        """
+        Record one transmission
+
+        Args:
+            payload_len (int): Application payload length in bytes
+            sf (int): Spreading Factor
+            bw (int): Bandwidth in Hz
+            cr (int): Coding Rate
+            tx_power (float): Transmission power in dBm
+            node (str): Identifier of the transmitting node
+            delivered (bool): Delivery outcome if already known
+
+        Returns:
+            Entry id to pass to confirm() once delivery is known
+        """
+        airtime = time_on_air(payload_len, sf, bw, cr)
+        energy = self.voltage * tx_current_ma(tx_power) / 1000.0 * airtime
+        setting = (sf, bw, cr, tx_power)
+
+        for totals in self._totals_for(self.mission, node, setting):
+            totals.add(payload_len, airtime, energy)
+
+        entry_id = self._next_id
+        self._next_id += 1
+
+        if delivered is None:
+            self._pending[entry_id] = (self.mission, node, setting, payload_len)
+            if len(self._pending) > self.max_pending:
+                _, oldest = self._pending.popitem(last=False)
+                self._resolve(oldest, False)
+                self.evicted += 1
+        else:
+            self._resolve((self.mission, node, setting, payload_len), delivered)
+
+        return entry_id
+
+    def confirm(self, entry_id: int, delivered: bool = True):
+        """
+        Resolve a pending entry once its delivery outcome is known
+
+        Args:
+            entry_id (int): Id returned by record()
+            delivered (bool): Whether the packet reached its destination
+        """
+        entry = self._pending.pop(entry_id, None)
+        if entry is not None:
+            self._resolve(entry, delivered)
+
+    def _resolve(self, entry: Tuple[str, str, Setting, int], delivered: bool):
+        mission, node, setting, payload_len = entry
+        for totals in self._totals_for(mission, node, setting):
+            if delivered:
+                totals.deliver(payload_len)
+            else:
+                totals.miss()
+
+    def _totals_for(self, mission: str, node: str, setting: Setting):
+        return (
+            self.by_mission.setdefault(mission, LedgerTotals()),
+            self.by_node.setdefault(node, LedgerTotals()),
+            self.by_setting.setdefault(setting, LedgerTotals()),
+        )
+
+    def mission_summary(self, mission: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """
+        Summary of a mission including joules per delivered byte
+
+        Args:
+            mission (str): Mission name (default: current mission)
+
+        Returns:
+            Dictionary of mission totals
+        """
+        totals = self.by_mission.get(mission or self.mission, LedgerTotals())
+        return totals.summary()
+
+    def setting_summaries(self) -> Dict[Setting, Dict[str, Optional[float]]]:
+        """
+        Totals for every (SF, BW, CR, TX power) setting used so far
+
+        Returns:
+            Dictionary mapping setting tuples to their totals
+        """
+        return {setting: totals.summary() for setting, totals in self.by_setting.items()}
@@ -0,0 +1,294 @@
+# fec.py - Systematic Reed-Solomon (Cauchy) erasure coding across packet groups
+import math
+import struct
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Frame header: magic, group id, index in group, data packets, repair packets.
+# 0xFE never starts a UTF-8 text packet, so FEC frames are self-identifying.
+FEC_MAGIC = b"\xfe"
+FEC_HEADER_FORMAT = '>cHBBB'
+FEC_HEADER_SIZE = struct.calcsize(FEC_HEADER_FORMAT)
+MAX_FRAME = 252
+# Repair symbols carry a length byte in front of the padded payload
+MAX_DATA = MAX_FRAME - FEC_HEADER_SIZE - 1
+
+# GF(256) with the primitive polynomial x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _EXP[_i] = _x
+    _LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+
+def gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+
+def gf_inv(a: int) -> int:
+    if a == 0:
+        raise ZeroDivisionError("0 has no inverse in GF(256)")
+    return _EXP[255 - _LOG[a]]
+
+
+# One translation table per coefficient: bytes.translate multiplies a whole
+# buffer by a constant at C speed
+_MUL_TABLES = [bytes(gf_mul(c, v) for v in range(256)) for c in range(256)]
+
+
+def _scale(data: bytes, coefficient: int) -> bytes:
+    return data.translate(_MUL_TABLES[coefficient])
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+def _coefficient(repair: int, data: int, n: int) -> int:
+    # Cauchy matrix 1 / (x_i + y_j) with x_i = n + i and y_j = j: every square
+    # submatrix is invertible, so any n of the n + k frames rebuild the group
+    return gf_inv((n + repair) ^ data)
+
+
+def _symbol(payload: bytes, size: int) -> bytes:
+    return bytes([len(payload)]) + payload + bytes(size - 1 - len(payload))
+
+
+def repair_count(n: int, loss_rate: float, target: float = 1e-3, max_repair: int = 8) -> int:
+    """
+    Smallest number of repair packets that keeps group loss below target
+
+    A group is lost when more than k of its n + k frames are lost; frame
+    losses are taken as independent with the measured loss rate.
+
+    Args:
+        n (int): Data packets per group
+        loss_rate (float): Measured packet loss rate (0-1)
+        target (float): Acceptable probability of an unrecoverable group
+        max_repair (int): Upper bound on repair packets
+
+    Returns:
+        Number of repair packets k
+    """
+    p = min(max(loss_rate, 0.0), 1.0)
+    if p == 0.0:
+        return 0
+    for k in range(max_repair + 1):
+        total = n + k
+        recoverable = sum(math.comb(total, i) * p ** i * (1 - p) ** (total - i)
+                          for i in range(k + 1))
+        if 1 - recoverable <= target:
+            return k
+    return max_repair
+
+
+class FECEncoder:
+    def __init__(self,
+                 group_size: int = 8,
+                 min_repair: int = 1,
+                 max_repair: int = 8,
+                 target: float = 1e-3,
+                 alpha: float = 0.3):
+        """
+        Transmitter side: frames data packets and appends repair packets per group
+
+        The number of repair packets per group follows a smoothed estimate
+        of the forward loss rate, usually fed from the receiver's feedback.
+
+        Args:
+            group_size (int): Data packets per group (n)
+            min_repair (int): Lower bound on repair packets per group
+            max_repair (int): Upper bound on repair packets per group
+            target (float): Acceptable probability of an unrecoverable group
+            alpha (float): Smoothing factor of the loss estimate (0-1)
+        """
+        if not 1 <= group_size or group_size + max_repair > 255:
+            raise ValueError("FEC group must hold 1-255 frames in total")
+        self.group_size = group_size
+        self.min_repair = min_repair
+        self.max_repair = max_repair
+        self.target = target
+        self.alpha = alpha
+
+        self.loss_rate = 0.0
+        self.repair = min_repair
+        self.group_id = 0
+        self._pending: List[bytes] = []
+        self.repair_sent = 0
+
+    def update_loss(self, lost: int, total: int):
+        """
+        Fold a loss measurement into the estimate and retune redundancy
+
+        Args:
+            lost (int): Packets lost
+            total (int): Packets sent in the same span
+        """
+        if total <= 0:
+            return
+        self.loss_rate = self.alpha * (lost / total) + (1 - self.alpha) * self.loss_rate
+        k = repair_count(self.group_size, self.loss_rate, self.target, self.max_repair)
+        self.repair = max(self.min_repair, k)
+
+    def _header(self, index: int, n: int, k: int) -> bytes:
+        return struct.pack(FEC_HEADER_FORMAT, FEC_MAGIC, self.group_id, index, n, k)
+
+    def add(self, payload: bytes) -> List[bytes]:
+        """
+        Frame one data packet
+
+        Args:
+            payload (bytes): Data packet (at most MAX_DATA bytes)
+
+        Returns:
+            Frames to send: the data frame, followed by the group's repair
+            frames when this packet completes a group
+        """
+        if len(payload) > MAX_DATA:
+            raise ValueError(f"FEC payload limited to {MAX_DATA} bytes")
+        frames = [self._header(len(self._pending), self.group_size, self.repair) + payload]
+        self._pending.append(payload)
+        if len(self._pending) == self.group_size:
+            frames += self.flush()
+        return frames
+
+    def flush(self) -> List[bytes]:
+        """
+        Repair frames for the current (possibly partial) group, starting a new one
+
+        Returns:
+            Repair frames; their header holds the actual number of data packets
+        """
+        data = self._pending
+        n, k = len(data), self.repair
+        frames = []
+        if n and k:
+            size = 1 + max(len(d) for d in data)
+            symbols = [_symbol(d, size) for d in data]
+            for i in range(k):
+                repair = bytes(size)
+                for j, symbol in enumerate(symbols):
+                    repair = _xor(repair, _scale(symbol, _coefficient(i, j, n)))
+                frames.append(self._header(n + i, n, k) + repair)
+            self.repair_sent += k
+
+        self._pending = []
+        self.group_id = (self.group_id + 1) & 0xFFFF
+        return frames
+
+
+class _Group:
+    def __init__(self):
+        self.n: Optional[int] = None
+        self.data: Dict[int, bytes] = {}
+        self.repair: Dict[int, bytes] = {}
+        self.complete = False
+
+
+class FECDecoder:
+    def __init__(self, max_groups: int = 16):
+        """
+        Receiver side: passes data frames through and rebuilds lost ones
+
+        Args:
+            max_groups (int): Groups kept open for late repair frames
+        """
+        self.max_groups = max_groups
+        self._groups: "OrderedDict[int, _Group]" = OrderedDict()
+        self.recovered = 0
+        self.unrecoverable = 0
+
+    def _group(self, group_id: int) -> _Group:
+        group = self._groups.get(group_id)
+        if group is None:
+            group = self._groups[group_id] = _Group()
+            while len(self._groups) > self.max_groups:
+                _, old = self._groups.popitem(last=False)
+                if old.n is not None and not old.complete:
+                    self.unrecoverable += old.n - len(old.data)
+        return group
+
+    def add(self, frame: bytes) -> List[Tuple[bytes, bool]]:
+        """
+        Process one received FEC frame
+
+        Args:
+            frame (bytes): Frame starting with FEC_MAGIC (bytes or memoryview)
+
+        Returns:
+            List of (payload, recovered) for data newly available from this
+            frame: the frame's own payload, or payloads rebuilt from repair
+        """
+        if len(frame) < FEC_HEADER_SIZE or bytes(frame[:1]) != FEC_MAGIC:
+            return []
+        _, group_id, index, n, _ = struct.unpack_from(FEC_HEADER_FORMAT, frame)
+        body = bytes(frame[FEC_HEADER_SIZE:])
+        group = self._group(group_id)
+
+        if index >= n:
+            # Repair frames carry the true size of a flushed partial group
+            group.n = n
+            group.repair[index - n] = body
+            return self._recover(group)
+
+        if index in group.data or group.complete:
+            return []
+        group.data[index] = body
+        if group.n is not None and len(group.data) == group.n:
+            group.complete = True
+        # Repair frames may have arrived before enough data to use them
+        return [(body, False)] + (self._recover(group) if group.repair else [])
+
+    def _recover(self, group: _Group) -> List[Tuple[bytes, bool]]:
+        n = group.n
+        missing = [j for j in range(n) if j not in group.data]
+        if group.complete or not missing:
+            group.complete = True
+            return []
+        if len(missing) > len(group.repair):
+            return []
+
+        size = len(next(iter(group.repair.values())))
+        rows = sorted(group.repair)[:len(missing)]
+
+        # Remove the known data from each repair symbol, leaving a square
+        # Cauchy system in the missing symbols
+        rhs = []
+        for i in rows:
+            value = group.repair[i]
+            for j, payload in group.data.items():
+                value = _xor(value, _scale(_symbol(payload, size), _coefficient(i, j, n)))
+            rhs.append(value)
+        matrix = [[_coefficient(i, j, n) for j in missing] for i in rows]
+
+        # Gauss-Jordan elimination over GF(256)
+        m = len(missing)
+        for col in range(m):
+            pivot = next(r for r in range(col, m) if matrix[r][col])
+            matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+            rhs[col], rhs[pivot] = rhs[pivot], rhs[col]
+            inv = gf_inv(matrix[col][col])
+            matrix[col] = [gf_mul(inv, v) for v in matrix[col]]
+            rhs[col] = _scale(rhs[col], inv)
+            for r in range(m):
+                factor = matrix[r][col]
+                if r != col and factor:
+                    matrix[r] = [v ^ gf_mul(factor, p) for v, p in zip(matrix[r], matrix[col])]
+                    rhs[r] = _xor(rhs[r], _scale(rhs[col], factor))
+
+        recovered = []
+        for j, symbol in zip(missing, rhs):
+            payload = symbol[1:1 + symbol[0]]
+            group.data[j] = payload
+            recovered.append((payload, True))
+        group.complete = True
+        self.recovered += len(recovered)
+        return recovered
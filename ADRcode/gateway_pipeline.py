@@ -0,0 +1,334 @@
+# gateway_pipeline.py - Multi-process gateway: radio reader, ADR workers and CSV writer
+import os
+import csv
+import time
+import queue
+import signal
+import struct
+import logging
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+# Slot layout: payload length, reception time, SNR, RSSI, payload bytes
+SLOT_HEADER_FORMAT = '<Hdff'
+SLOT_HEADER_SIZE = struct.calcsize(SLOT_HEADER_FORMAT)
+MAX_PAYLOAD = 252
+SLOT_SIZE = SLOT_HEADER_SIZE + MAX_PAYLOAD
+
+CSV_FIELDS = [
+    'Timestamp', 'Node', 'Packet Number', 'SF', 'CR', 'Bandwidth',
+    'TX Power', 'SNR', 'RSSI', 'Packet Data'
+]
+
+
+class SharedPacketRing:
+    def __init__(self, slots: int = 256, name: Optional[str] = None, ctx=None):
+        """
+        Single-producer/single-consumer ring of raw frames in shared memory
+
+        Frames and their metadata are written into fixed-size slots, so the
+        producer never pickles or allocates per packet. Two semaphores count
+        free and filled slots; the producer never waits on a full ring and
+        drops the frame instead, keeping the radio loop tight.
+
+        Args:
+            slots (int): Number of frame slots
+            name (str): Existing shared memory block to attach to
+            ctx: multiprocessing context used to create the semaphores
+        """
+        ctx = ctx or mp.get_context()
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None,
+                                              size=slots * SLOT_SIZE)
+        self.free = ctx.Semaphore(slots)
+        self.filled = ctx.Semaphore(0)
+        self.dropped = ctx.Value('L', 0)
+        self._head = 0
+        self._tail = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['shm'] = self.shm.name
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=state['shm'])
+
+    def push(self, payload: bytes, rx_time: float, snr: float, rssi: float) -> bool:
+        """
+        Copy a frame into the next free slot (producer side)
+
+        Returns:
+            False if the ring was full and the frame was dropped
+        """
+        if not self.free.acquire(block=False):
+            with self.dropped.get_lock():
+                self.dropped.value += 1
+            return False
+
+        length = min(len(payload), MAX_PAYLOAD)
+        offset = (self._head % self.slots) * SLOT_SIZE
+        struct.pack_into(SLOT_HEADER_FORMAT, self.shm.buf, offset, length, rx_time, snr, rssi)
+        start = offset + SLOT_HEADER_SIZE
+        self.shm.buf[start:start + length] = payload[:length]
+        self._head += 1
+        self.filled.release()
+        return True
+
+    def pop(self, timeout: Optional[float] = None) -> Optional[tuple]:
+        """
+        Take the oldest frame out of the ring (consumer side)
+
+        Args:
+            timeout (float): Seconds to wait for a frame
+
+        Returns:
+            Tuple of (payload, rx_time, snr, rssi), or None on timeout
+        """
+        if not self.filled.acquire(timeout=timeout):
+            return None
+        offset = (self._tail % self.slots) * SLOT_SIZE
+        length, rx_time, snr, rssi = struct.unpack_from(SLOT_HEADER_FORMAT, self.shm.buf, offset)
+        start = offset + SLOT_HEADER_SIZE
+        payload = bytes(self.shm.buf[start:start + length])
+        self._tail += 1
+        self.free.release()
+        return payload, rx_time, snr, rssi
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class MetricsRadio:
+    """
+    Stand-in radio for per-node ADR state kept away from the hardware
+
+    The manager reads last_snr/last_rssi from it; the caller sets them, e.g.
+    from the frame metadata captured by the reader process.
+    """
+    def __init__(self):
+        self.spreading_factor = 7
+        self.coding_rate = 5
+        self.signal_bandwidth = 125000
+        self.tx_power = 13
+        self.last_snr = 0.0
+        self.last_rssi = 0.0
+
+    def send(self, data: bytes) -> bool:
+        return True
+
+
+def default_node_key(payload: bytes) -> str:
+    """
+    Node identifier of a frame: the text before the first '|'
+
+    Frames are routed to workers by this key, and all frames of one node
+    go to the same worker. The repo's own transmitters all start their
+    frames with "CubeSat|", so their traffic is a single node handled by
+    a single worker; more workers only help when several nodes with
+    distinct identifiers share the gateway.
+
+    Args:
+        payload (bytes): Raw frame
+
+    Returns:
+        Node identifier
+    """
+    return payload.split(b"|", 1)[0].decode("utf-8", errors="replace")
+
+
+def _ignore_interrupt():
+    # Ctrl-C reaches the whole process group; children stop through the
+    # stop event and the writer's None sentinel so nothing queued is lost
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _reader(radio_factory: Callable, rings: List[SharedPacketRing], stop,
+            node_key: Callable[[bytes], str], receive_timeout: float):
+    _ignore_interrupt()
+    radio = radio_factory()
+    while not stop.is_set():
+        packet = radio.receive(timeout=receive_timeout)
+        if not packet:
+            continue
+        rx_time = time.time()
+        payload = bytes(packet)
+        ring = rings[hash(node_key(payload)) % len(rings)]
+        ring.push(payload, rx_time, radio.last_snr, radio.last_rssi)
+
+
+def _worker(ring: SharedPacketRing, results, stop,
+            node_key: Callable[[bytes], str], manager_kwargs: Dict):
+    _ignore_interrupt()
+    # Import here so the reader process never loads the ADR stack
+    from lora_adr_manager import LoRaADRManager
+
+    logging.getLogger('lora_adr_manager').setLevel(logging.WARNING)
+    links: Dict[str, LoRaADRManager] = {}
+    counts: Dict[str, int] = {}
+
+    while True:
+        frame = ring.pop(timeout=0.2)
+        if frame is None:
+            if stop.is_set():
+                break
+            continue
+
+        payload, rx_time, snr, rssi = frame
+        text = payload.decode("utf-8", errors="replace")
+        node = node_key(payload)
+
+        manager = links.get(node)
+        if manager is None:
+            manager = LoRaADRManager(radio=MetricsRadio(), node_id=node, **manager_kwargs)
+            links[node] = manager
+            counts[node] = 0
+
+        manager.rfm9x.last_snr = snr
+        manager.rfm9x.last_rssi = rssi
+        manager.update_link_quality(payload, timestamp=rx_time)
+        counts[node] += 1
+        if manager.should_adjust():
+            sf, cr, bw, tp = manager.adjust_parameters()
+            manager.apply_parameters(sf, cr, bw, tp)
+
+        results.put({
+            'Timestamp': int(rx_time * 1000),
+            'Node': node,
+            'Packet Number': counts[node],
+            'SF': manager.current_sf,
+            'CR': manager.current_cr,
+            'Bandwidth': manager.current_bw,
+            'TX Power': manager.current_tx_power,
+            'SNR': snr,
+            'RSSI': rssi,
+            'Packet Data': text,
+        })
+    ring.close()
+
+
+def _writer(results, output_file: str, flush_every: int):
+    _ignore_interrupt()
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        pending = 0
+        while True:
+            try:
+                row = results.get(timeout=1.0)
+            except queue.Empty:
+                csvfile.flush()
+                continue
+            if row is None:
+                break
+            writer.writerow(row)
+            pending += 1
+            if pending >= flush_every:
+                csvfile.flush()
+                pending = 0
+
+
+class GatewayPipeline:
+    def __init__(self,
+                 radio_factory: Callable,
+                 output_file: str = 'gateway_results.csv',
+                 num_workers: Optional[int] = None,
+                 ring_slots: int = 256,
+                 receive_timeout: float = 0.5,
+                 node_key: Callable[[bytes], str] = default_node_key,
+                 manager_kwargs: Optional[Dict] = None,
+                 flush_every: int = 50):
+        """
+        Staged gateway: radio reader -> shared-memory rings -> ADR workers -> CSV writer
+
+        The reader process only polls the radio and copies frames into a
+        ring. Each worker owns one ring; frames are routed by node so every
+        link's ADR state lives in exactly one worker, which also means a
+        single node never uses more than one worker. Workers decode the
+        payload, update ADR state and pass result rows to a writer process.
+        The child processes ignore SIGINT; stop() shuts them down and drains
+        the rings and the result queue.
+
+        Args:
+            radio_factory (Callable): Picklable callable creating the radio in the reader
+            output_file (str): CSV file written by the writer process
+            num_workers (int): Number of ADR worker processes (default: cores - 2)
+            ring_slots (int): Frame slots per worker ring
+            receive_timeout (float): Radio receive timeout of the reader in seconds
+            node_key (Callable): Maps a raw frame to its node identifier
+            manager_kwargs (dict): Extra keyword arguments for each LoRaADRManager
+            flush_every (int): Rows written between file flushes
+        """
+        self.ctx = mp.get_context('spawn')
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) - 2)
+        self.rings = [SharedPacketRing(ring_slots, ctx=self.ctx) for _ in range(self.num_workers)]
+        self.results = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+
+        self.reader = self.ctx.Process(
+            target=_reader, name='lora-reader',
+            args=(radio_factory, self.rings, self.stop_event, node_key, receive_timeout))
+        self.workers = [
+            self.ctx.Process(target=_worker, name=f'lora-worker-{i}',
+                             args=(ring, self.results, self.stop_event, node_key,
+                                   manager_kwargs or {}))
+            for i, ring in enumerate(self.rings)
+        ]
+        self.writer = self.ctx.Process(target=_writer, name='lora-writer',
+                                       args=(self.results, output_file, flush_every))
+
+    def start(self):
+        self.writer.start()
+        for worker in self.workers:
+            worker.start()
+        self.reader.start()
+
+    def stop(self):
+        """
+        Stop reading, let the workers drain their rings, then close the writer
+        """
+        self.stop_event.set()
+        self.reader.join()
+        for worker in self.workers:
+            worker.join()
+        self.results.put(None)
+        self.writer.join()
+
+        for ring in self.rings:
+            ring.close()
+            ring.unlink()
+
+    def dropped_frames(self) -> int:
+        """
+        Frames dropped because a worker ring was full
+        """
+        return sum(ring.dropped.value for ring in self.rings)
+
+
+def main():
+    from functools import partial
+    from lora_adr_manager import create_radio
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - LoRaGW - %(levelname)s - %(message)s')
+    logger = logging.getLogger(__name__)
+
+    pipeline = GatewayPipeline(radio_factory=partial(create_radio, 433.0))
+    pipeline.start()
+    logger.info(f"Gateway pipeline running with {pipeline.num_workers} workers")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        logger.info(f"Dropped frames (ring full): {pipeline.dropped_frames()}")
+
+if __name__ == "__main__":
+    main()
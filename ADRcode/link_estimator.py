@@ -0,0 +1,96 @@
+# link_estimator.py - Incremental level/trend estimation of link metrics
+from typing import Dict, Optional
+
+
+class TrendEstimator:
+    def __init__(self, alpha: float = 0.3, beta: float = 0.1):
+        """
+        Double exponential smoothing (Holt) of one link metric
+
+        Tracks a smoothed level and a slope per packet with O(1) work per
+        update, so the metric can be extrapolated a few packets ahead.
+
+        Args:
+            alpha (float): Smoothing factor of the level (0-1)
+            beta (float): Smoothing factor of the slope (0-1)
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.level: Optional[float] = None
+        self.slope = 0.0
+        self.samples = 0
+
+    def update(self, value: float) -> float:
+        """
+        Add one sample
+
+        Args:
+            value (float): New metric sample
+
+        Returns:
+            Updated level
+        """
+        if self.level is None:
+            self.level = value
+        else:
+            predicted = self.level + self.slope
+            level = self.alpha * value + (1 - self.alpha) * predicted
+            self.slope = self.beta * (level - self.level) + (1 - self.beta) * self.slope
+            self.level = level
+        self.samples += 1
+        return self.level
+
+    def forecast(self, steps: float = 1.0) -> Optional[float]:
+        """
+        Extrapolate the metric
+
+        Args:
+            steps (float): Number of packets ahead
+
+        Returns:
+            Forecast value, or None before the first sample
+        """
+        if self.level is None:
+            return None
+        return self.level + self.slope * steps
+
+    def reset(self):
+        self.level = None
+        self.slope = 0.0
+        self.samples = 0
+
+
+class LinkTrendEstimator:
+    def __init__(self, alpha: float = 0.3, beta: float = 0.1):
+        """
+        SNR and RSSI trend estimators for one link
+
+        Args:
+            alpha (float): Smoothing factor of the levels
+            beta (float): Smoothing factor of the slopes
+        """
+        self.snr = TrendEstimator(alpha, beta)
+        self.rssi = TrendEstimator(alpha, beta)
+
+    def update(self, snr: float, rssi: float):
+        self.snr.update(snr)
+        self.rssi.update(rssi)
+
+    def forecast(self, steps: float = 1.0) -> Dict[str, Optional[float]]:
+        """
+        Forecast SNR and RSSI a number of packets ahead
+
+        Args:
+            steps (float): Number of packets ahead
+
+        Returns:
+            Dictionary with 'snr' and 'rssi' forecasts
+        """
+        return {
+            'snr': self.snr.forecast(steps),
+            'rssi': self.rssi.forecast(steps),
+        }
+
+    def reset(self):
+        self.snr.reset()
+        self.rssi.reset()
@@ -0,0 +1,151 @@
+# link_feedback.py - Compact forward-link metric summaries piggybacked on acks
+import struct
+from typing import Dict, Optional, Tuple
+
+# version, first seq, last seq, lost, SNR min/max (0.25 dB), -RSSI min/max (1 dB)
+FEEDBACK_FORMAT = '>BHHBbbBB'
+FEEDBACK_SIZE = struct.calcsize(FEEDBACK_FORMAT)
+FEEDBACK_VERSION = 1
+SNR_STEP = 0.25
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(high, value))
+
+
+def encode_feedback(summary: Dict[str, float]) -> bytes:
+    """
+    Pack a forward-link summary into FEEDBACK_SIZE (10) bytes
+
+    Args:
+        summary (dict): Keys seq_first, seq_last, lost, snr_min, snr_max,
+            rssi_min, rssi_max
+
+    Returns:
+        Packed feedback bytes
+    """
+    return struct.pack(
+        FEEDBACK_FORMAT,
+        FEEDBACK_VERSION,
+        summary['seq_first'] & 0xFFFF,
+        summary['seq_last'] & 0xFFFF,
+        _clamp(summary['lost'], 0, 255),
+        _clamp(round(summary['snr_min'] / SNR_STEP), -128, 127),
+        _clamp(round(summary['snr_max'] / SNR_STEP), -128, 127),
+        _clamp(round(-summary['rssi_min']), 0, 255),
+        _clamp(round(-summary['rssi_max']), 0, 255),
+    )
+
+
+def decode_feedback(data: bytes) -> Optional[Dict[str, float]]:
+    """
+    Unpack feedback produced by encode_feedback
+
+    Args:
+        data (bytes): Feedback bytes
+
+    Returns:
+        Summary dictionary, or None if the bytes are not valid feedback
+    """
+    if len(data) != FEEDBACK_SIZE:
+        return None
+    version, seq_first, seq_last, lost, snr_min, snr_max, rssi_min, rssi_max = \
+        struct.unpack(FEEDBACK_FORMAT, data)
+    if version != FEEDBACK_VERSION:
+        return None
+    return {
+        'seq_first': seq_first,
+        'seq_last': seq_last,
+        'lost': lost,
+        'snr_min': snr_min * SNR_STEP,
+        'snr_max': snr_max * SNR_STEP,
+        'rssi_min': -rssi_min,
+        'rssi_max': -rssi_max,
+    }
+
+
+def split_ack(ack: Optional[bytes], prefix: bytes = b"READY") -> Tuple[bool, Optional[Dict[str, float]]]:
+    """
+    Check an acknowledgment and extract any piggybacked feedback
+
+    Args:
+        ack (bytes): Received packet
+        prefix (bytes): Expected acknowledgment prefix
+
+    Returns:
+        Tuple of (is_ack, feedback summary or None)
+    """
+    if not ack or not ack.startswith(prefix):
+        return False, None
+    return True, decode_feedback(bytes(ack[len(prefix):]))
+
+
+class ForwardLinkWindow:
+    def __init__(self):
+        """
+        Receiver-side accumulator of forward-link metrics between acks
+
+        Losses are counted from gaps in the transmitter's sequence numbers,
+        including packets lost between the previous window and this one.
+        """
+        self._prev_last: Optional[int] = None
+        self.reset()
+
+    def reset(self):
+        if getattr(self, 'seq_last', None) is not None:
+            self._prev_last = self.seq_last
+        self.seq_first: Optional[int] = None
+        self.seq_last: Optional[int] = None
+        self.received = 0
+        self.snr_min = self.snr_max = None
+        self.rssi_min = self.rssi_max = None
+
+    def record(self, seq: int, snr: float, rssi: float):
+        """
+        Add one received data packet
+
+        Args:
+            seq (int): Transmitter sequence number
+            snr (float): SNR of the packet
+            rssi (float): RSSI of the packet
+        """
+        if self.seq_first is None:
+            follows_previous = self._prev_last is not None and seq > self._prev_last
+            self.seq_first = self._prev_last + 1 if follows_previous else seq
+        self.seq_last = seq
+        self.received += 1
+        self.snr_min = snr if self.snr_min is None else min(self.snr_min, snr)
+        self.snr_max = snr if self.snr_max is None else max(self.snr_max, snr)
+        self.rssi_min = rssi if self.rssi_min is None else min(self.rssi_min, rssi)
+        self.rssi_max = rssi if self.rssi_max is None else max(self.rssi_max, rssi)
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        """
+        Summary of the window, or None if nothing was received
+
+        Returns:
+            Dictionary accepted by encode_feedback
+        """
+        if self.seq_first is None:
+            return None
+        expected = self.seq_last - self.seq_first + 1
+        return {
+            'seq_first': self.seq_first,
+            'seq_last': self.seq_last,
+            'lost': max(0, expected - self.received),
+            'snr_min': self.snr_min,
+            'snr_max': self.snr_max,
+            'rssi_min': self.rssi_min,
+            'rssi_max': self.rssi_max,
+        }
+
+    def encode_and_reset(self) -> bytes:
+        """
+        Encoded feedback for the next ack, starting a new window
+
+        Returns:
+            Feedback bytes (empty if nothing was received)
+        """
+        summary = self.summary()
+        self.reset()
+        return encode_feedback(summary) if summary else b""
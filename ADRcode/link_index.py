@@ -0,0 +1,211 @@
+# link_index.py - Persistent grid index of past link observations for ADR warm start
+import os
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+# Reference bandwidth of the stored SNR (noise floor scales with bandwidth)
+REFERENCE_BW = 125000
+
+Position = Tuple[float, ...]
+# Stored observation: (position, RSSI at 0 dBm TX power, SNR at 0 dBm and
+# REFERENCE_BW, time recorded)
+Observation = Tuple[Position, float, float, float]
+
+
+class LinkIndex:
+    def __init__(self,
+                 path: Optional[str] = None,
+                 cell_size: Union[float, Sequence[float]] = 1.0,
+                 max_per_cell: int = 32,
+                 k: int = 8):
+        """
+        Past SNR/RSSI observations bucketed on a grid, with nearest-neighbour lookup
+
+        Positions are tuples of any dimension: (lat, lon), (x, y, z) or
+        (seconds since the start of a pass,) for repeated satellite passes.
+        The grid divides each dimension by its cell size, which also sets
+        the relative weight of the dimensions in the distance. Each cell
+        keeps its most recent max_per_cell observations, so the index
+        follows slow changes of the environment.
+
+        Observations are stored normalised to 0 dBm TX power and, for SNR,
+        to REFERENCE_BW, and re-expressed for the settings of the query, so
+        links measured at one power or bandwidth can seed another.
+
+        Args:
+            path (str): JSON file the index is loaded from and saved to (None: in memory only)
+            cell_size (float or sequence): Grid cell size per dimension
+            max_per_cell (int): Observations kept per cell
+            k (int): Default number of neighbours of a query
+        """
+        self.path = path
+        self.cell_size = (float(cell_size) if isinstance(cell_size, (int, float))
+                          else [float(c) for c in cell_size])
+        self.max_per_cell = max_per_cell
+        self.k = k
+        self._cells: Dict[Tuple[int, ...], Deque[Observation]] = {}
+        self._extent: Optional[List[List[int]]] = None
+        self.count = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def _scale(self, dims: int) -> Tuple[float, ...]:
+        if isinstance(self.cell_size, (int, float)):
+            return (float(self.cell_size),) * dims
+        if len(self.cell_size) != dims:
+            raise ValueError(f"Position has {dims} dimensions, cell_size {len(self.cell_size)}")
+        return tuple(float(c) for c in self.cell_size)
+
+    def _cell(self, position: Position) -> Tuple[int, ...]:
+        return tuple(math.floor(p / s) for p, s in zip(position, self._scale(len(position))))
+
+    def _distance(self, a: Position, b: Position) -> float:
+        return math.sqrt(sum(((x - y) / s) ** 2 for x, y, s in zip(a, b, self._scale(len(a)))))
+
+    def add(self,
+            position: Sequence[float],
+            snr: float,
+            rssi: float,
+            tx_power: float,
+            bw: int,
+            timestamp: Optional[float] = None):
+        """
+        Record one link observation
+
+        Args:
+            position (sequence): Where (or when in the pass) it was measured
+            snr (float): Measured SNR in dB
+            rssi (float): Measured RSSI in dBm
+            tx_power (float): TX power the packet was sent with in dBm
+            bw (int): Bandwidth in Hz
+            timestamp (float): Wall-clock time of the measurement (default: now)
+        """
+        position = tuple(float(p) for p in position)
+        cell = self._cell(position)
+        bucket = self._cells.get(cell)
+        if bucket is None:
+            bucket = self._cells[cell] = deque(maxlen=self.max_per_cell)
+            if self._extent is None:
+                self._extent = [[c, c] for c in cell]
+            for bounds, c in zip(self._extent, cell):
+                bounds[0], bounds[1] = min(bounds[0], c), max(bounds[1], c)
+        if len(bucket) == self.max_per_cell:
+            self.count -= 1
+        rssi0 = rssi - tx_power
+        snr0 = snr - tx_power + 10 * math.log10(bw / REFERENCE_BW)
+        bucket.append((position, rssi0, snr0, time.time() if timestamp is None else timestamp))
+        self.count += 1
+
+    def nearest(self,
+                position: Sequence[float],
+                k: Optional[int] = None,
+                max_distance: Optional[float] = None) -> List[Tuple[float, Observation]]:
+        """
+        The k nearest observations, searching rings of cells outwards
+
+        Args:
+            position (sequence): Query position
+            k (int): Number of neighbours (default: the index's k)
+            max_distance (float): Largest distance in cells to accept (None: no limit)
+
+        Returns:
+            List of (distance in cells, observation), nearest first
+        """
+        k = k or self.k
+        position = tuple(float(p) for p in position)
+        center = self._cell(position)
+        found: List[Tuple[float, Observation]] = []
+        if self._extent is None:
+            return found
+        # Beyond this ring there are no occupied cells
+        last_ring = max(max(abs(c - lo), abs(c - hi)) for c, (lo, hi) in zip(center, self._extent))
+        if max_distance is not None:
+            last_ring = min(last_ring, math.ceil(max_distance))
+        radius = 0
+        while radius <= last_ring:
+            for cell in self._ring(center, radius):
+                for obs in self._cells.get(cell, ()):
+                    d = self._distance(position, obs[0])
+                    if max_distance is None or d <= max_distance:
+                        found.append((d, obs))
+            found.sort(key=lambda item: item[0])
+            # Cells in later rings are at least `radius` cells away
+            if len(found) >= k and found[k - 1][0] <= radius:
+                break
+            radius += 1
+        return found[:k]
+
+    @staticmethod
+    def _ring(center: Tuple[int, ...], radius: int):
+        # Cells whose Chebyshev distance from center is exactly radius
+        if radius == 0:
+            yield center
+            return
+
+        def walk(prefix: Tuple[int, ...], dim: int, on_edge: bool):
+            if dim == len(center):
+                if on_edge:
+                    yield prefix
+                return
+            for offset in range(-radius, radius + 1):
+                yield from walk(prefix + (center[dim] + offset,), dim + 1,
+                                on_edge or abs(offset) == radius)
+
+        yield from walk((), 0, False)
+
+    def estimate(self,
+                 position: Sequence[float],
+                 tx_power: float,
+                 bw: int,
+                 k: Optional[int] = None,
+                 max_distance: Optional[float] = None) -> Tuple[List[float], List[float]]:
+        """
+        SNR/RSSI samples expected at a position with the given settings
+
+        Args:
+            position (sequence): Query position
+            tx_power (float): TX power the samples should correspond to in dBm
+            bw (int): Bandwidth the SNR samples should correspond to in Hz
+            k (int): Number of neighbours (default: the index's k)
+            max_distance (float): Largest distance in cells to accept (None: no limit)
+
+        Returns:
+            Tuple of (snr samples, rssi samples), nearest first; empty if
+            nothing is known near the position
+        """
+        neighbours = self.nearest(position, k, max_distance)
+        bw_offset = 10 * math.log10(bw / REFERENCE_BW)
+        snr = [obs[2] + tx_power - bw_offset for _, obs in neighbours]
+        rssi = [obs[1] + tx_power for _, obs in neighbours]
+        return snr, rssi
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            raise ValueError("No path to save the link index to")
+        with open(path, 'w') as f:
+            json.dump({
+                'cell_size': self.cell_size,
+                'observations': [list(obs[0]) + list(obs[1:])
+                                 for bucket in self._cells.values() for obs in bucket],
+            }, f)
+
+    def load(self, path: str):
+        """
+        Add the observations stored in a file
+
+        Args:
+            path (str): JSON file written by save()
+        """
+        with open(path) as f:
+            stored = json.load(f)
+        if stored['cell_size'] != self.cell_size:
+            raise ValueError(f"Link index {path} uses cell size {stored['cell_size']}, "
+                             f"expected {self.cell_size}")
+        for row in stored['observations']:
+            position, (rssi0, snr0, timestamp) = tuple(row[:-3]), row[-3:]
+            # Stored values are already normalised: re-add at 0 dBm and REFERENCE_BW
+            self.add(position, snr0, rssi0, 0.0, REFERENCE_BW, timestamp)
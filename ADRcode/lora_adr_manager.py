@@ -2,13 +2,49 @@
 
 import time
 import logging
-from typing import List, Tuple, Dict
-import busio
-import board
-import adafruit_rfm9x
-from digitalio import DigitalInOut
+from typing import List, Tuple, Dict, Optional
+
+from optparam import TX_POWERS, adr_decision
+from adr_cache import ADRDecisionCache
+from airtime import SNR_FLOOR, time_on_air
+from duty_cycle import DutyCycleScheduler
+from channel_access import ListenBeforeTalk
+from energy_ledger import EnergyLedger
+from link_estimator import LinkTrendEstimator
+from velocity_estimator import VelocityEstimator
+from radio_config import RadioConfigurator
+from rx_timeout import ReceiveTimeout
+from link_index import LinkIndex
+from adr_state import ADRStateFile
+from async_logging import setup_logging
+from per_model import PERModel, goodput_decision
+
+
+def create_radio(frequency: float, cs_pin: str = 'CE1', reset_pin: str = 'D25'):
+    """
+    Create the RFM9x radio on the Pi's SPI bus
+
+    The hardware modules are imported here rather than at module level so the
+    ADR logic can be driven by a simulated radio on machines without them.
+
+    Args:
+        frequency (float): Radio frequency in MHz
+        cs_pin (str): board pin name of the chip select line
+        reset_pin (str): board pin name of the reset line
+
+    Returns:
+        adafruit_rfm9x.RFM9x radio instance
+    """
+    import busio
+    import board
+    import adafruit_rfm9x
+    from digitalio import DigitalInOut
+
+    CS = DigitalInOut(getattr(board, cs_pin))
+    RESET = DigitalInOut(getattr(board, reset_pin))
+    spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
+    return adafruit_rfm9x.RFM9x(spi, CS, RESET, frequency)
 
-from optparam import mobile_adr
 
 class LoRaADRManager:
     def __init__(self, 
@@ -17,7 +53,21 @@ class LoRaADRManager:
                  initial_cr: int = 5,
                  initial_bw: int = 125000,
                  initial_tx_power: int = 13,
-                 max_history: int = 20):
+                 max_history: int = 20,
+                 radio=None,
+                 node_id: str = 'local',
+                 duty_cycle: Optional[float] = None,
+                 decision_deadline: float = 0.05,
+                 decision_cache: Optional[ADRDecisionCache] = None,
+                 adjust_every: int = 10,
+                 predictive: bool = False,
+                 listen_before_talk: Optional[str] = None,
+                 rx_interval: float = 1.0,
+                 link_index: Optional[LinkIndex] = None,
+                 state_file: Optional[str] = None,
+                 objective: str = 'margin',
+                 per_model: Optional[PERModel] = None,
+                 packet_interval: float = 0.0):
         """
         Initialize the Adaptive Data Rate Manager for LoRa communication
         
@@ -28,18 +78,40 @@ class LoRaADRManager:
             initial_bw (int): Initial Bandwidth in Hz
             initial_tx_power (int): Initial Transmission Power
             max_history (int): Maximum number of packets to keep in history
+            radio: Radio object to use instead of the RFM9x (e.g. a simulated radio)
+            node_id (str): Node identifier used in the energy ledger
+            duty_cycle (float): Maximum airtime fraction enforced on send (None to disable)
+            decision_deadline (float): Time budget of one ADR decision in seconds
+            decision_cache (ADRDecisionCache): Decision cache, may be shared between managers
+            adjust_every (int): Number of packets between periodic ADR adjustments
+            predictive (bool): Feed SNR/RSSI trend forecasts into the ADR decision
+            listen_before_talk (str): Sense the channel before sending: 'cad', 'rssi' or None
+            rx_interval (float): Expected gap between received packets, refined from arrivals
+            link_index (LinkIndex): Past link observations by position, for warm starts
+            state_file (str): Checkpoint file of the ADR state, restored on startup (None to disable)
+            objective (str): 'margin' for the Mobile ADR SNR margin, 'goodput' to maximize
+                expected delivered bytes per second under per_model
+            per_model (PERModel): PER curves of the goodput objective (default: datasheet floors)
+            packet_interval (float): Idle gap after each packet for the goodput objective
+                (0: packets back to back or paced by the duty cycle)
         """
         # LoRa Radio Setup
-        CS = DigitalInOut(board.CE1)
-        RESET = DigitalInOut(board.D25)
-        spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-        self.rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, frequency)
+        self.rfm9x = radio if radio is not None else create_radio(frequency)
+        
+        # A checkpoint left by a previous run overrides the initial parameters
+        restore_start = time.perf_counter()
+        self.state_store = ADRStateFile(state_file, max_history) if state_file else None
+        restored = self.state_store.load() if self.state_store is not None else None
+        self.restored = restored is not None
+        if restored is not None:
+            initial_sf, initial_cr, initial_bw, initial_tx_power = restored['params']
         
         # Initialize parameters
-        self.rfm9x.tx_power = initial_tx_power
-        self.rfm9x.spreading_factor = initial_sf
-        self.rfm9x.coding_rate = initial_cr
-        self.rfm9x.signal_bandwidth = initial_bw
+        self.radio_config = RadioConfigurator(self.rfm9x)
+        self.radio_config.apply(spreading_factor=initial_sf,
+                                coding_rate=initial_cr,
+                                signal_bandwidth=initial_bw,
+                                tx_power=initial_tx_power)
         
         # Parameter tracking
         self.current_sf = initial_sf
@@ -52,18 +124,71 @@ class LoRaADRManager:
         self.snr_history: List[float] = []
         self.rssi_history: List[float] = []
         self.available_bandwidths = [125000, 250000, 500000]
+        self.available_tx_powers = list(TX_POWERS)
+        if objective not in ('margin', 'goodput'):
+            raise ValueError(f"Unknown ADR objective: {objective}")
+        self.objective = objective
+        self.per_model = per_model if per_model is not None else (PERModel() if objective == 'goodput' else None)
+        self.packet_interval = packet_interval
+        self.decision_deadline = decision_deadline
+        self.decision_overruns = 0
+        self.last_good_params = (initial_sf, initial_cr, initial_bw, initial_tx_power)
+        
+        # Trend estimation for predictive ADR
+        self.adjust_every = adjust_every
+        self.predictive = predictive
+        self.trend = LinkTrendEstimator()
+        self.velocity_estimator = VelocityEstimator()
+        self.forward_lost = 0
+        self.packets_since_adjust = adjust_every
+        self.lost_since_adjust = 0
+        if restored is not None:
+            self.snr_history = restored['snr_history']
+            self.rssi_history = restored['rssi_history']
+            self.last_good_params = restored['last_good_params']
+            self.packets_since_adjust = restored['packets_since_adjust']
+            self.forward_lost = restored['forward_lost']
+        
+        # ADR tuning constants
+        self.margin_db = 5.0
+        self.max_margin_db = 10.0
+        self.d0 = 1.0
+        self.min_sensi = -137
+        self.decision_cache = decision_cache
+        if self.decision_cache is not None:
+            self.decision_cache.set_tuning(**self.tuning())
+        
+        # Airtime and energy accounting
+        self.node_id = node_id
+        self.ledger = EnergyLedger()
+        self.scheduler = DutyCycleScheduler(duty_cycle) if duty_cycle else None
+        self.channel_access = (ListenBeforeTalk(self.rfm9x, method=listen_before_talk)
+                               if listen_before_talk else None)
+        
+        # Receive timeout tracking the current settings' airtime
+        self.rx_timeout = ReceiveTimeout(interval=rx_interval)
+        self.rx_timeout.set_settings(initial_sf, initial_bw, initial_cr)
+        
+        # Link observations indexed by position (or time into a pass)
+        self.link_index = link_index
+        self.position: Optional[Tuple[float, ...]] = None
         
-        # Logging setup
-        logging.basicConfig(level=logging.INFO, 
-                            format='%(asctime)s - LoRaADR - %(levelname)s - %(message)s')
+        # Logging setup: queued to a writer thread, per-packet messages rate-limited
+        setup_logging(format='%(asctime)s - LoRaADR - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
+        if restored is not None:
+            self.logger.info(f"Restored ADR state from {state_file}: "
+                             f"SF={initial_sf}, CR={initial_cr}, BW={initial_bw}, TP={initial_tx_power}, "
+                             f"{len(self.snr_history)} samples in "
+                             f"{(time.perf_counter() - restore_start) * 1000:.2f} ms")
 
-    def update_link_quality(self, packet) -> Dict[str, float]:
+    def update_link_quality(self, packet, timestamp: Optional[float] = None) -> Dict[str, float]:
         """
         Update link quality metrics based on received packet
         
         Args:
             packet: Received LoRa packet
+            timestamp (float): Reception time in seconds (default: time.monotonic())
         
         Returns:
             Dictionary of link quality metrics
@@ -76,11 +201,16 @@ class LoRaADRManager:
             # Maintain history with max_history limit
             self.snr_history.append(current_snr)
             self.rssi_history.append(current_rssi)
+            self.trend.update(current_snr, current_rssi)
+            self.velocity_estimator.update(current_rssi,
+                                           timestamp if timestamp is not None else time.monotonic())
             
             if len(self.snr_history) > self.max_history:
                 self.snr_history.pop(0)
             if len(self.rssi_history) > self.max_history:
                 self.rssi_history.pop(0)
+            self._index_sample(current_snr, current_rssi)
+            self.checkpoint()
             
             return {
                 'snr': current_snr,
@@ -90,46 +220,190 @@ class LoRaADRManager:
             self.logger.error(f"Error updating link quality: {e}")
             return {'snr': None, 'rssi': None}
 
-    def adjust_parameters(self, velocity: float = 0) -> Tuple[int, int, int, float]:
+    def update_from_feedback(self, feedback: Dict[str, float],
+                             timestamp: Optional[float] = None) -> Dict[str, float]:
+        """
+        Update link quality metrics from a forward-link summary sent by the peer
+        
+        The peer measured these on the packets we sent, so they describe the
+        link our parameters actually apply to, unlike last_snr/last_rssi of
+        the acknowledgment itself.
+        
+        Args:
+            feedback (dict): Summary decoded by link_feedback.decode_feedback
+            timestamp (float): Reception time in seconds (default: time.monotonic())
+        
+        Returns:
+            Dictionary of link quality metrics
+        """
+        # A window of one packet reports the same value as min and max
+        extremes = 1 if feedback['seq_first'] == feedback['seq_last'] else 2
+        self.snr_history.extend([feedback['snr_min'], feedback['snr_max']][:extremes])
+        self.rssi_history.extend([feedback['rssi_min'], feedback['rssi_max']][:extremes])
+        del self.snr_history[:-self.max_history]
+        del self.rssi_history[:-self.max_history]
+        
+        snr = (feedback['snr_min'] + feedback['snr_max']) / 2
+        rssi = (feedback['rssi_min'] + feedback['rssi_max']) / 2
+        self.trend.update(snr, rssi)
+        self.velocity_estimator.update(rssi, timestamp if timestamp is not None else time.monotonic())
+        self.forward_lost += feedback['lost']
+        self.lost_since_adjust += feedback['lost']
+        self._index_sample(snr, rssi)
+        self.checkpoint()
+        
+        return {
+            'snr': snr,
+            'rssi': rssi,
+            'lost': feedback['lost']
+        }
+
+    def record_loss(self, count: int = 1):
+        """
+        Count packets known to be lost, e.g. sent without an acknowledgment
+        
+        Lost packets yield no SNR sample; the goodput objective counts them
+        at the next adjustment. Losses reported by the peer's feedback are
+        counted by update_from_feedback.
+        
+        Args:
+            count (int): Number of lost packets
+        """
+        self.lost_since_adjust += count
+
+    def set_position(self, position: Optional[Tuple[float, ...]]):
+        """
+        Set where the following link measurements are taken
+        
+        Args:
+            position (tuple): Coordinates or time into a pass, in the link index's units (None to stop indexing)
+        """
+        self.position = tuple(position) if position is not None else None
+
+    def _index_sample(self, snr: float, rssi: float):
+        if self.link_index is not None and self.position is not None:
+            self.link_index.add(self.position, snr, rssi, self.current_tx_power, self.current_bw)
+
+    def warm_start(self, position: Tuple[float, ...]) -> Optional[Tuple[int, int, int, float]]:
+        """
+        Seed the link history from past observations near a position and adjust
+        
+        The nearest indexed observations, converted to the current TX power
+        and bandwidth, fill the SNR/RSSI history so the first ADR decision
+        does not wait for fresh samples. Real samples replace them as they
+        arrive.
+        
+        Args:
+            position (tuple): Coordinates or time into a pass, in the link index's units
+        
+        Returns:
+            Applied (spreading_factor, coding_rate, bandwidth, tx_power), or
+            None if the index knows too little about the position
+        """
+        self.set_position(position)
+        if self.link_index is None:
+            return None
+        snr, rssi = self.link_index.estimate(position, self.current_tx_power, self.current_bw)
+        if len(snr) < 5:
+            self.logger.info(f"Link index has {len(snr)} observations near {position}, cold start")
+            return None
+        
+        # Nearest observations last, as the most recent samples would be
+        self.snr_history = snr[::-1][-self.max_history:]
+        self.rssi_history = rssi[::-1][-self.max_history:]
+        params = self.adjust_parameters()
+        self.apply_parameters(*params)
+        self.logger.info(f"Warm start from {len(snr)} indexed observations near {position}")
+        return params
+
+    def adjust_parameters(self, velocity: Optional[float] = None) -> Tuple[int, int, int, float]:
         """
         Adjust LoRa parameters using Mobile ADR algorithm
         
+        The decision runs in bounded time; if it misses decision_deadline or
+        fails, the last known-good parameters are returned instead.
+        
         Args:
-            velocity (float): Node movement speed
+            velocity (float): Node movement speed (default: estimated from link metrics)
         
         Returns:
             Tuple of (spreading_factor, coding_rate, bandwidth, tx_power)
         """
+        losses = self.lost_since_adjust
+        self.packets_since_adjust = 0
+        self.lost_since_adjust = 0
+        if velocity is None:
+            velocity = self.velocity_estimator.velocity
         try:
             # Check if we have enough history to make ADR decision
             if len(self.snr_history) < 5 or len(self.rssi_history) < 5:
                 self.logger.info("Insufficient history for ADR adjustment")
                 return (self.current_sf, self.current_cr, self.current_bw, self.current_tx_power)
             
-            # Call mobile ADR algorithm
-            new_sf, new_tp = mobile_adr(
-                sf_last=self.current_sf,
-                bandwidth=self.available_bandwidths,
-                current_tp=self.current_tx_power,
-                margin_db=5.0,  # Default margin, can be adjusted
-                M=len(self.snr_history),
-                velocity=velocity,
-                ack_enabled=True,
-                last_mul_packets_snr=self.snr_history,
-                last_mul_packets_rssi=self.rssi_history
-            )
-            
-            # Select bandwidth based on SF (simplified logic)
-            new_bw = self.available_bandwidths[min(len(self.available_bandwidths) - 1, max(0, 2 - (new_sf - 7)))]
+            # Call mobile ADR algorithm within the decision deadline
+            deadline = time.perf_counter() + self.decision_deadline
+            snr_history, rssi_history = self._decision_window()
             
-            # Select coding rate (simplified)
-            new_cr = max(5, min(8, new_sf - 4))
+            if self.objective == 'goodput':
+                # Lost packets enter this decision's window as samples below the
+                # current curve; the link history keeps measured samples only
+                if losses > 0:
+                    censored = self.per_model.censored_snr(self.current_sf, self.current_cr)
+                    snr_history = (snr_history + [censored] * losses)[-self.max_history:]
+                
+                # Table lookups per candidate are cheap, and the decision uses the
+                # whole SNR window rather than the min/max the cache is keyed on
+                new_sf, new_cr, new_bw, new_tp = goodput_decision(
+                    snr_samples=snr_history,
+                    bw_last=self.current_bw,
+                    tp_last=self.current_tx_power,
+                    per_model=self.per_model,
+                    bandwidths=self.available_bandwidths,
+                    tx_powers=self.available_tx_powers,
+                    interval=self.packet_interval,
+                    deadline=deadline
+                )
+            else:
+                key = decision = None
+                if self.decision_cache is not None:
+                    key = self.decision_cache.key(min(snr_history), max(snr_history),
+                                                  min(rssi_history), velocity,
+                                                  self.current_sf, self.current_bw,
+                                                  self.current_tx_power)
+                    decision = self.decision_cache.get(key)
+                if decision is None:
+                    decision = adr_decision(
+                        sf_last=self.current_sf,
+                        bandwidth=self.available_bandwidths,
+                        current_tp=self.current_tx_power,
+                        margin_db=self.margin_db,
+                        M=len(snr_history),
+                        velocity=velocity,
+                        ack_enabled=True,
+                        last_mul_packets_snr=snr_history,
+                        last_mul_packets_rssi=rssi_history,
+                        d0=self.d0,
+                        min_sensi=self.min_sensi,
+                        bw_last=self.current_bw,
+                        max_margin_db=self.max_margin_db,
+                        deadline=deadline
+                    )
+                    if time.perf_counter() > deadline:
+                        raise TimeoutError("ADR decision deadline exceeded")
+                    # Only decisions made in time are worth reusing
+                    if key is not None:
+                        self.decision_cache.put(key, decision)
+                new_sf, new_bw, new_tp = decision
+                
+                # Select coding rate (simplified)
+                new_cr = max(5, min(8, new_sf - 4))
+            if time.perf_counter() > deadline:
+                raise TimeoutError("ADR decision deadline exceeded")
             
             # Log parameter changes
-            self.logger.info(f"ADR Adjustment: SF {self.current_sf}->{new_sf}, "
-                             f"BW {self.current_bw}->{new_bw}, "
-                             f"CR {self.current_cr}->{new_cr}, "
-                             f"TP {self.current_tx_power}->{new_tp}")
+            self.logger.info("ADR Adjustment: SF %d->%d, BW %d->%d, CR %d->%d, TP %s->%s",
+                             self.current_sf, new_sf, self.current_bw, new_bw,
+                             self.current_cr, new_cr, self.current_tx_power, new_tp)
             
             # Update current parameters
             self.current_sf = new_sf
@@ -139,14 +413,109 @@ class LoRaADRManager:
             
             return (new_sf, new_cr, new_bw, new_tp)
         
+        except TimeoutError as e:
+            self.decision_overruns += 1
+            self.logger.warning(f"{e}, falling back to last known-good parameters")
+            return self._fall_back()
         except Exception as e:
             self.logger.error(f"Error in ADR parameter adjustment: {e}")
-            return (self.current_sf, self.current_cr, self.current_bw, self.current_tx_power)
+            return self._fall_back()
+
+    def _decision_window(self) -> Tuple[List[float], List[float]]:
+        """
+        SNR/RSSI samples the ADR decision is made from
+        
+        In predictive mode only the samples since the last periodic adjustment
+        are kept, so old minima stop holding the SF up once the link recovers,
+        and the trend forecast up to the next adjustment is added, so a fade
+        in progress raises the SF before packets are lost.
+        
+        Returns:
+            Tuple of (snr_samples, rssi_samples)
+        """
+        if not self.predictive or self.trend.snr.level is None:
+            return list(self.snr_history), list(self.rssi_history)
+        
+        forecast = self.trend.forecast(self.adjust_every)
+        recent = max(5, self.adjust_every)
+        return (self.snr_history[-recent:] + [forecast['snr']],
+                self.rssi_history[-recent:] + [forecast['rssi']])
+
+    def should_adjust(self) -> bool:
+        """
+        Decide whether the ADR should run before the next packet
+        
+        Call once per packet. Adjustments happen every adjust_every packets;
+        in predictive mode they also happen early when the forecast SNR
+        headroom of the current SF leaves the margin band.
+        
+        Returns:
+            True if adjust_parameters should be called now
+        """
+        self.packets_since_adjust += 1
+        if self.packets_since_adjust >= self.adjust_every:
+            return True
+        if not self.predictive or len(self.snr_history) < 5 or self.packets_since_adjust < 3:
+            return False
+        
+        forecast = self.trend.forecast(self.adjust_every)['snr']
+        headroom = forecast - SNR_FLOOR[self.current_sf]
+        # 5 dB is two SNR steps of 2.5 dB between neighbouring spreading factors
+        return headroom < self.margin_db or headroom > self.max_margin_db + 5.0
+
+    def tuning(self) -> Dict[str, float]:
+        """
+        Current ADR tuning constants
+        
+        Returns:
+            Dictionary of the constants passed to the ADR decision
+        """
+        return {
+            'margin_db': self.margin_db,
+            'max_margin_db': self.max_margin_db,
+            'd0': self.d0,
+            'min_sensi': self.min_sensi,
+            'available_bandwidths': tuple(self.available_bandwidths),
+        }
+
+    def set_tuning(self, **constants):
+        """
+        Change ADR tuning constants and invalidate cached decisions
+        
+        Args:
+            **constants: New values for margin_db, max_margin_db, d0 or min_sensi
+        """
+        for name, value in constants.items():
+            if name not in ('margin_db', 'max_margin_db', 'd0', 'min_sensi'):
+                raise ValueError(f"Unknown ADR tuning constant: {name}")
+            setattr(self, name, value)
+        if self.decision_cache is not None and self.decision_cache.set_tuning(**self.tuning()):
+            self.logger.info("ADR tuning changed, decision cache invalidated")
+
+    def _fall_back(self) -> Tuple[int, int, int, float]:
+        """
+        Revert to the last parameters the radio accepted
+        
+        Returns:
+            Tuple of (spreading_factor, coding_rate, bandwidth, tx_power)
+        """
+        sf, cr, bw, tp = self.last_good_params
+        self.current_sf = sf
+        self.current_cr = cr
+        self.current_bw = bw
+        self.current_tx_power = tp
+        return self.last_good_params
 
     def apply_parameters(self, sf: int, cr: int, bw: int, tp: float):
         """
         Apply the selected LoRa parameters to the radio
         
+        Only settings that differ from the cached radio state are written. The
+        receive timeout follows the new airtime and the parameters become the
+        last known-good ones. If the radio rejects a setting, the current and
+        last known-good parameters are rolled back to what the radio is
+        actually running.
+        
         Args:
             sf (int): Spreading Factor
             cr (int): Coding Rate
@@ -154,48 +523,159 @@ class LoRaADRManager:
             tp (float): Transmission Power
         """
         try:
-            self.rfm9x.spreading_factor = sf
-            self.rfm9x.coding_rate = cr
-            self.rfm9x.signal_bandwidth = bw
-            self.rfm9x.tx_power = tp
+            changed = self.radio_config.apply(spreading_factor=sf,
+                                              coding_rate=cr,
+                                              signal_bandwidth=bw,
+                                              tx_power=tp)
             
-            self.logger.info(f"Applied parameters: "
-                             f"SF={sf}, CR={cr}, BW={bw}, TP={tp}")
+            if changed:
+                self.logger.info("Applied parameters: SF=%d, CR=%d, BW=%d, TP=%s (%d changed in %.2f ms)",
+                                 sf, cr, bw, tp, len(changed),
+                                 self.radio_config.latencies[-1] * 1000)
+            self.last_good_params = (sf, cr, bw, tp)
+            self.rx_timeout.set_settings(sf, bw, cr)
+            self.checkpoint()
         except Exception as e:
             self.logger.error(f"Error applying parameters: {e}")
+            self._sync_from_radio()
+
+    def _sync_from_radio(self):
+        """
+        Reset the current parameters to the settings the radio reports
+        """
+        try:
+            state = self.radio_config.sync_from_radio()
+        except Exception as e:
+            # Settings written before the failure are still in the cache
+            self.logger.error(f"Error reading back radio settings: {e}")
+            state = self.radio_config.state
+        self.current_sf = state.get('spreading_factor', self.current_sf)
+        self.current_cr = state.get('coding_rate', self.current_cr)
+        self.current_bw = state.get('signal_bandwidth', self.current_bw)
+        self.current_tx_power = state.get('tx_power', self.current_tx_power)
+        self.last_good_params = (self.current_sf, self.current_cr,
+                                 self.current_bw, self.current_tx_power)
+        self.rx_timeout.set_settings(self.current_sf, self.current_bw, self.current_cr)
+        self.logger.warning("Radio running SF=%d, CR=%d, BW=%d, TP=%s",
+                            self.current_sf, self.current_cr, self.current_bw, self.current_tx_power)
+        self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Save the ADR state to the state file, if there is one
+        
+        Called on every history update and parameter change; a save is a
+        few small writes into the memory-mapped file.
+        """
+        if self.state_store is None:
+            return
+        self.state_store.save((self.current_sf, self.current_cr, self.current_bw, self.current_tx_power),
+                              self.last_good_params,
+                              self.snr_history,
+                              self.rssi_history,
+                              self.packets_since_adjust,
+                              self.forward_lost)
+
+    def airtime(self, payload_len: int) -> float:
+        """
+        Time on air of a payload with the current parameters
+        
+        Args:
+            payload_len (int): Payload length in bytes
+        
+        Returns:
+            Time on air in seconds
+        """
+        return time_on_air(payload_len, self.current_sf, self.current_bw, self.current_cr)
+
+    def next_transmit_time(self, payload_len: int) -> float:
+        """
+        Earliest time a payload may be sent without breaking the duty cycle
+        
+        Args:
+            payload_len (int): Payload length in bytes
+        
+        Returns:
+            Time on the scheduler's clock (now if no duty cycle is enforced)
+        """
+        if self.scheduler is None:
+            return time.monotonic()
+        return self.scheduler.next_allowed_time(self.airtime(payload_len))
+
+    def send(self, data: bytes) -> int:
+        """
+        Transmit a packet and record its airtime and energy in the ledger
+        
+        When a duty cycle is configured, this waits exactly as long as the
+        scheduler requires before transmitting; with listen-before-talk it
+        then backs off while the channel is busy.
+        
+        Args:
+            data (bytes): Packet payload
+        
+        Returns:
+            Ledger entry id, to confirm delivery once it is known
+        """
+        if self.scheduler is not None:
+            self.scheduler.wait(self.airtime(len(data)))
+        if self.channel_access is not None:
+            self.channel_access.acquire()
+        entry_id = self.ledger.record(len(data), self.current_sf, self.current_bw,
+                                      self.current_cr, self.current_tx_power,
+                                      node=self.node_id)
+        self.rfm9x.send(data)
+        return entry_id
 
     def run_adaptive_transmission(self, 
                                   num_packets: int = 100, 
-                                  velocity: float = 0):
+                                  velocity: Optional[float] = None):
         """
         Run an adaptive transmission experiment
         
         Args:
             num_packets (int): Number of packets to send
-            velocity (float): Node movement speed
+            velocity (float): Node movement speed (default: estimated from link metrics)
         """
         for i in range(num_packets):
             try:
                 # Periodically adjust parameters (e.g., every 10 packets)
-                if i % 10 == 0:
+                if self.should_adjust():
                     sf, cr, bw, tp = self.adjust_parameters(velocity)
                     self.apply_parameters(sf, cr, bw, tp)
                 
                 # Prepare and send packet
                 packet = f"ADR Packet {i+1}/{num_packets}|TS:{int(time.time() * 1000)}".encode("utf-8")
-                self.rfm9x.send(packet)
-                self.logger.info(f"Sent packet {i+1}/{num_packets}")
+                entry_id = self.send(packet)
+                self.logger.info("Sent packet %d/%d", i + 1, num_packets)
                 
                 # Wait for and process receive window
                 rx_packet = self.rfm9x.receive(timeout=1.0)
                 if rx_packet:
+                    self.ledger.confirm(entry_id)
                     self.update_link_quality(rx_packet)
+                else:
+                    self.record_loss()
                 
                 time.sleep(0.01)  # Adjust as needed
             
             except Exception as e:
                 self.logger.error(f"Error in adaptive transmission: {e}")
                 break
+        
+        self.log_energy_summary()
+
+    def log_energy_summary(self):
+        """
+        Log airtime and energy totals of the current mission
+        """
+        summary = self.ledger.mission_summary()
+        self.logger.info(f"Airtime: {summary['airtime_s']:.3f} s, "
+                         f"Energy: {summary['energy_j']:.4f} J over {summary['packets']} packets")
+        self.logger.info(f"Delivered: {summary['delivered_packets']} packets, "
+                         f"undelivered: {summary['undelivered_packets']}")
+        if summary['joules_per_delivered_byte'] is not None:
+            self.logger.info(f"Energy per delivered byte: "
+                             f"{summary['joules_per_delivered_byte'] * 1000:.4f} mJ")
 
 def main():
     """
@@ -212,8 +692,7 @@ def main():
     
     # Run adaptive transmission experiment
     adr_manager.run_adaptive_transmission(
-        num_packets=100,
-        velocity=5.0  # Example velocity
+        num_packets=100
     )
 
 if __name__ == "__main__":
@@ -2,12 +2,14 @@
 import time
 import csv
 import logging
-import busio
-import board
-import adafruit_rfm9x
-from digitalio import DigitalInOut
+from typing import Optional
 
 from lora_adr_manager import LoRaADRManager
+from link_feedback import ForwardLinkWindow
+from packet_view import PacketView, PacketReceiver
+from fec import FEC_MAGIC, FECDecoder
+from async_logging import setup_logging
+from per_model import PERModel
 
 class LoRaReceiver:
     def __init__(self, 
@@ -15,7 +17,11 @@ class LoRaReceiver:
                  initial_sf: int = 7, 
                  initial_cr: int = 5,
                  initial_bw: int = 125000,
-                 output_file: str = 'adr_results.csv'):
+                 output_file: str = 'adr_results.csv',
+                 radio=None,
+                 state_file: Optional[str] = None,
+                 objective: str = 'margin',
+                 per_model_file: Optional[str] = None):
         """
         Initialize LoRa Receiver with Adaptive Data Rate
         
@@ -25,10 +31,13 @@ class LoRaReceiver:
             initial_cr (int): Initial Coding Rate
             initial_bw (int): Initial Bandwidth
             output_file (str): CSV file to log results
+            radio: Radio object to use instead of creating the RFM9x
+            state_file (str): ADR state checkpoint, restored on startup (None to disable)
+            objective (str): ADR objective: 'margin' or 'goodput'
+            per_model_file (str): PER curves fitted by per_model.py for the goodput objective
         """
-        # Logging setup
-        logging.basicConfig(level=logging.INFO, 
-                            format='%(asctime)s - LoRaRX - %(levelname)s - %(message)s')
+        # Logging setup: queued to a writer thread, per-packet messages rate-limited
+        setup_logging(format='%(asctime)s - LoRaRX - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         
         # ADR Manager
@@ -36,14 +45,29 @@ class LoRaReceiver:
             frequency=frequency,
             initial_sf=initial_sf,
             initial_cr=initial_cr,
-            initial_bw=initial_bw
+            initial_bw=initial_bw,
+            radio=radio,
+            state_file=state_file,
+            objective=objective,
+            per_model=PERModel(per_model_file) if per_model_file else None
         )
         
         # Results tracking
         self.total_packets_received = 0
         self.dropped_packets = 0
+        self.receive_timeouts = 0
+        self.recovered_packets = 0
         self.output_file = output_file
         
+        # Forward-link metrics reported back to the transmitter on each ack
+        self.forward_window = ForwardLinkWindow()
+        
+        # Receive without copying and parse packets in place
+        self.receiver = PacketReceiver(self.adr_manager.rfm9x)
+        
+        # Rebuilds packets lost in erasure-coded groups (transmitter fec_group)
+        self.fec = FECDecoder()
+        
         # Prepare CSV for results
         self._prepare_csv()
     
@@ -88,6 +112,48 @@ class LoRaReceiver:
         except Exception as e:
             self.logger.error(f"Error logging packet: {e}")
     
+    def _record_forward(self, packet, rx_metrics: dict):
+        """
+        Add a data packet's metrics to the forward-link feedback window
+        
+        Args:
+            packet (PacketView): Received packet, "CubeSat|<seq>|TS:<ms>"
+            rx_metrics (dict): Reception metrics
+        """
+        seq = packet.field_int(1)
+        if seq is None or rx_metrics.get('snr') is None:
+            return
+        self.forward_window.record(seq, rx_metrics['snr'], rx_metrics['rssi'])
+    
+    def _sync_reply(self) -> bytes:
+        """
+        READY answer to a SYNC, carrying a summary of the forward link
+        
+        The transmitter only listens after its SYNC, so the window is
+        reported and reset here and nowhere else.
+        
+        Returns:
+            Acknowledgment bytes
+        """
+        return b"READY" + self.forward_window.encode_and_reset()
+    
+    def _handle_data(self, packet, rx_metrics: Optional[dict]):
+        """
+        Count, log and record one data packet
+        
+        Args:
+            packet (PacketView): Data packet
+            rx_metrics (dict): Reception metrics, or None if the packet was
+                rebuilt by FEC rather than received
+        """
+        self.total_packets_received += 1
+        self._log_packet(packet.text, rx_metrics or {})
+        if rx_metrics is None:
+            # Not on the air: keep it out of the forward-link loss report
+            self.recovered_packets += 1
+        else:
+            self._record_forward(packet, rx_metrics)
+    
     def run_mission(self, timeout: float = 3600.0):
         """
         Run receiver mission with ADR
@@ -99,50 +165,57 @@ class LoRaReceiver:
         
         while time.time() - start_time < timeout:
             try:
-                # Wait for incoming packet
-                packet = self.adr_manager.rfm9x.receive(timeout=5.0)
+                # Wait for incoming packet, as long as the current settings need
+                rx_timeout = self.adr_manager.rx_timeout
+                packet = self.receiver.receive(timeout=rx_timeout.timeout())
                 
                 if packet:
+                    rx_timeout.arrival()
                     try:
-                        # Decode packet
-                        packet_str = packet.decode("utf-8")
-                        
-                        # Check for control signals
-                        if packet_str == "SYNC":
+                        # Check for control signals without decoding the packet
+                        if packet.startswith(b"SYNC"):
                             # Respond to sync request
-                            ack = "READY".encode("utf-8")
-                            self.adr_manager.rfm9x.send(ack)
+                            self.adr_manager.send(self._sync_reply())
                             self.logger.info("Responded to sync request")
                             continue
                         
-                        elif packet_str == "TERMINATE":
+                        elif packet.equals(b"TERMINATE"):
                             self.logger.info("Received termination signal")
                             break
                         
-                        # Process data packet
-                        self.total_packets_received += 1
-                        
-                        # Update link quality and log
+                        # Update link quality from every frame on the air
                         rx_metrics = self.adr_manager.update_link_quality(packet)
-                        self._log_packet(packet_str, rx_metrics)
+                        received_before = self.total_packets_received
+                        
+                        # Process data packet, unwrapping FEC frames
+                        if packet.startswith(FEC_MAGIC):
+                            for payload, recovered in self.fec.add(packet.view):
+                                self._handle_data(PacketView(bytearray(payload), len(payload)),
+                                                  None if recovered else rx_metrics)
+                        else:
+                            self._handle_data(packet, rx_metrics)
                         
-                        # Periodic ADR parameter adjustment
-                        if self.total_packets_received % 10 == 0:
+                        # Periodic ADR parameter adjustment (every 10 data packets)
+                        if self.total_packets_received // 10 > received_before // 10:
                             sf, cr, bw, tp = self.adr_manager.adjust_parameters()
                             self.adr_manager.apply_parameters(sf, cr, bw, tp)
                             
-                            # Send sync acknowledgment
-                            ack = "READY".encode("utf-8")
-                            self.adr_manager.rfm9x.send(ack)
+                            # Send sync acknowledgment; the forward-link window keeps
+                            # accumulating for the transmitter's next SYNC
+                            self.adr_manager.send(b"READY")
                         
-                        self.logger.info(f"Received packet {self.total_packets_received}")
+                        self.logger.info("Received packet %d", self.total_packets_received)
                     
                     except Exception as decode_error:
                         self.logger.error(f"Packet decode error: {decode_error}")
                         self.dropped_packets += 1
+                    finally:
+                        packet.release()
                 else:
-                    self.dropped_packets += 1
-                    self.logger.warning("No packet received in timeout window")
+                    # Expected while the adaptive timeout tightens; not a drop
+                    self.receive_timeouts += 1
+                    self.logger.info("No packet received in %.2f s timeout window", rx_timeout.timeout())
+                    rx_timeout.miss()
             
             except Exception as e:
                 self.logger.error(f"error: {e}")
@@ -151,6 +224,9 @@ class LoRaReceiver:
         self.logger.info(f"complete")
         self.logger.info(f"Total packets received: {self.total_packets_received}")
         self.logger.info(f"Dropped packets: {self.dropped_packets}")
+        self.logger.info(f"Receive timeouts: {self.receive_timeouts}")
+        self.logger.info(f"Packets recovered by FEC: {self.recovered_packets}")
+        self.adr_manager.log_energy_summary()
 
 def main():
     # Create and run receiver
@@ -1,12 +1,15 @@
 # lora_adr_tx.py - Adaptive Data Rate Transmitter
 import time
 import logging
-import busio
-import board
-import adafruit_rfm9x
-from digitalio import DigitalInOut
+from collections import OrderedDict
+from typing import Dict, List, Optional
 
 from lora_adr_manager import LoRaADRManager
+from link_feedback import split_ack
+from fec import FECEncoder
+from link_index import LinkIndex
+from per_model import PERModel
+from async_logging import setup_logging
 
 class LoRaTransmitter:
     def __init__(self, 
@@ -16,7 +19,15 @@ class LoRaTransmitter:
                  initial_bw: int = 125000,
                  initial_tx_power: int = 13,
                  mission_duration: float = 3600.0,  # 1 hour mission
-                 velocity: float = 5.0):
+                 velocity: Optional[float] = None,
+                 duty_cycle: float = 0.1,
+                 fec_group: Optional[int] = None,
+                 listen_before_talk: Optional[str] = None,
+                 radio=None,
+                 link_index_file: Optional[str] = None,
+                 state_file: Optional[str] = None,
+                 objective: str = 'margin',
+                 per_model_file: Optional[str] = None):
         """
         Initialize LoRa Transmitter with Adaptive Data Rate
         
@@ -27,11 +38,20 @@ class LoRaTransmitter:
             initial_bw (int): Initial Bandwidth
             initial_tx_power (int): Initial Transmission Power
             mission_duration (float): Total mission duration in seconds
-            velocity (float): Estimated node movement speed
+            velocity (float): Node movement speed (default: estimated from link metrics)
+            duty_cycle (float): Maximum airtime fraction (10 % in the 433 MHz band)
+            fec_group (int): Data packets per erasure-coded group (default: no FEC)
+            listen_before_talk (str): Channel sensing before each send: 'cad', 'rssi' or None
+            radio: Radio object to use instead of creating the RFM9x
+            link_index_file (str): Link observations by time into the mission from
+                earlier runs of the same pass/route; warm-starts the ADR and is updated
+            state_file (str): ADR state checkpoint; after a restart the mission resumes
+                with the checkpointed settings instead of warm-starting and resyncing
+            objective (str): ADR objective: 'margin' or 'goodput'
+            per_model_file (str): PER curves fitted by per_model.py for the goodput objective
         """
-        # Logging setup
-        logging.basicConfig(level=logging.INFO, 
-                            format='%(asctime)s - LoRaTX - %(levelname)s - %(message)s')
+        # Logging setup: queued to a writer thread, per-packet messages rate-limited
+        setup_logging(format='%(asctime)s - LoRaTX - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         
         # ADR Manager
@@ -40,17 +60,31 @@ class LoRaTransmitter:
             initial_sf=initial_sf,
             initial_cr=initial_cr,
             initial_bw=initial_bw,
-            initial_tx_power=initial_tx_power
+            initial_tx_power=initial_tx_power,
+            duty_cycle=duty_cycle,
+            listen_before_talk=listen_before_talk,
+            radio=radio,
+            link_index=LinkIndex(link_index_file, cell_size=30.0) if link_index_file else None,
+            state_file=state_file,
+            objective=objective,
+            per_model=PERModel(per_model_file) if per_model_file else None
         )
         
         # Mission parameters
         self.mission_duration = mission_duration
         self.velocity = velocity
         
+        # Optional erasure coding; redundancy follows the receiver's loss reports
+        self.fec = FECEncoder(group_size=fec_group) if fec_group else None
+        
         # Tracking
         self.packets_sent = 0
         self.mission_start_time = 0
         
+        # Ledger entries of data and repair frames by data sequence number,
+        # resolved when the receiver's feedback covers that sequence number
+        self.pending_entries: 'OrderedDict[int, List[int]]' = OrderedDict()
+        
     def sync_with_receiver(self):
         """
         Send synchronization packet to receiver
@@ -61,13 +95,28 @@ class LoRaTransmitter:
         try:
             # Send sync packet with current parameters
             sync_data = f"SYNC|{self.adr_manager.current_bw}|{self.adr_manager.current_cr}|{self.adr_manager.current_sf}".encode("utf-8")
-            self.adr_manager.rfm9x.send(sync_data)
-            self.logger.info(f"Sent sync: BW={self.adr_manager.current_bw}, CR={self.adr_manager.current_cr}, SF={self.adr_manager.current_sf}")
+            entry_id = self.adr_manager.send(sync_data)
+            self.logger.info("Sent sync: BW=%d, CR=%d, SF=%d", self.adr_manager.current_bw,
+                             self.adr_manager.current_cr, self.adr_manager.current_sf)
             
             # Wait for receiver acknowledgment
             for _ in range(5):
                 ack = self.adr_manager.rfm9x.receive(timeout=2.0)
-                if ack and ack.decode("utf-8") == "READY":
+                is_ack, feedback = split_ack(ack)
+                if is_ack:
+                    self.adr_manager.ledger.confirm(entry_id)
+                    if feedback:
+                        # Forward-link metrics measured by the receiver
+                        self.adr_manager.update_from_feedback(feedback)
+                        self._confirm_delivery(feedback)
+                        if self.fec:
+                            self.fec.update_loss(feedback['lost'],
+                                                 feedback['seq_last'] - feedback['seq_first'] + 1)
+                        self.logger.info("Receiver feedback: packets %d-%d, lost %d, SNR %s..%s dB",
+                                         feedback['seq_first'], feedback['seq_last'], feedback['lost'],
+                                         feedback['snr_min'], feedback['snr_max'])
+                    else:
+                        self.adr_manager.update_link_quality(ack)
                     self.logger.info("Receiver synchronized")
                     return True
                 time.sleep(0.5)
@@ -78,29 +127,103 @@ class LoRaTransmitter:
             self.logger.error(f"Sync error: {e}")
             return False
     
-    def run_mission(self, packet_interval: float = 0.1, num_packets: int = 1000):
+    def _send_data(self, packet_data: bytes):
+        """
+        Send a data packet, framed and followed by repair packets when FEC is on
+        
+        The ledger entries of every frame sent are kept under the packet's
+        sequence number until receiver feedback resolves them.
+        
+        Args:
+            packet_data (bytes): Data packet
+        """
+        frames = self.fec.add(packet_data) if self.fec else [packet_data]
+        self._track(self.packets_sent, [self.adr_manager.send(frame) for frame in frames])
+    
+    def _track(self, seq: int, entry_ids: List[int]):
+        """
+        Keep ledger entries pending under a data sequence number
+        
+        Args:
+            seq (int): Data packet sequence number
+            entry_ids (list): Ledger entry ids of the frames sent for it
+        """
+        self.pending_entries.setdefault(seq, []).extend(entry_ids)
+        if len(self.pending_entries) > self.adr_manager.ledger.max_pending:
+            # Never covered by feedback; the ledger has evicted these too
+            _, stale = self.pending_entries.popitem(last=False)
+            for entry_id in stale:
+                self.adr_manager.ledger.confirm(entry_id, delivered=False)
+    
+    def _confirm_delivery(self, feedback: Dict[str, float]):
+        """
+        Resolve the ledger entries covered by a receiver feedback window
+        
+        The feedback carries the sequence range and a loss count but not
+        which packets were lost, so the first (range - lost) packets in the
+        range are confirmed as delivered and the rest as undelivered.
+        Packets before the range were not seen by the receiver and are
+        undelivered as well.
+        
+        Args:
+            feedback (dict): Decoded receiver feedback
+        """
+        # Sequence numbers travel as 16 bits; compare modulo 2^16
+        span = ((feedback['seq_last'] - feedback['seq_first']) & 0xFFFF) + 1
+        delivered = span - feedback['lost']
+        for seq in list(self.pending_entries):
+            offset = (seq - feedback['seq_first']) & 0xFFFF
+            if offset < span:
+                ok = delivered > 0
+                delivered -= 1
+            elif offset >= 0x8000:
+                # Sent before the window
+                ok = False
+            else:
+                # Sent after the window; resolved by a later report
+                continue
+            for entry_id in self.pending_entries.pop(seq):
+                self.adr_manager.ledger.confirm(entry_id, delivered=ok)
+    
+    def run_mission(self, packet_interval: Optional[float] = None, num_packets: int = 1000):
         """
         Execute mission with adaptive data rate
         
+        Packets are paced by the duty-cycle scheduler, which sleeps only as
+        long as the airtime budget requires.
+        
         Args:
-            packet_interval (float): Time between packets in seconds
+            packet_interval (float): Optional extra gap between packets in seconds
             num_packets (int): Maximum number of packets to send
         """
         try:
-            # Ensure sync before starting
-            if not self.sync_with_receiver():
-                self.logger.error("aborted due to sync failure")
-                return
+            if self.adr_manager.restored:
+                # The receiver restores the same settings from its own checkpoint;
+                # the next periodic resync reconciles them if it died mid-change
+                self.logger.info("Resuming with checkpointed ADR state, skipping initial sync")
+            else:
+                # Start from what earlier runs saw at the start of the mission
+                if self.adr_manager.link_index is not None:
+                    self.adr_manager.warm_start((0.0,))
+                
+                # Ensure sync before starting
+                if not self.sync_with_receiver():
+                    self.logger.error("aborted due to sync failure")
+                    return
             
             # Mission start
             self.mission_start_time = time.time()
+            self.adr_manager.ledger.start_mission(f"mission-{int(self.mission_start_time)}")
             self.logger.info("Mission started")
             
             while (time.time() - self.mission_start_time < self.mission_duration and 
                    self.packets_sent < num_packets):
                 
-                # Periodically adjust parameters (every 10 packets)
-                if self.packets_sent % 10 == 0:
+                # Index link measurements by time into the mission
+                self.adr_manager.set_position((time.time() - self.mission_start_time,))
+                
+                # Periodically adjust parameters (every 10 packets, earlier on a predicted fade)
+                if self.adr_manager.should_adjust():
                     sf, cr, bw, tp = self.adr_manager.adjust_parameters(self.velocity)
                     self.adr_manager.apply_parameters(sf, cr, bw, tp)
                     
@@ -110,17 +233,24 @@ class LoRaTransmitter:
                 
                 # Prepare and send packet
                 packet_data = f"CubeSat|{self.packets_sent}|TS:{int(time.time() * 1000)}".encode("utf-8")
-                self.adr_manager.rfm9x.send(packet_data)
+                self._send_data(packet_data)
                 
-                self.logger.info(f"Sent packet {self.packets_sent}")
+                self.logger.info("Sent packet %d", self.packets_sent)
                 self.packets_sent += 1
                 
-                time.sleep(packet_interval)
+                if packet_interval:
+                    time.sleep(packet_interval)
+            
+            # Repair frames for the last, partial FEC group
+            if self.fec:
+                entry_ids = [self.adr_manager.send(frame) for frame in self.fec.flush()]
+                if entry_ids:
+                    self._track(self.packets_sent - 1, entry_ids)
             
             # complete - send termination signal
             terminate_signal = "TERMINATE".encode("utf-8")
             for _ in range(3):
-                self.adr_manager.rfm9x.send(terminate_signal)
+                self.adr_manager.send(terminate_signal)
                 time.sleep(0.5)
             
             self.logger.info("completed")
@@ -129,6 +259,18 @@ class LoRaTransmitter:
             self.logger.error(f"error: {e}")
         finally:
             self.logger.info(f"Total packets sent: {self.packets_sent}")
+            if self.fec:
+                self.logger.info(f"FEC repair packets sent: {self.fec.repair_sent} "
+                                 f"(loss estimate {self.fec.loss_rate:.3f})")
+            self.adr_manager.log_energy_summary()
+            if self.adr_manager.link_index is not None:
+                self.adr_manager.link_index.save()
+                self.logger.info(f"Link index saved ({self.adr_manager.link_index.count} observations)")
+            if self.adr_manager.channel_access:
+                access = self.adr_manager.channel_access.stats()
+                self.logger.info(f"Channel access: {access['deferrals']} deferrals, "
+                                 f"{access['forced']} forced sends, "
+                                 f"mean backoff {access['mean_backoff_s']:.3f} s")
 
 def main():
     # Create and run transmitter
@@ -138,8 +280,7 @@ def main():
         initial_cr=5,
         initial_bw=125000,
         initial_tx_power=13,
-        mission_duration=3600.0,  # 1 hour ---- test, will need to change this
-        velocity=5.0  # Example velocity
+        mission_duration=3600.0  # 1 hour ---- test, will need to change this
     )
     transmitter.run_mission()
 
@@ -0,0 +1,217 @@
+# offline_eval.py - Counterfactual evaluation of ADR policies on logged missions
+import os
+import csv
+import sys
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from adr_benchmark import run_scenario
+from airtime import noise_floor, time_on_air, tx_energy
+from sim_channel import ReplayPathLoss, Scenario
+
+# Alternative policies: LoRaADRManager arguments and mobile_adr tuning constants
+DEFAULT_POLICIES: Dict[str, Dict] = {
+    'default': {},
+    'margin_3db': {'tuning': {'margin_db': 3.0}},
+    'margin_8db': {'tuning': {'margin_db': 8.0, 'max_margin_db': 13.0}},
+    'short_window': {'manager_kwargs': {'max_history': 10, 'adjust_every': 5}},
+    'long_window': {'manager_kwargs': {'max_history': 40, 'adjust_every': 20}},
+    'predictive': {'manager_kwargs': {'predictive': True}},
+}
+
+
+def _sequence_number(packet_data: str) -> Optional[int]:
+    # Transmitter packets are "CubeSat|<seq>|TS:<ms>"
+    fields = packet_data.split("|")
+    if len(fields) < 2 or not fields[1].isdigit():
+        return None
+    return int(fields[1])
+
+
+def load_mission(path: str, node: Optional[str] = None, noise_figure: float = 6.0) -> Dict:
+    """
+    Stream an adr_results.csv log into a replayable mission
+
+    Rows are read one at a time and only the path loss per packet is kept.
+    The loss is the logged TX power minus the received signal level; below
+    0 dB SNR the packet RSSI is dominated by noise, so the signal level is
+    taken from the SNR and the noise floor instead. Packets missing from
+    the transmitter's sequence numbers are counted as logged losses and
+    given send times spread evenly between their received neighbours.
+
+    Args:
+        path (str): CSV written by LoRaReceiver or the gateway pipeline
+        node (str): Only use rows of this node (gateway logs with a Node column)
+        noise_figure (float): Receiver noise figure in dB
+
+    Returns:
+        Dictionary with the replay scenario, packet count, send times, mean
+        packet interval and the airtime, energy and loss of the mission as flown
+    """
+    times: List[float] = []
+    losses: List[float] = []
+    send_times: List[float] = []
+    start: Optional[float] = None
+    last_seq: Optional[int] = None
+    received = lost = delivered_bytes = 0
+    airtime_s = energy_j = 0.0
+
+    with open(path, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if node is not None and row.get('Node', node) != node:
+                continue
+            try:
+                t = int(row['Timestamp']) / 1000.0
+                sf, cr, bw = int(row['SF']), int(row['CR']), int(row['Bandwidth'])
+                tp = float(row['TX Power'])
+                snr, rssi = float(row['SNR']), float(row['RSSI'])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            start = t if start is None else start
+            signal = snr + noise_floor(bw, noise_figure) if snr < 0 else rssi
+            times.append(t - start)
+            losses.append(tp - signal)
+
+            payload_len = len(row['Packet Data'].encode("utf-8"))
+            seq = _sequence_number(row['Packet Data'])
+            gap = seq - last_seq - 1 if seq is not None and last_seq is not None and seq > last_seq else 0
+            last_seq = seq if seq is not None else last_seq
+
+            if gap:
+                previous = send_times[-1]
+                step = (t - start - previous) / (gap + 1)
+                send_times.extend(previous + step * k for k in range(1, gap + 1))
+            send_times.append(t - start)
+
+            # Lost packets are charged at the settings of the next one received
+            sent = 1 + gap
+            received += 1
+            lost += gap
+            delivered_bytes += payload_len
+            airtime_s += sent * time_on_air(payload_len, sf, bw, cr)
+            energy_j += sent * tx_energy(payload_len, sf, bw, cr, tp)
+
+    if not times:
+        raise ValueError(f"No usable packets in {path}")
+
+    name = os.path.splitext(os.path.basename(path))[0] + (f":{node}" if node else "")
+    packets = received + lost
+    duration = times[-1]
+    interval = duration / (packets - 1) if packets > 1 else 1.0
+    return {
+        'name': name,
+        # One more interval so the last logged packet is replayed too
+        'scenario': Scenario(name=name, duration=duration + interval, velocity=0.0,
+                             path_loss=ReplayPathLoss(times, losses), shadowing_db=0.0),
+        'packets': packets,
+        'send_times': send_times,
+        'interval': interval,
+        'logged': {
+            'scenario': name,
+            'policy': 'logged',
+            'packets_sent': packets,
+            'per': lost / packets,
+            'airtime_s': airtime_s,
+            'energy_j': energy_j,
+            'energy_per_byte_j': energy_j / delivered_bytes if delivered_bytes else float('inf'),
+            'delivered_bytes': delivered_bytes,
+            'elapsed_s': duration,
+            'goodput_bps': 8 * delivered_bytes / duration if duration else 0.0,
+            'settings_changes': None,
+        },
+    }
+
+
+def _init_worker():
+    logging.getLogger('lora_adr_manager').setLevel(logging.CRITICAL)
+
+
+def replay_policy(mission: Dict, policy: Dict, **run_kwargs) -> Dict:
+    """
+    Run one ADR policy against a mission loaded by load_mission
+
+    The replayed channel already holds the measured fading, so velocity is
+    estimated from it and forward-link metrics are fed back as on the air.
+    Packets are sent at the logged send times rather than at a fixed
+    interval: the logged interval already includes the time on air and
+    acknowledgment of every packet, which the replay adds again.
+
+    Args:
+        mission (dict): Mission returned by load_mission
+        policy (dict): {'manager_kwargs': ..., 'tuning': ...}
+        **run_kwargs: Passed through to adr_benchmark.run_scenario
+
+    Returns:
+        Metric dictionary of run_scenario
+    """
+    return run_scenario(mission['scenario'],
+                        num_packets=mission['packets'],
+                        send_times=mission['send_times'],
+                        estimate_velocity=True,
+                        feedback=True,
+                        manager_kwargs=policy.get('manager_kwargs'),
+                        tuning=policy.get('tuning'),
+                        **run_kwargs)
+
+
+def _evaluate(mission: Dict, policy_name: str, policy: Dict, run_kwargs: Dict) -> Dict:
+    result = replay_policy(mission, policy, **run_kwargs)
+    result['policy'] = policy_name
+    return result
+
+
+def evaluate(paths: List[str],
+             policies: Optional[Dict[str, Dict]] = None,
+             max_workers: Optional[int] = None,
+             **run_kwargs) -> List[Dict]:
+    """
+    Replay logged missions through alternative ADR policies
+
+    Logs are loaded in parallel, then every (mission, policy) pair runs in
+    its own process. Each policy drives LoRaADRManager against the replayed
+    channel, so predicted loss is packets whose SNR under the policy's
+    settings would have been below the demodulation floor. Gaps between
+    logged packets are interpolated, which makes the estimate optimistic
+    inside long outages.
+
+    Args:
+        paths (list): adr_results.csv files
+        policies (dict): Policy name -> {'manager_kwargs': ..., 'tuning': ...}
+            (default DEFAULT_POLICIES)
+        max_workers (int): Worker processes (default: number of cores)
+        **run_kwargs: Passed through to adr_benchmark.run_scenario
+
+    Returns:
+        List of metric dictionaries, one per mission and policy, including the
+        mission as flown under policy 'logged'
+    """
+    policies = policies or DEFAULT_POLICIES
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+        missions = list(pool.map(load_mission, paths))
+        futures = [pool.submit(_evaluate, mission, name, policy, run_kwargs)
+                   for mission in missions
+                   for name, policy in policies.items()]
+
+        results = []
+        for i, mission in enumerate(missions):
+            results.append(mission['logged'])
+            results.extend(f.result() for f in futures[i * len(policies):(i + 1) * len(policies)])
+    return results
+
+
+def print_results(results: List[Dict]):
+    print(f"{'Mission':<20}{'Policy':<14}{'Sent':>6}{'PER':>8}{'Airtime (s)':>13}"
+          f"{'Energy (J)':>12}{'mJ/byte':>10}")
+    for r in results:
+        print(f"{r['scenario']:<20}{r['policy']:<14}{r['packets_sent']:>6}{r['per']:>8.3f}"
+              f"{r['airtime_s']:>13.2f}{r['energy_j']:>12.3f}{r['energy_per_byte_j'] * 1000:>10.4f}")
+
+
+def main():
+    paths = sys.argv[1:] or ['adr_results.csv']
+    print_results(evaluate(paths))
+
+if __name__ == "__main__":
+    main()
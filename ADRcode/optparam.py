@@ -1,5 +1,152 @@
 import math
-from typing import List, Tuple
+import time
+from typing import List, Optional, Tuple
+
+from airtime import SNR_FLOOR, time_on_air
+
+SPREADING_FACTORS = [7, 8, 9, 10, 11, 12]
+# The RFM9x PA_BOOST output (high_power mode) accepts 5-23 dBm
+TX_POWERS = [5, 8, 11, 14, 17, 20]
+
+def link_margin(snr_max: float,
+                snr_min: float,
+                rssi_min: float,
+                velocity: float,
+                margin_db: float = 5.0,
+                max_margin_db: float = 10.0,
+                d0: float = 1.0,
+                min_sensi: float = -137) -> float:
+    """
+    Closed-form link margin of the Mobile ADR algorithm.
+
+    The margin combines distance, SNR spread and velocity terms, bounded
+    to [margin_db, max_margin_db], so it is computed in constant time.
+
+    Args:
+        snr_max: Maximum SNR over the window
+        snr_min: Minimum SNR over the window
+        rssi_min: Minimum RSSI over the window
+        velocity: Node movement speed
+        margin_db: Lower bound of the margin in dB
+        max_margin_db: Upper bound of the margin in dB
+        d0: Reference distance (default 1.0)
+        min_sensi: Minimum sensitivity (default -137)
+
+    Returns:
+        float: Margin in dB
+    """
+    # Adjust M based on velocity, kept within the 1-20 message window
+    M = max(1.0, min(20.0, 20 - (velocity / 10) * 20))
+
+    # Calculate maximum distance
+    maxdist = d0 * 10 ** ((rssi_min - min_sensi) / (10 * M))
+
+    margin = 1/3 * (
+        (d0 / maxdist) * 10 +
+        (snr_max - snr_min) / 5 * 10 +
+        velocity / 10 * 10
+    )
+    return min(max(margin, margin_db), max_margin_db)
+
+
+def select_sf_bw(snr_req: float,
+                 bw_last: int,
+                 bandwidth: List[int],
+                 payload_len: int = 32,
+                 deadline: Optional[float] = None) -> Tuple[int, int]:
+    """
+    Pick the (SF, BW) pair with minimum time on air that meets the SNR requirement.
+
+    SNR scales with bandwidth, so the requirement measured at bw_last is
+    shifted by the noise difference of each candidate bandwidth.
+
+    Args:
+        snr_req: SNR available after the margin, measured at bw_last
+        bw_last: Bandwidth in Hz the SNR samples were measured at
+        bandwidth: List of available bandwidths in Hz
+        payload_len: Payload length used to compare time on air
+        deadline: time.perf_counter() value after which the search is abandoned
+
+    Returns:
+        Tuple[int, int]: Selected (SF, BW) pair, or the most robust pair
+        if no candidate meets the requirement
+    """
+    best = None
+    for sf in SPREADING_FACTORS:
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError("ADR decision deadline exceeded")
+        for bw in bandwidth:
+            snr_at_bw = snr_req - 10 * math.log10(bw / bw_last)
+            if snr_at_bw < SNR_FLOOR[sf]:
+                continue
+            toa = time_on_air(payload_len, sf, bw, 5)
+            if best is None or toa < best[0]:
+                best = (toa, sf, bw)
+
+    if best is None:
+        return SPREADING_FACTORS[-1], min(bandwidth)
+    return best[1], best[2]
+
+
+def adr_decision(sf_last: int,
+                 bandwidth: List[int],
+                 current_tp: float,
+                 margin_db: float,
+                 M: int,
+                 velocity: float,
+                 ack_enabled: bool,
+                 last_mul_packets_snr: List[float],
+                 last_mul_packets_rssi: List[float],
+                 d0: float = 1.0,
+                 min_sensi: float = -137,
+                 bw_last: int = 125000,
+                 max_margin_db: float = 10.0,
+                 deadline: Optional[float] = None) -> Tuple[int, int, float]:
+    """
+    Mobile ADR decision including the bandwidth choice.
+
+    Runs in bounded time: one pass over the window, a closed-form margin
+    and a scan of the fixed SF x BW candidate set.
+
+    Args:
+        See mobile_adr, plus:
+        bw_last: Bandwidth in Hz the SNR samples were measured at
+        max_margin_db: Upper bound of the margin in dB
+        deadline: time.perf_counter() value after which the decision raises
+            TimeoutError so the caller can fall back
+
+    Returns:
+        Tuple[int, int, float]: Selected (SF, BW, TP)
+    """
+    if not ack_enabled:
+        return sf_last, bw_last, current_tp
+
+    # Get SNR values
+    snr_max = max(last_mul_packets_snr)
+    snr_min = min(last_mul_packets_snr)
+
+    # Get minimum RSSI
+    rssi_min = min(last_mul_packets_rssi)
+
+    margin_db = link_margin(snr_max, snr_min, rssi_min, velocity,
+                            margin_db=margin_db, max_margin_db=max_margin_db,
+                            d0=d0, min_sensi=min_sensi)
+
+    # Calculate required SNR and select the ToA_min SF/BW that satisfies it
+    snr_req = snr_min - margin_db
+    sf, bw = select_sf_bw(snr_req, bw_last, bandwidth, deadline=deadline)
+    tp = min(max(current_tp, TX_POWERS[0]), TX_POWERS[-1])
+
+    # Adjust TP based on SF changes within the radio's range; only lower it
+    # when the chosen SF/BW still meets the requirement with 3 dB less power
+    headroom = snr_req - 10 * math.log10(bw / bw_last) - SNR_FLOOR[sf]
+    if sf - sf_last < 0 and headroom >= 3:
+        tp = max(tp - 3, TX_POWERS[0])
+    elif sf - sf_last > 0:
+        tp = min(tp + 3, TX_POWERS[-1])
+
+    return sf, bw, tp
+
 
 def mobile_adr(sf_last: int, 
               bandwidth: List[int], 
@@ -11,14 +158,17 @@ def mobile_adr(sf_last: int,
               last_mul_packets_snr: List[float],
               last_mul_packets_rssi: List[float],
               d0: float = 1.0,
-              min_sensi: float = -137) -> Tuple[int, float]:
+              min_sensi: float = -137,
+              bw_last: int = 125000,
+              max_margin_db: float = 10.0,
+              deadline: Optional[float] = None) -> Tuple[int, float]:
     """
     Mobile ADR algorithm implementation.
     
     Args:
         sf_last: Last spreading factor used (7-12)
-        bandwidth: List of available bandwidths [125, 250, 500] kHz
-        current_tp: Current transmission power (2-14 dBm)
+        bandwidth: List of available bandwidths [125000, 250000, 500000] Hz
+        current_tp: Current transmission power (5-20 dBm)
         margin_db: Current margin in dB (5-10)
         M: Number of messages (1-20)
         velocity: Node movement speed
@@ -27,58 +177,25 @@ def mobile_adr(sf_last: int,
         last_mul_packets_rssi: List of RSSI values from last MUL packets
         d0: Reference distance (default 1.0)
         min_sensi: Minimum sensitivity (default -137)
+        bw_last: Bandwidth in Hz the SNR samples were measured at
+        max_margin_db: Upper bound of the margin in dB
+        deadline: time.perf_counter() value after which the decision raises
+            TimeoutError
     
     Returns:
         Tuple[int, float]: Selected (SF, TP) pair
     """
-    if not ack_enabled:
-        return sf_last, current_tp
-    
-    # Adjust M based on velocity
-    M = 20 - (velocity / 10) * 20
-    
-    # Get SNR values
-    snr_max = max(last_mul_packets_snr)
-    snr_min = min(last_mul_packets_snr)
-    
-    # Get minimum RSSI
-    rssi_min = min(last_mul_packets_rssi)
-    
-    # Calculate maximum distance
-    maxdist = d0 * 10 ** ((rssi_min - min_sensi) / (10 * M))
-    
-    # Calculate margin_db
-    while margin_db <= 10:
-        margin_db = 1/3 * (
-            (d0 / maxdist) * 10 +
-            (snr_max - snr_min) / 5 * 10 +
-            velocity / 10 * 10
-        )
-    
-    # Calculate required SNR and RSSI
-    snr_req = snr_min - margin_db
-    rssi_req = rssi_min - margin_db
-    
-    # Select SF and BW to satisfy requirements
-    # Note: This is a simplified version of ToA_min selection
-    # In practice, you would need to implement a more sophisticated
-    # selection algorithm based on your specific requirements
-    sf = sf_last
-    tp = current_tp
-    
-    # Adjust TP based on SF changes
-    if sf - sf_last < 0 and tp > 2:
-        tp = tp - 3
-    elif sf - sf_last > 0 and tp < 14:
-        tp = tp + 3
-    
+    sf, _, tp = adr_decision(sf_last, bandwidth, current_tp, margin_db, M, velocity,
+                             ack_enabled, last_mul_packets_snr, last_mul_packets_rssi,
+                             d0=d0, min_sensi=min_sensi, bw_last=bw_last,
+                             max_margin_db=max_margin_db, deadline=deadline)
     return sf, tp
 
 # # Example usage
 # def example_usage():
 #     # Example parameters
 #     sf_last = 7
-#     bandwidth = [125, 250, 500]
+#     bandwidth = [125000, 250000, 500000]
 #     current_tp = 10
 #     margin_db = 5
 #     M = 10
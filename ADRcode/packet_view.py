@@ -0,0 +1,151 @@
+# packet_view.py - Zero-copy packet receive and in-place packet parsing
+import inspect
+from typing import Optional
+
+# RadioHead header returned by adafruit_rfm9x when receiving with_header=True
+RADIOHEAD_HEADER_LEN = 4
+
+
+class PacketView:
+    def __init__(self,
+                 buffer: bytearray,
+                 length: int,
+                 offset: int = 0,
+                 separator: bytes = b"|"):
+        """
+        Read-only view of a received packet that parses fields in place
+
+        Fields are located with bytearray.find on the underlying buffer and
+        handed out as memoryview slices, so no str or bytes objects are
+        created unless a consumer asks for the text.
+
+        Args:
+            buffer (bytearray): Buffer holding the packet
+            length (int): Number of valid bytes in the buffer
+            offset (int): Start of the payload (after any driver header)
+            separator (bytes): Field separator of the text protocol
+        """
+        self.buffer = buffer
+        self.start = offset
+        self.end = length
+        self.separator = separator
+        self.view = memoryview(buffer)[offset:length]
+        self._text: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def startswith(self, prefix: bytes) -> bool:
+        return self.buffer.startswith(prefix, self.start, self.end)
+
+    def equals(self, other: bytes) -> bool:
+        return len(self) == len(other) and self.startswith(other)
+
+    def field_bounds(self, index: int) -> Optional[tuple]:
+        """
+        Start and end offsets of a separator-delimited field
+
+        Args:
+            index (int): Field number, starting at 0
+
+        Returns:
+            Tuple of (start, end) in the buffer, or None if there is no such field
+        """
+        start = self.start
+        for _ in range(index):
+            pos = self.buffer.find(self.separator, start, self.end)
+            if pos < 0:
+                return None
+            start = pos + 1
+        end = self.buffer.find(self.separator, start, self.end)
+        return start, (self.end if end < 0 else end)
+
+    def field(self, index: int) -> Optional[memoryview]:
+        """
+        A field as a memoryview slice of the buffer (no copy)
+
+        Args:
+            index (int): Field number, starting at 0
+
+        Returns:
+            memoryview of the field, or None if there is no such field
+        """
+        bounds = self.field_bounds(index)
+        if bounds is None:
+            return None
+        return memoryview(self.buffer)[bounds[0]:bounds[1]]
+
+    def field_int(self, index: int, skip: int = 0) -> Optional[int]:
+        """
+        Parse a decimal integer field in place
+
+        Args:
+            index (int): Field number, starting at 0
+            skip (int): Bytes to skip at the start of the field (e.g. 3 for "TS:")
+
+        Returns:
+            The integer, or None if the field is missing or not a number
+        """
+        bounds = self.field_bounds(index)
+        if bounds is None:
+            return None
+        try:
+            return int(memoryview(self.buffer)[bounds[0] + skip:bounds[1]])
+        except ValueError:
+            return None
+
+    @property
+    def text(self) -> str:
+        """
+        The payload decoded as UTF-8, decoded on first access only
+        """
+        if self._text is None:
+            self._text = str(self.view, "utf-8")
+        return self._text
+
+    def release(self):
+        """
+        Release the memoryview over the buffer; the view must not be used afterwards
+        """
+        self.view.release()
+
+
+class PacketReceiver:
+    def __init__(self, radio):
+        """
+        Receive packets as views over the driver's own buffer
+
+        The RFM9x driver reads the FIFO into a fresh bytearray; asked for
+        the packet with its RadioHead header it returns that bytearray
+        without slicing off a copy, and the header is skipped by the view
+        offset instead. Radios without with_header support (e.g. simulated
+        ones) are read as plain payloads.
+
+        Args:
+            radio: RFM9x (or simulated) radio
+        """
+        self.radio = radio
+        try:
+            self._with_header = 'with_header' in inspect.signature(radio.receive).parameters
+        except (TypeError, ValueError):
+            self._with_header = False
+
+    def receive(self, timeout: float = 0.5) -> Optional[PacketView]:
+        """
+        Receive one packet
+
+        Args:
+            timeout (float): Receive timeout in seconds
+
+        Returns:
+            PacketView over the received bytes (call release() when done), or None
+        """
+        if self._with_header:
+            packet = self.radio.receive(timeout=timeout, with_header=True)
+            offset = RADIOHEAD_HEADER_LEN
+        else:
+            packet = self.radio.receive(timeout=timeout)
+            offset = 0
+        if not packet:
+            return None
+        return PacketView(packet, len(packet), offset=offset)
@@ -0,0 +1,367 @@
+# per_model.py - Logistic PER curves fitted from sweep data, with a goodput-maximizing ADR decision
+import os
+import re
+import csv
+import sys
+import json
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from airtime import SNR_FLOOR, time_on_air, tx_energy
+
+SPREADING_FACTORS = [7, 8, 9, 10, 11, 12]
+CODING_RATES = [5, 6, 7, 8]
+
+# Slope of the default curves in 1/dB: PER goes from 88 % to 12 % within
+# +-1 dB of the datasheet floor
+DEFAULT_SLOPE = 2.0
+
+# Measurement at one setting: (sf, cr, mean SNR in dB, packets sent, packets lost)
+PERPoint = Tuple[int, int, float, int, int]
+
+CHARACTERIZATION_NAME = re.compile(r'LoRa_433_tx_(-?\d+)_bd_(\d+)_cr_(\d+)_sf_(\d+)_atten_(-?\d+)\.csv$')
+
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+class PERModel:
+    def __init__(self,
+                 path: Optional[str] = None,
+                 snr_min: float = -30.0,
+                 snr_max: float = 15.0,
+                 step: float = 0.25):
+        """
+        Packet error rate as a function of SNR per (SF, CR), tabulated for fast lookup
+
+        Each curve is logistic, PER(snr) = 1 / (1 + exp(slope * (snr - snr50))),
+        stored as its two parameters and expanded into a table over
+        [snr_min, snr_max] in `step` dB, so a lookup is an index computation.
+        Settings without fitted data use a default curve centred on the
+        datasheet SNR floor. SNR is per bandwidth, so the curves do not
+        depend on it.
+
+        Args:
+            path (str): JSON file of fitted curves to load (None: defaults only)
+            snr_min (float): Lowest tabulated SNR in dB (PER is clamped below)
+            snr_max (float): Highest tabulated SNR in dB (PER is clamped above)
+            step (float): Table resolution in dB
+        """
+        self.snr_min = snr_min
+        self.snr_max = snr_max
+        self.step = step
+        self.size = int(round((snr_max - snr_min) / step)) + 1
+        self.curves: Dict[Tuple[int, int], Tuple[float, float]] = {}
+        self._tables: Dict[Tuple[int, int], List[float]] = {}
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def curve(self, sf: int, cr: int) -> Tuple[float, float]:
+        """
+        Logistic parameters of a setting
+
+        Returns:
+            Tuple of (snr50 in dB, slope in 1/dB)
+        """
+        return self.curves.get((sf, cr), (SNR_FLOOR[sf], DEFAULT_SLOPE))
+
+    def censored_snr(self, sf: int, cr: int) -> float:
+        """
+        SNR sample standing in for a packet lost at a setting
+
+        A lost packet yields no SNR measurement, only that the SNR was
+        probably below the curve; counting it at the point of 98 % PER keeps
+        a window of delivered packets' samples from looking optimistic.
+
+        Returns:
+            SNR in dB
+        """
+        snr50, slope = self.curve(sf, cr)
+        return snr50 - 2.0 / slope
+
+    def table(self, sf: int, cr: int) -> List[float]:
+        """
+        PER at snr_min, snr_min + step, ... snr_max for a setting
+        """
+        table = self._tables.get((sf, cr))
+        if table is None:
+            snr50, slope = self.curve(sf, cr)
+            table = self._tables[(sf, cr)] = [
+                1.0 - _sigmoid(slope * (self.snr_min + i * self.step - snr50))
+                for i in range(self.size)]
+        return table
+
+    def per(self, snr: float, sf: int, cr: int) -> float:
+        """
+        Expected packet error rate
+
+        Args:
+            snr (float): SNR in dB
+            sf (int): Spreading Factor
+            cr (int): Coding Rate
+
+        Returns:
+            PER between 0 and 1
+        """
+        i = int(round((snr - self.snr_min) / self.step))
+        return self.table(sf, cr)[min(max(i, 0), self.size - 1)]
+
+    def fit(self,
+            points: Iterable[PERPoint],
+            prior_weight: float = 1.0,
+            iterations: int = 25) -> Dict[Tuple[int, int], Tuple[float, float]]:
+        """
+        Fit the curves of every setting that has measurements
+
+        Maximum a posteriori logistic regression of the delivered fraction on
+        SNR, with a Gaussian prior pulling each curve toward the default. The
+        prior keeps the fit finite when a setting was only measured where it
+        lost everything or nothing.
+
+        Args:
+            points (iterable): (sf, cr, mean SNR, packets sent, packets lost) measurements
+            prior_weight (float): Precision of the prior on both parameters
+            iterations (int): Newton iterations per setting
+
+        Returns:
+            Dictionary of the fitted (snr50, slope) per (sf, cr)
+        """
+        grouped: Dict[Tuple[int, int], List[Tuple[float, int, int]]] = defaultdict(list)
+        for sf, cr, snr, sent, lost in points:
+            if sent > 0:
+                grouped[(int(sf), int(cr))].append((float(snr), int(sent), int(lost)))
+
+        fitted = {}
+        for (sf, cr), rows in grouped.items():
+            # Delivery probability sigmoid(a + b * (snr - floor)); the prior is
+            # centred on the default curve, a = 0 and b = DEFAULT_SLOPE
+            floor = SNR_FLOOR[sf]
+
+            def log_posterior(a: float, b: float) -> float:
+                total = -prior_weight / 2 * (a * a + (b - DEFAULT_SLOPE) ** 2)
+                for snr, sent, lost in rows:
+                    z = a + b * (snr - floor)
+                    # log sigmoid(z) and log(1 - sigmoid(z)), stable for large |z|
+                    log_p = -math.log1p(math.exp(-z)) if z > -30 else z
+                    log_q = -math.log1p(math.exp(z)) if z < 30 else -z
+                    total += (sent - lost) * log_p + lost * log_q
+                return total
+
+            a, b = 0.0, DEFAULT_SLOPE
+            current = log_posterior(a, b)
+            for _ in range(iterations):
+                ga = -prior_weight * a
+                gb = -prior_weight * (b - DEFAULT_SLOPE)
+                haa = hbb = prior_weight
+                hab = 0.0
+                for snr, sent, lost in rows:
+                    x = snr - floor
+                    p = _sigmoid(a + b * x)
+                    residual = (sent - lost) - sent * p
+                    w = sent * p * (1.0 - p)
+                    ga += residual
+                    gb += residual * x
+                    haa += w
+                    hab += w * x
+                    hbb += w * x * x
+                det = haa * hbb - hab * hab
+                da = (hbb * ga - hab * gb) / det
+                db = (haa * gb - hab * ga) / det
+                # Halve the Newton step until it improves the fit; a full step
+                # overshoots when the start is far from the data
+                for _ in range(30):
+                    candidate = log_posterior(a + da, b + db)
+                    if candidate >= current:
+                        break
+                    da, db = da / 2, db / 2
+                else:
+                    break
+                a, b, current = a + da, b + db, candidate
+                if abs(da) < 1e-6 and abs(db) < 1e-6:
+                    break
+            # A curve must fall with SNR; a flat or inverted fit means no information
+            b = max(b, 0.1)
+            fitted[(sf, cr)] = (floor - a / b, b)
+
+        self.curves.update(fitted)
+        for key in fitted:
+            self._tables.pop(key, None)
+        return fitted
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({
+                'curves': [[sf, cr, round(snr50, 3), round(slope, 3)]
+                           for (sf, cr), (snr50, slope) in sorted(self.curves.items())],
+            }, f)
+
+    def load(self, path: str):
+        """
+        Add the curves stored in a file
+
+        Args:
+            path (str): JSON file written by save()
+        """
+        with open(path) as f:
+            stored = json.load(f)
+        for sf, cr, snr50, slope in stored['curves']:
+            self.curves[(sf, cr)] = (snr50, slope)
+            self._tables.pop((sf, cr), None)
+
+
+def load_sweep_results(path: str) -> List[PERPoint]:
+    """
+    PER measurements from the results CSV of the HDR sweep receiver (lora_rx_flag)
+
+    Rows without a mean SNR (older files, or settings that received
+    nothing) are skipped: their SNR is unknown.
+
+    Args:
+        path (str): CSV written by lora_rx_flag.run
+
+    Returns:
+        List of (sf, cr, mean SNR, packets sent, packets lost)
+    """
+    points = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            snr = row.get('Mean SNR (dB)')
+            if not snr:
+                continue
+            received, dropped = int(row['Received Packets']), int(row['Dropped Packets'])
+            points.append((int(row['Spreading Factor']), int(row['Coding Rate']),
+                           float(snr), received + dropped, dropped))
+    return points
+
+
+def load_characterization(directory: str) -> List[PERPoint]:
+    """
+    PER measurements from lora_rx_characterization CSV files
+
+    Losses are counted from gaps in the sequence numbers, so files
+    recorded before the transmitter numbered its packets are skipped.
+
+    Args:
+        directory (str): Directory holding the characterization CSV files
+
+    Returns:
+        List of (sf, cr, mean SNR, packets sent, packets lost), one per file
+    """
+    points = []
+    for name in sorted(os.listdir(directory)):
+        match = CHARACTERIZATION_NAME.search(name)
+        if not match:
+            continue
+        _, _, cr, sf, _ = (int(v) for v in match.groups())
+        with open(os.path.join(directory, name), newline='') as f:
+            rows = [row for row in csv.DictReader(f) if row.get('seq')]
+        if not rows:
+            continue
+        seqs = {int(float(row['seq'])) for row in rows}
+        sent = max(seqs) - min(seqs) + 1
+        snr = sum(float(row['snr']) for row in rows) / len(rows)
+        points.append((sf, cr, snr, sent, sent - len(seqs)))
+    return points
+
+
+def goodput_decision(snr_samples: Sequence[float],
+                     bw_last: int,
+                     tp_last: float,
+                     per_model: PERModel,
+                     bandwidths: Sequence[int],
+                     tx_powers: Sequence[float],
+                     interval: float = 0.0,
+                     spreading_factors: Sequence[int] = SPREADING_FACTORS,
+                     coding_rates: Sequence[int] = CODING_RATES,
+                     payload_len: int = 32,
+                     tolerance: float = 0.02,
+                     deadline: Optional[float] = None) -> Tuple[int, int, int, float]:
+    """
+    Pick the (SF, CR, BW, TP) with the highest expected goodput
+
+    Expected goodput is payload_len / (time_on_air + interval) x (1 - PER), the PER
+    averaged over the SNR samples shifted to each candidate's bandwidth
+    and power, so a fading window counts its deep samples rather than its
+    mean. More power never lowers goodput, so among the candidates within
+    `tolerance` of the best one the cheapest in energy per delivered byte
+    is chosen.
+
+    Args:
+        snr_samples (sequence): Recent SNR samples in dB, measured at bw_last and tp_last
+        bw_last (int): Bandwidth in Hz the samples were measured at
+        tp_last (float): TX power in dBm the samples were measured at
+        per_model (PERModel): PER curves
+        bandwidths (sequence): Candidate bandwidths in Hz
+        tx_powers (sequence): Candidate TX powers in dBm (tp_last is always a candidate)
+        interval (float): Idle time between packets in seconds (0: back to back or
+            duty-cycle paced, where the period scales with the airtime)
+        spreading_factors (sequence): Candidate spreading factors
+        coding_rates (sequence): Candidate coding rates
+        payload_len (int): Payload length the goodput is computed for
+        tolerance (float): Goodput fraction given up for lower energy
+        deadline (float): time.perf_counter() value after which the decision raises TimeoutError
+
+    Returns:
+        Tuple of (spreading_factor, coding_rate, bandwidth, tx_power)
+    """
+    powers = sorted(set(tx_powers) | {tp_last})
+    # Samples as table indices; a candidate shifts them all by one offset,
+    # and candidates with the same offset share the window PER
+    base = [int(round((snr - per_model.snr_min) / per_model.step)) for snr in snr_samples]
+    last = per_model.size - 1
+    candidates = []
+    for sf in spreading_factors:
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError("ADR decision deadline exceeded")
+        for cr in coding_rates:
+            table = per_model.table(sf, cr)
+            window_per: Dict[int, float] = {}
+            for bw in bandwidths:
+                toa = time_on_air(payload_len, sf, bw, cr)
+                bw_shift = -10 * math.log10(bw / bw_last)
+                for tp in powers:
+                    offset = int(round((tp - tp_last + bw_shift) / per_model.step))
+                    per = window_per.get(offset)
+                    if per is None:
+                        per = window_per[offset] = (
+                            sum(table[min(max(i + offset, 0), last)] for i in base) / len(base))
+                    delivered = 1.0 - per
+                    goodput = payload_len / (toa + interval) * delivered
+                    energy = (tx_energy(payload_len, sf, bw, cr, tp) / (payload_len * delivered)
+                              if delivered > 0 else math.inf)
+                    candidates.append((goodput, energy, sf, cr, bw, tp))
+
+    best = max(c[0] for c in candidates)
+    _, _, sf, cr, bw, tp = min((c for c in candidates if c[0] >= (1 - tolerance) * best),
+                               key=lambda c: c[1])
+    return sf, cr, bw, tp
+
+
+def main():
+    # Fit from HDR sweep result files and characterization directories
+    paths = sys.argv[1:] or ['rf_results.csv', 'test_data']
+    points: List[PERPoint] = []
+    for path in paths:
+        if os.path.isdir(path):
+            points.extend(load_characterization(path))
+        elif os.path.exists(path):
+            points.extend(load_sweep_results(path))
+    print(f"{len(points)} measurements from {', '.join(paths)}")
+
+    model = PERModel()
+    fitted = model.fit(points)
+    for (sf, cr), (snr50, slope) in sorted(fitted.items()):
+        print(f"SF{sf} CR4/{cr}: PER 50 % at {snr50:6.2f} dB "
+              f"(datasheet floor {SNR_FLOOR[sf]:6.2f} dB), slope {slope:.2f}/dB")
+    if fitted:
+        model.save('per_model.json')
+        print("Saved per_model.json")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# radio_config.py - Change-only, coalesced radio reconfiguration
+import time
+from collections import deque
+from typing import Any, Dict
+
+# Radio properties managed by the configurator, in the order they are written
+RADIO_SETTINGS = ('spreading_factor', 'coding_rate', 'signal_bandwidth', 'tx_power')
+
+
+class RadioConfigurator:
+    def __init__(self, radio, history: int = 100):
+        """
+        Apply radio settings by diffing against a cached copy of the radio state
+
+        Every property write on the RFM9x is an SPI transaction, so unchanged
+        settings are skipped and the real changes are written back to back
+        inside a single standby window.
+
+        Args:
+            radio: RFM9x (or simulated) radio to configure
+            history (int): Number of reconfiguration latencies to keep
+        """
+        self.radio = radio
+        self.state: Dict[str, Any] = {}
+        self.latencies = deque(maxlen=history)
+        self.writes = 0
+        self.skipped = 0
+
+    def sync_from_radio(self) -> Dict[str, Any]:
+        """
+        Refresh the cache by reading the current settings back from the radio
+
+        Returns:
+            The cached radio state
+        """
+        for name in RADIO_SETTINGS:
+            self.state[name] = getattr(self.radio, name)
+        return self.state
+
+    def apply(self, **settings) -> Dict[str, Any]:
+        """
+        Write the settings that differ from the cached radio state
+
+        Args:
+            **settings: Radio property names (spreading_factor, coding_rate,
+                signal_bandwidth, tx_power) and their new values
+
+        Returns:
+            Dictionary of the settings that were actually written
+        """
+        unknown = set(settings) - set(RADIO_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown radio settings: {sorted(unknown)}")
+
+        changed = {name: value for name, value in settings.items()
+                   if self.state.get(name) != value}
+        self.skipped += len(settings) - len(changed)
+        if not changed:
+            return changed
+
+        start = time.perf_counter()
+        # Enter standby once so the modem config registers change together
+        idle = getattr(self.radio, 'idle', None)
+        if idle is not None:
+            idle()
+        for name in sorted(changed, key=RADIO_SETTINGS.index):
+            setattr(self.radio, name, changed[name])
+            # Cache each write as it lands, so a rejected setting leaves
+            # the cache matching the radio
+            self.state[name] = changed[name]
+            self.writes += 1
+        self.latencies.append(time.perf_counter() - start)
+
+        return changed
+
+    def invalidate(self):
+        """
+        Forget the cached state, e.g. after a radio reset
+        """
+        self.state.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Reconfiguration counters and latency statistics
+
+        Returns:
+            Dictionary with write/skip counts and latency mean/max in seconds
+        """
+        count = len(self.latencies)
+        return {
+            'reconfigurations': count,
+            'writes': self.writes,
+            'skipped_writes': self.skipped,
+            'latency_mean_s': sum(self.latencies) / count if count else 0.0,
+            'latency_max_s': max(self.latencies) if count else 0.0,
+        }
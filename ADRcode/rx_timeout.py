@@ -0,0 +1,105 @@
+# rx_timeout.py - Receive timeouts derived from airtime, packet interval and arrival jitter
+import time
+from typing import Optional
+
+from airtime import time_on_air
+
+
+class ReceiveTimeout:
+    def __init__(self,
+                 interval: float = 1.0,
+                 payload_len: int = 64,
+                 k: float = 4.0,
+                 alpha: float = 0.125,
+                 beta: float = 0.25,
+                 min_timeout: float = 0.05,
+                 max_timeout: float = 30.0,
+                 max_backoff: int = 3):
+        """
+        Receive timeout that follows the radio settings and the traffic
+
+        The gap between packets is split into the airtime of the expected
+        packet and the sender's idle time. The idle time is tracked with a
+        smoothed mean and mean deviation in the style of the TCP
+        retransmission timer (RFC 6298), so the timeout is
+
+            airtime + idle mean + k * idle deviation
+
+        The airtime part changes immediately with the settings, while the
+        idle part is learned from arrivals. Consecutive misses double the
+        timeout up to max_backoff times, so a sender that pauses does not
+        produce a burst of timeouts.
+
+        Args:
+            interval (float): Expected idle time between packets before any arrival is seen
+            payload_len (int): Expected payload length in bytes
+            k (float): Weight of the idle-time deviation
+            alpha (float): Smoothing factor of the idle-time mean
+            beta (float): Smoothing factor of the idle-time deviation
+            min_timeout (float): Lower bound in seconds
+            max_timeout (float): Upper bound in seconds
+            max_backoff (int): Maximum number of timeout doublings after misses
+        """
+        self.payload_len = payload_len
+        self.k = k
+        self.alpha = alpha
+        self.beta = beta
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_backoff = max_backoff
+
+        self.airtime = 0.0
+        self.idle_mean = interval
+        self.idle_dev = interval / 4
+        self.samples = 0
+        self.misses = 0
+        self._last_arrival: Optional[float] = None
+
+    def set_settings(self, sf: int, bw: int, cr: int):
+        """
+        Recompute the airtime part for new radio settings
+
+        Args:
+            sf (int): Spreading Factor
+            bw (int): Bandwidth in Hz
+            cr (int): Coding Rate
+        """
+        self.airtime = time_on_air(self.payload_len, sf, bw, cr)
+
+    def arrival(self, now: Optional[float] = None):
+        """
+        Record a received packet
+
+        Args:
+            now (float): Receive time in seconds (default: time.monotonic())
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_arrival is not None:
+            idle = max(now - self._last_arrival - self.airtime, 0.0)
+            if self.samples == 0:
+                self.idle_mean = idle
+                self.idle_dev = idle / 2
+            else:
+                self.idle_dev = (1 - self.beta) * self.idle_dev + self.beta * abs(self.idle_mean - idle)
+                self.idle_mean = (1 - self.alpha) * self.idle_mean + self.alpha * idle
+            self.samples += 1
+        self._last_arrival = now
+        self.misses = 0
+
+    def miss(self):
+        """
+        Record a receive that timed out
+
+        The gap spanning a miss is not sampled, since it holds an unknown
+        number of lost packets.
+        """
+        self._last_arrival = None
+        self.misses += 1
+
+    def timeout(self) -> float:
+        """
+        Timeout for the next receive in seconds
+        """
+        base = self.airtime + self.idle_mean + self.k * self.idle_dev
+        base *= 2 ** min(self.misses, self.max_backoff)
+        return min(max(base, self.min_timeout), self.max_timeout)
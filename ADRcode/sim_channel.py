@@ -0,0 +1,332 @@
+# sim_channel.py - Simulated mobility channels and a drop-in simulated RFM9x radio
+import math
+import random
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional
+
+from airtime import SNR_FLOOR, noise_floor, time_on_air
+from link_feedback import ForwardLinkWindow
+
+# Free-space path loss at 1 m for 433 MHz (dB)
+PATH_LOSS_D0 = 25.2
+
+
+def log_distance_path_loss(distance: float, exponent: float = 2.7) -> float:
+    """
+    Log-distance path loss referenced to 1 m at 433 MHz
+
+    Args:
+        distance (float): Link distance in meters
+        exponent (float): Path loss exponent
+
+    Returns:
+        Path loss in dB
+    """
+    return PATH_LOSS_D0 + 10 * exponent * math.log10(max(distance, 1.0))
+
+
+class SimClock:
+    """
+    Simulated mission clock shared by the channel and the radio
+    """
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class Scenario:
+    def __init__(self,
+                 name: str,
+                 duration: float,
+                 velocity: float,
+                 path_loss: Callable[[float], float],
+                 shadowing_db: float = 1.0,
+                 coherence_time: float = 10.0,
+                 rayleigh: bool = False,
+                 link_gain_db: float = 0.0):
+        """
+        Mobility scenario describing how the link evolves over a mission
+
+        Args:
+            name (str): Scenario name
+            duration (float): Mission duration in seconds
+            velocity (float): Node speed passed to the ADR algorithm
+            path_loss (Callable): Mean path loss in dB as a function of time
+            shadowing_db (float): Standard deviation of slow shadowing in dB
+            coherence_time (float): Correlation time of the shadowing in seconds
+            rayleigh (bool): Whether to add per-packet Rayleigh fading
+            link_gain_db (float): Combined antenna gains minus losses in dB
+        """
+        self.name = name
+        self.duration = duration
+        self.velocity = velocity
+        self.path_loss = path_loss
+        self.shadowing_db = shadowing_db
+        self.coherence_time = coherence_time
+        self.rayleigh = rayleigh
+        self.link_gain_db = link_gain_db
+
+
+class Channel:
+    def __init__(self, scenario: Scenario, seed: int = 0):
+        """
+        Time-varying channel realisation of a scenario
+
+        Args:
+            scenario (Scenario): Scenario to realise
+            seed (int): Random seed, so runs are reproducible
+        """
+        self.scenario = scenario
+        self.rng = random.Random(seed)
+        self._shadow = 0.0
+        self._last_t: Optional[float] = None
+
+    def _update_shadowing(self, t: float) -> float:
+        # First-order Gauss-Markov process with the scenario's coherence time
+        if self._last_t is None:
+            self._shadow = self.rng.gauss(0.0, self.scenario.shadowing_db)
+        else:
+            rho = math.exp(-max(t - self._last_t, 0.0) / self.scenario.coherence_time)
+            innovation = self.rng.gauss(0.0, self.scenario.shadowing_db * math.sqrt(1 - rho ** 2))
+            self._shadow = rho * self._shadow + innovation
+        self._last_t = t
+        return self._shadow
+
+    def gain(self, t: float) -> float:
+        """
+        Channel gain (negative path loss including fading) at time t
+
+        Args:
+            t (float): Mission time in seconds
+
+        Returns:
+            Channel gain in dB
+        """
+        gain = self.scenario.link_gain_db - self.scenario.path_loss(t) - self._update_shadowing(t)
+        if self.scenario.rayleigh:
+            power = max(self.rng.expovariate(1.0), 1e-6)
+            gain += 10 * math.log10(power)
+        return gain
+
+
+class ReplayPathLoss:
+    def __init__(self, times: List[float], losses: List[float]):
+        """
+        Path loss replayed from measurements, linearly interpolated in time
+
+        A class rather than a closure so replayed scenarios can be pickled
+        to worker processes.
+
+        Args:
+            times (list): Increasing mission times of the measurements in seconds
+            losses (list): Path loss at each time in dB
+        """
+        if not times or len(times) != len(losses):
+            raise ValueError("ReplayPathLoss needs matching, non-empty times and losses")
+        self.times = times
+        self.losses = losses
+
+    def __call__(self, t: float) -> float:
+        i = bisect_right(self.times, t)
+        if i == 0:
+            return self.losses[0]
+        if i == len(self.times):
+            return self.losses[-1]
+        t0, t1 = self.times[i - 1], self.times[i]
+        frac = (t - t0) / (t1 - t0) if t1 > t0 else 0.0
+        return self.losses[i - 1] + frac * (self.losses[i] - self.losses[i - 1])
+
+
+def _deep_fade_loss(t: float) -> float:
+    base = log_distance_path_loss(5000.0)
+    # 25 dB fade for 5 s out of every 60 s
+    return base + (25.0 if (t % 60.0) >= 55.0 else 0.0)
+
+
+def _leo_pass_loss(t: float,
+                   duration: float = 600.0,
+                   min_range: float = 500e3,
+                   ground_speed: float = 7000.0) -> float:
+    # Slant range of a straight overhead pass, free-space path loss at 433 MHz
+    offset = ground_speed * (t - duration / 2)
+    slant_range = math.sqrt(min_range ** 2 + offset ** 2)
+    return 20 * math.log10(slant_range) + 20 * math.log10(433e6) - 147.55
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    'static': Scenario(
+        name='static',
+        duration=600.0,
+        velocity=0.0,
+        path_loss=lambda t: log_distance_path_loss(8000.0),
+        shadowing_db=1.0,
+        coherence_time=60.0),
+    'walking': Scenario(
+        name='walking',
+        duration=600.0,
+        velocity=1.4,
+        path_loss=lambda t: log_distance_path_loss(6000.0 + 1.4 * t),
+        shadowing_db=3.0,
+        coherence_time=20.0,
+        rayleigh=True),
+    'vehicle': Scenario(
+        name='vehicle',
+        duration=600.0,
+        velocity=8.0,
+        path_loss=lambda t: log_distance_path_loss(2000.0 + 8.0 * t),
+        shadowing_db=4.0,
+        coherence_time=3.0,
+        rayleigh=True),
+    'leo_pass': Scenario(
+        name='leo_pass',
+        duration=600.0,
+        velocity=5.0,
+        path_loss=_leo_pass_loss,
+        shadowing_db=0.5,
+        coherence_time=30.0,
+        link_gain_db=10.0),
+    'deep_fade': Scenario(
+        name='deep_fade',
+        duration=600.0,
+        velocity=0.0,
+        path_loss=_deep_fade_loss,
+        shadowing_db=1.0,
+        coherence_time=30.0),
+}
+
+
+class SimulatedRadio:
+    def __init__(self,
+                 channel: Channel,
+                 clock: SimClock,
+                 peer_tx_power: float = 13.0,
+                 noise_figure: float = 6.0,
+                 feedback: bool = False):
+        """
+        Simulated RFM9x exposing the attributes and methods the ADR code uses
+
+        Every packet sent goes through the channel to a simulated peer that
+        answers with a short acknowledgment, so the ADR loop observes the
+        reverse link exactly as it does on hardware. With feedback the peer
+        behaves like LoRaReceiver: it collects forward-link metrics of the
+        data packets it decodes and reports them only in its answer to a
+        SYNC packet, resetting the window when it does.
+
+        Args:
+            channel (Channel): Channel the packets travel through
+            clock (SimClock): Simulated clock advanced by airtime and timeouts
+            peer_tx_power (float): Transmission power of the acknowledging peer
+            noise_figure (float): Receiver noise figure in dB
+            feedback (bool): Whether the peer reports forward-link metrics in its SYNC answers
+        """
+        self.channel = channel
+        self.clock = clock
+        self.peer_tx_power = peer_tx_power
+        self.noise_figure = noise_figure
+        self.feedback = feedback
+
+        self.spreading_factor = 7
+        self.coding_rate = 5
+        self.signal_bandwidth = 125000
+        self.tx_power = 13
+
+        self.last_snr = 0.0
+        self.last_rssi = 0.0
+
+        self.last_delivered = False
+        self.sent_log: List[Dict] = []
+        self._pending_ack: Optional[Dict[str, float]] = None
+        self.forward_window = ForwardLinkWindow()
+        self._data_seq = 0
+        self._report = b""
+
+    @property
+    def tx_power(self) -> float:
+        return self._tx_power
+
+    @tx_power.setter
+    def tx_power(self, val: float):
+        # Same range check as the driver in high_power mode
+        if val < 5 or val > 23:
+            raise RuntimeError("tx_power must be between 5 and 23")
+        self._tx_power = val
+
+    def _link(self, tx_power: float) -> Dict[str, float]:
+        rssi = tx_power + self.channel.gain(self.clock.now)
+        snr = rssi - noise_floor(self.signal_bandwidth, self.noise_figure)
+        return {'rssi': rssi, 'snr': snr}
+
+    def _decodes(self, snr: float) -> bool:
+        return snr >= SNR_FLOOR[self.spreading_factor]
+
+    def airtime(self, payload_len: int) -> float:
+        return time_on_air(payload_len, self.spreading_factor,
+                           self.signal_bandwidth, self.coding_rate)
+
+    def send(self, data: bytes) -> bool:
+        """
+        Transmit a packet through the channel
+
+        Args:
+            data (bytes): Packet payload
+
+        Returns:
+            True, like the RFM9x driver once the packet has left the radio
+        """
+        toa = self.airtime(len(data))
+        forward = self._link(self.tx_power)
+        self.last_delivered = self._decodes(forward['snr'])
+        self.sent_log.append({
+            'time': self.clock.now,
+            'bytes': len(data),
+            'airtime': toa,
+            'sf': self.spreading_factor,
+            'cr': self.coding_rate,
+            'bw': self.signal_bandwidth,
+            'tp': self.tx_power,
+            'snr': forward['snr'],
+            'rssi': forward['rssi'],
+            'delivered': self.last_delivered,
+        })
+        self.clock.advance(toa)
+
+        # The peer numbers data packets like LoRaTransmitter does
+        sync = data.startswith(b"SYNC")
+        self._report = b""
+        if self.feedback and self.last_delivered:
+            if sync:
+                self._report = self.forward_window.encode_and_reset()
+            else:
+                self.forward_window.record(self._data_seq, forward['snr'], forward['rssi'])
+        if not sync:
+            self._data_seq += 1
+
+        self._pending_ack = None
+        if self.last_delivered:
+            reverse = self._link(self.peer_tx_power)
+            if self._decodes(reverse['snr']):
+                self._pending_ack = reverse
+        return True
+
+    def receive(self, timeout: float = 0.5) -> Optional[bytes]:
+        """
+        Wait for the peer's acknowledgment of the last packet
+
+        Args:
+            timeout (float): Receive timeout in seconds
+
+        Returns:
+            Acknowledgment bytes, or None if nothing arrived before the timeout
+        """
+        if self._pending_ack is None:
+            self.clock.advance(timeout)
+            return None
+
+        ack = b"READY" + self._report
+        self.clock.advance(self.airtime(len(ack)))
+        self.last_snr = self._pending_ack['snr']
+        self.last_rssi = self._pending_ack['rssi']
+        self._pending_ack = None
+        return ack
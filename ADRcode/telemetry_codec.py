@@ -0,0 +1,350 @@
+# telemetry_codec.py - Delta/varint telemetry frames with optional dictionary-primed zlib
+import time
+import zlib
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from airtime import time_on_air
+
+# First byte of a frame; 0xFC/0xFD never start UTF-8 text and differ from
+# the FEC magic, so frames are self-identifying
+TELEMETRY_MAGIC = 0xFC
+FLAG_ZLIB = 0x01
+MAX_FRAME = 252
+
+# Preset dictionary priming zlib with the text our nodes send
+DEFAULT_ZDICT = b"CubeSat|TS:ADR Packet |READY|SYNC|TERMINATE|temp=|volt=|lat=|lon=|alt="
+
+# A record is (sequence number, timestamp in ms, text payload)
+Record = Tuple[int, int, bytes]
+
+
+def zigzag(n: int) -> int:
+    return (n << 1) if n >= 0 else ((-n << 1) - 1)
+
+
+def unzigzag(n: int) -> int:
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1)
+
+
+def encode_varint(n: int, out: bytearray):
+    """
+    Append an unsigned LEB128 varint
+
+    Args:
+        n (int): Non-negative integer
+        out (bytearray): Buffer to append to
+    """
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    Read an unsigned LEB128 varint
+
+    Args:
+        data (bytes): Buffer
+        pos (int): Offset of the varint
+
+    Returns:
+        Tuple of (value, offset after the varint)
+    """
+    result = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_frame(records: Sequence[Record],
+                 compress: bool = True,
+                 zdict: bytes = DEFAULT_ZDICT) -> bytes:
+    """
+    Pack telemetry records into one frame
+
+    Layout: flags byte, record count, then for each record the zigzag
+    deltas of sequence number and timestamp against the previous record
+    (the first against zero), then the text block. The text block holds a
+    varint length and the bytes of each payload; it is replaced by its
+    dictionary-primed zlib stream when that is shorter.
+
+    Args:
+        records (sequence): (seq, timestamp_ms, payload) tuples
+        compress (bool): Try zlib on the text block
+        zdict (bytes): zlib preset dictionary (must match the decoder)
+
+    Returns:
+        Encoded frame
+    """
+    numbers = bytearray()
+    encode_varint(len(records), numbers)
+    prev_seq = prev_ts = 0
+    for seq, ts, _ in records:
+        encode_varint(zigzag(seq - prev_seq), numbers)
+        encode_varint(zigzag(ts - prev_ts), numbers)
+        prev_seq, prev_ts = seq, ts
+
+    text = bytearray()
+    for _, _, payload in records:
+        encode_varint(len(payload), text)
+        text += payload
+
+    flags = TELEMETRY_MAGIC
+    if compress and text:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, zdict)
+        packed = compressor.compress(bytes(text)) + compressor.flush()
+        if len(packed) < len(text):
+            flags |= FLAG_ZLIB
+            text = packed
+    return bytes([flags]) + bytes(numbers) + bytes(text)
+
+
+def is_telemetry_frame(frame: bytes) -> bool:
+    return len(frame) > 0 and frame[0] & ~FLAG_ZLIB == TELEMETRY_MAGIC
+
+
+def decode_frame(frame: bytes, zdict: bytes = DEFAULT_ZDICT) -> List[Record]:
+    """
+    Unpack a frame produced by encode_frame
+
+    Args:
+        frame (bytes): Encoded frame
+        zdict (bytes): zlib preset dictionary used by the encoder
+
+    Returns:
+        List of (seq, timestamp_ms, payload) tuples
+    """
+    if not is_telemetry_frame(frame):
+        raise ValueError("Not a telemetry frame")
+    count, pos = decode_varint(frame, 1)
+    numbers = []
+    seq = ts = 0
+    for _ in range(count):
+        delta, pos = decode_varint(frame, pos)
+        seq += unzigzag(delta)
+        delta, pos = decode_varint(frame, pos)
+        ts += unzigzag(delta)
+        numbers.append((seq, ts))
+
+    text = bytes(frame[pos:])
+    if frame[0] & FLAG_ZLIB:
+        text = zlib.decompressobj(-15, zdict).decompress(text)
+
+    records = []
+    pos = 0
+    for seq, ts in numbers:
+        length, pos = decode_varint(text, pos)
+        records.append((seq, ts, text[pos:pos + length]))
+        pos += length
+    return records
+
+
+def _varint_len(n: int) -> int:
+    return max(1, (n.bit_length() + 6) // 7)
+
+
+class TelemetryFramer:
+    def __init__(self,
+                 max_frame: int = MAX_FRAME,
+                 compress: bool = True,
+                 zdict: bytes = DEFAULT_ZDICT,
+                 slack: int = 8):
+        """
+        Accumulates records and emits a frame once the next one would not fit
+
+        The uncompressed size of the pending records is tracked as they are
+        added; the encoder never emits more than that, so while it is within
+        max_frame nothing is encoded. Past it, a trial encode gives the real
+        size, and the next trial is put off until the uncompressed size has
+        grown by the room that encode left (less `slack` for zlib block
+        overhead), so a frame costs a handful of encodes rather than one per
+        record. Emitted frames are always encoded exactly and checked.
+
+        Args:
+            max_frame (int): Maximum encoded frame size in bytes
+            compress (bool): Try zlib on the text block
+            zdict (bytes): zlib preset dictionary
+            slack (int): Bytes kept free when skipping a trial encode
+        """
+        self.max_frame = max_frame
+        self.compress = compress
+        self.zdict = zdict
+        self.slack = slack
+        self._reset()
+
+    def _reset(self):
+        self._records: List[Record] = []
+        # Flags byte and record count
+        self._raw = 2
+        # Uncompressed and encoded size at the last trial encode
+        self._trial: Optional[Tuple[int, int]] = None
+
+    def _record_size(self, record: Record) -> int:
+        # Uncompressed bytes the record adds to the pending frame
+        prev_seq, prev_ts = self._records[-1][:2] if self._records else (0, 0)
+        seq, ts, payload = record
+        count = len(self._records)
+        return (_varint_len(count + 1) - _varint_len(count)
+                + _varint_len(zigzag(seq - prev_seq))
+                + _varint_len(zigzag(ts - prev_ts))
+                + _varint_len(len(payload)) + len(payload))
+
+    def _encode(self, records: Sequence[Record]) -> bytes:
+        return encode_frame(records, self.compress, self.zdict)
+
+    def _has_room(self, record: Record) -> bool:
+        raw = self._raw + self._record_size(record)
+        if raw <= self.max_frame:
+            return True
+        if self._trial is not None:
+            trial_raw, trial_len = self._trial
+            if raw - trial_raw <= self.max_frame - trial_len - self.slack:
+                return True
+        size = len(self._encode(self._records + [record]))
+        if size > self.max_frame:
+            return False
+        self._trial = (raw, size)
+        return True
+
+    def _append(self, record: Record):
+        self._raw += self._record_size(record)
+        self._records.append(record)
+
+    def _take(self) -> Optional[bytes]:
+        """
+        Encode the pending records; any that do not fit stay pending
+        """
+        records = self._records
+        if not records:
+            return None
+        frame = self._encode(records)
+        carry: List[Record] = []
+        while len(frame) > self.max_frame and len(records) > 1:
+            carry.insert(0, records.pop())
+            frame = self._encode(records)
+        self._reset()
+        for record in carry:
+            self._append(record)
+        return frame
+
+    def add(self, seq: int, timestamp_ms: int, payload: bytes = b"") -> Optional[bytes]:
+        """
+        Add one record
+
+        Args:
+            seq (int): Sequence number
+            timestamp_ms (int): Timestamp in milliseconds
+            payload (bytes): Text payload
+
+        Returns:
+            A full frame to send, or None while the current frame has room
+
+        Raises:
+            ValueError: If the record does not fit in a frame on its own;
+                the pending records are kept
+        """
+        record = (seq, timestamp_ms, payload)
+        alone = 1 + 1 + _varint_len(zigzag(seq)) + _varint_len(zigzag(timestamp_ms)) \
+            + _varint_len(len(payload)) + len(payload)
+        if alone > self.max_frame and len(self._encode([record])) > self.max_frame:
+            raise ValueError("Record does not fit in a frame on its own")
+
+        if self._has_room(record):
+            self._append(record)
+            return None
+        ready = self._take()
+        self._append(record)
+        return ready
+
+    def flush(self) -> Optional[bytes]:
+        """
+        Frame holding the records added so far, if any
+
+        Call until it returns None; records that did not fit in one frame
+        stay pending for the next call.
+        """
+        return self._take()
+
+
+def benchmark(num_records: int = 5000,
+              interval_ms: int = 1000,
+              payload: Callable[[int], bytes] = lambda i: b"CubeSat",
+              sf: int = 12,
+              bw: int = 125000,
+              cr: int = 5) -> dict:
+    """
+    Compression ratio, codec throughput and airtime against decimal text packets
+
+    The baseline is the transmitter's one-record-per-packet text format
+    "CubeSat|<seq>|TS:<ms>".
+
+    Args:
+        num_records (int): Records to encode
+        interval_ms (int): Nominal spacing of the timestamps (with jitter)
+        payload (Callable): Text payload of record i
+        sf (int): Spreading factor for the airtime comparison
+        bw (int): Bandwidth in Hz for the airtime comparison
+        cr (int): Coding rate for the airtime comparison
+
+    Returns:
+        Dictionary of benchmark metrics
+    """
+    start = int(time.time() * 1000)
+    records = [(i, start + i * interval_ms + (i * 7919) % 50, payload(i)) for i in range(num_records)]
+    text_packets = [b"%s|%d|TS:%d" % (p, seq, ts) for seq, ts, p in records]
+
+    t0 = time.perf_counter()
+    framer = TelemetryFramer()
+    frames = [f for f in (framer.add(*r) for r in records) if f]
+    frame = framer.flush()
+    while frame:
+        frames.append(frame)
+        frame = framer.flush()
+    encode_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    decoded = [r for f in frames for r in decode_frame(f)]
+    decode_s = time.perf_counter() - t0
+    if decoded != records:
+        raise AssertionError("Telemetry round trip failed")
+
+    text_bytes = sum(len(p) for p in text_packets)
+    frame_bytes = sum(len(f) for f in frames)
+    text_airtime = sum(time_on_air(len(p), sf, bw, cr) for p in text_packets)
+    frame_airtime = sum(time_on_air(len(f), sf, bw, cr) for f in frames)
+    return {
+        'records': num_records,
+        'frames': len(frames),
+        'text_bytes': text_bytes,
+        'frame_bytes': frame_bytes,
+        'ratio': text_bytes / frame_bytes,
+        'encode_records_per_s': num_records / encode_s,
+        'decode_records_per_s': num_records / decode_s,
+        'text_airtime_s': text_airtime,
+        'frame_airtime_s': frame_airtime,
+    }
+
+
+def _sensor_payload(i: int) -> bytes:
+    return b"CubeSat|temp=%.1f|volt=%.2f|alt=%d" % (20 + (i % 37) / 10, 3.6 + (i % 23) / 100, 400 + i % 17)
+
+
+def main():
+    for name, payload in (("CubeSat", lambda i: b"CubeSat"), ("sensor text", _sensor_payload)):
+        r = benchmark(payload=payload)
+        print(f"Payload: {name}")
+        print(f"  {r['records']} records -> {r['frames']} frames, "
+              f"{r['text_bytes']} -> {r['frame_bytes']} bytes (ratio {r['ratio']:.1f}x)")
+        print(f"  Encode: {r['encode_records_per_s']:.0f} records/s, "
+              f"decode: {r['decode_records_per_s']:.0f} records/s")
+        print(f"  Airtime at SF12/125 kHz: {r['text_airtime_s']:.1f} s -> {r['frame_airtime_s']:.1f} s")
+
+if __name__ == "__main__":
+    main()
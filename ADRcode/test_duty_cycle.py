@@ -0,0 +1,47 @@
+# test_duty_cycle.py - Airtime limits of the duty-cycle scheduler
+from airtime import time_on_air
+from duty_cycle import DutyCycleScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def _send_for(scheduler: DutyCycleScheduler, clock: FakeClock, airtime: float, duration: float) -> list:
+    # Back-to-back sends; returns the start time of every transmission
+    starts = []
+    end = clock.now + duration
+    while True:
+        wait = scheduler.delay(airtime)
+        if clock.now + wait >= end:
+            return starts
+        scheduler.wait(airtime)
+        starts.append(clock.now)
+        clock.advance(airtime)
+
+
+def test_one_window_at_sf12_stays_within_duty_cycle():
+    clock = FakeClock()
+    scheduler = DutyCycleScheduler(0.1, window=3600.0, clock=lambda: clock.now, sleep=clock.advance)
+    airtime = time_on_air(32, 12, 125000, 5)
+
+    starts = _send_for(scheduler, clock, airtime, 3600.0)
+
+    assert starts
+    assert len(starts) * airtime <= 0.1 * 3600.0
+
+
+def test_window_after_idle_period_stays_within_duty_cycle():
+    clock = FakeClock()
+    scheduler = DutyCycleScheduler(0.1, window=600.0, clock=lambda: clock.now, sleep=clock.advance)
+    airtime = time_on_air(32, 12, 125000, 5)
+
+    # Fill the bucket, then send flat out for one window
+    clock.advance(3600.0)
+    starts = _send_for(scheduler, clock, airtime, 600.0)
+
+    assert len(starts) * airtime <= 0.1 * 600.0
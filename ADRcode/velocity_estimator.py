@@ -0,0 +1,76 @@
+# velocity_estimator.py - Online node mobility estimate from link metric dynamics
+from typing import Optional
+
+
+class VelocityEstimator:
+    def __init__(self,
+                 gain: float = 5.0,
+                 noise_db: float = 1.5,
+                 alpha: float = 0.2,
+                 max_velocity: float = 10.0,
+                 max_gap: float = 30.0):
+        """
+        Infer effective node mobility from how fast the RSSI changes
+
+        Moving nodes cross shadowing and fading structure, so the RSSI rate of
+        change grows with speed. Changes within noise_db are treated as
+        measurement noise; the remaining rate in dB/s is smoothed and scaled
+        by gain into the velocity units mobile_adr expects. The gain depends
+        on the environment's shadowing and should be calibrated per
+        deployment, for example with the simulated scenarios.
+
+        Args:
+            gain (float): Velocity per dB/s of RSSI change
+            noise_db (float): RSSI change attributed to measurement noise in dB
+            alpha (float): Smoothing factor of the rate estimate (0-1)
+            max_velocity (float): Upper bound of the estimate
+            max_gap (float): Inter-packet gaps longer than this (s) restart the estimate
+        """
+        self.gain = gain
+        self.noise_db = noise_db
+        self.alpha = alpha
+        self.max_velocity = max_velocity
+        self.max_gap = max_gap
+
+        self.rate: Optional[float] = None
+        self._last_rssi: Optional[float] = None
+        self._last_time: Optional[float] = None
+
+    def update(self, rssi: float, timestamp: float) -> float:
+        """
+        Add one RSSI sample
+
+        Args:
+            rssi (float): Received signal strength in dBm
+            timestamp (float): Reception time in seconds
+
+        Returns:
+            Current velocity estimate
+        """
+        if self._last_time is not None:
+            dt = timestamp - self._last_time
+            if 0 < dt <= self.max_gap:
+                excess = max(0.0, abs(rssi - self._last_rssi) - self.noise_db)
+                sample = excess / dt
+                if self.rate is None:
+                    self.rate = sample
+                else:
+                    self.rate = self.alpha * sample + (1 - self.alpha) * self.rate
+
+        self._last_rssi = rssi
+        self._last_time = timestamp
+        return self.velocity
+
+    @property
+    def velocity(self) -> float:
+        """
+        Current velocity estimate (0 until two samples have been seen)
+        """
+        if self.rate is None:
+            return 0.0
+        return min(self.max_velocity, self.gain * self.rate)
+
+    def reset(self):
+        self.rate = None
+        self._last_rssi = None
+        self._last_time = None
@@ -1,10 +1,20 @@
 # Imports
+import os
+import sys
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut, Direction, Pull
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 # Setup
 CS = DigitalInOut(board.CE1) # init CS pin for SPI
 RESET = DigitalInOut(board.D25) # init RESET pin for the RFM9x module
@@ -22,7 +32,6 @@ while True:
         rssi = rfm9x.last_rssi
         snr = rfm9x.last_snr
 
-        print(packet_text)
-        print('RSSI: ', rssi)
-        print('SNR: ', snr)
-        print()
\ No newline at end of file
+        logger.info("%s", packet_text)
+        logger.info("RSSI: %s", rssi)
+        logger.info("SNR: %s", snr)
\ No newline at end of file
@@ -1,51 +1,74 @@
 # Imports
-import time
-import busio
-import board
-import adafruit_rfm9x
-import numpy as np
-import pandas as pd
-from digitalio import DigitalInOut, Direction, Pull
-
-# Setup
-CS = DigitalInOut(board.CE1) # init CS pin for SPI
-RESET = DigitalInOut(board.D25) # init RESET pin for the RFM9x module
-spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO) # init SPI
-rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0) # init object for the radio
-
-# Check for packet RX
-counter = 0
-rssi_list = []
-snr_list = []
-prev_packet = None
-params = []
-while counter < 100:
-    packet = None
-    packet = rfm9x.receive()
-    if packet is not None:
-        prev_packet = packet
-        packet_text = str(prev_packet, "utf-8")
-        rssi = rfm9x.last_rssi
-        snr = rfm9x.last_snr
-        params = packet_text.split(',')[:5]
-
-        print(packet_text)
-        print('RSSI: ', rssi)
-        print('SNR: ', snr)
-        print()
-
-        rssi_list.append(rssi)
-        snr_list.append(snr)
-
-        counter += 1
-
-# Print stats
-print('Average RSSI:', np.mean(rssi_list))
-print('Median RSSI:',  np.median(rssi_list))
-print('Average SNR:',  np.mean(snr_list))
-print('Median SNR:',   np.median(snr_list))
-
-# Save data as a CSV file
-data = {'rssi': rssi_list, 'snr': snr_list}
-df = pd.DataFrame(data)
-df.to_csv(f'test_data/LoRa_433_tx_{params[0]}_bd_{params[1]}_cr_{params[2]}_sf_{params[3]}_atten_{params[4]}.csv', index=False)
\ No newline at end of file
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from async_logging import setup_logging, flush_logging
+
+logger = logging.getLogger(__name__)
+
+
+def run(rfm9x, num_packets=100, output_dir='test_data'):
+    """
+    Record RSSI and SNR of packets from lora_tx_characterization and save them as CSV
+
+    Args:
+        rfm9x: RFM9x radio
+        num_packets (int): Number of packets to record
+        output_dir (str): Directory for the CSV file
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Console output goes through a writer thread; per-packet lines are rate-limited
+    setup_logging(format='%(asctime)s - %(message)s')
+
+    # Check for packet RX
+    counter = 0
+    rssi_list = []
+    snr_list = []
+    seq_list = []
+    prev_packet = None
+    params = []
+    while counter < num_packets:
+        packet = None
+        packet = rfm9x.receive()
+        if packet is not None:
+            prev_packet = packet
+            packet_text = str(prev_packet, "utf-8")
+            rssi = rfm9x.last_rssi
+            snr = rfm9x.last_snr
+            fields = packet_text.split(',')
+            params = fields[:5]
+            # Sequence number of the sender, if it numbers its packets
+            seq_list.append(int(fields[5]) if len(fields) > 6 and fields[5].isdigit() else None)
+
+            logger.info("%s", packet_text)
+            logger.info("RSSI: %s", rssi)
+            logger.info("SNR: %s", snr)
+
+            rssi_list.append(rssi)
+            snr_list.append(snr)
+
+            counter += 1
+
+    # Print stats
+    flush_logging()
+    print('Average RSSI:', np.mean(rssi_list))
+    print('Median RSSI:',  np.median(rssi_list))
+    print('Average SNR:',  np.mean(snr_list))
+    print('Median SNR:',   np.median(snr_list))
+
+    # Save data as a CSV file
+    data = {'rssi': rssi_list, 'snr': snr_list, 'seq': seq_list}
+    df = pd.DataFrame(data)
+    df.to_csv(os.path.join(output_dir, f'LoRa_433_tx_{params[0]}_bd_{params[1]}_cr_{params[2]}_sf_{params[3]}_atten_{params[4]}.csv'), index=False)
+
+
+def main():
+    from lora_adr_manager import create_radio
+    run(create_radio(433.0))
+
+if __name__ == "__main__":
+    main()
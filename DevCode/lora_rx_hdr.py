@@ -1,15 +1,26 @@
 # Imports
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut, Direction, Pull
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from arq import ARQReceiver, MAX_PAYLOAD
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 coding_rate = [5, 6, 7, 8]
 signal_bandwidth = [125000, 250000, 500000]
 spreading_factor = [7, 8, 9, 10, 11, 12]
 num_packets = 100
-packet_size = 252
+packet_size = MAX_PAYLOAD  # 252 bytes minus the ARQ header
 timing_data = []
 
 # Setup
@@ -25,10 +36,10 @@ rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0) # init object for the radio
 # rfm9x.spreading_factor = 8
 rfm9x.enable_crc = True
 
-print(f"TX Power: {rfm9x.tx_power} dBm")
-print(f"Signal Bandwidth: {rfm9x.signal_bandwidth} Hz")
-print(f"Coding Rate: {rfm9x.coding_rate}")
-print(f"Spreading Factor: {rfm9x.spreading_factor}")
+logger.info("TX Power: %s dBm", rfm9x.tx_power)
+logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+logger.info("Coding Rate: %d", rfm9x.coding_rate)
+logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
 packet_data = f"TX Power: {rfm9x.tx_power} dBm, Bandwidth: {signal_bandwidth} Hz, Coding Rate: {coding_rate}, Spreading Factor: {spreading_factor}"
 packet = bytes(packet_data, "utf-8")
@@ -43,59 +54,58 @@ for bw in signal_bandwidth:
 
             drop_packets = 0
 
-            print(f"TX Power: {rfm9x.tx_power} dBm")
-            print(f"Signal Bandwidth: {rfm9x.signal_bandwidth} Hz")
-            print(f"Coding Rate: {rfm9x.coding_rate}")
-            print(f"Spreading Factor: {rfm9x.spreading_factor}")
+            logger.info("TX Power: %s dBm", rfm9x.tx_power)
+            logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+            logger.info("Coding Rate: %d", rfm9x.coding_rate)
+            logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
             packet_data = f"TX Power: {rfm9x.tx_power} dBm, Bandwidth: {signal_bandwidth} Hz, Coding Rate: {coding_rate}, Spreading Factor: {spreading_factor}"
             packet = bytes(packet_data, "utf-8")
             rfm9x.send_with_ack(packet)
 
-            for i in range(num_packets):
-                if i == 1:
-                    print("receiving...")
-                    time_start = time.perf_counter()
-                data = rfm9x.receive()
-                if not data and not i:
-                    drop_packets += 1
-            time_end = time.perf_counter()
+            # Reliable transfer: reorder frames and ack each burst of the sender
+            logger.info("receiving...")
+            receiver = ARQReceiver(rfm9x, clock=time.perf_counter)
+            payloads = receiver.receive(num_packets, idle_timeout=60)
+            drop_packets = num_packets - len(payloads)
+            time_start = receiver.first_delivery or time.perf_counter()
+            time_end = receiver.last_delivery or time_start
 
-            print("-------receive ended-------")
+            logger.info("-------receive ended-------")
 
             # Calculate elapsed time
             elapsed_time = time_end - time_start
-            data_rate = packet_size * 8 * (num_packets-1-drop_packets) / elapsed_time
+            data_rate = packet_size * 8 * max(len(payloads) - 1, 0) / elapsed_time if elapsed_time > 0 else 0
 
             timing_data.append({
                 "tx_power": rfm9x.tx_power,
                 "signal_bandwidth": rfm9x.signal_bandwidth,
                 "coding_rate": rfm9x.coding_rate,
                 "spreading_factor": rfm9x.spreading_factor,
-                "num_packets": num_packets-1-drop_packets,
+                "num_packets": len(payloads),
                 "elapsed_time": elapsed_time,
                 "data_rate": data_rate,
                 "drop_packets": drop_packets
             })
 
-            print(f"Elapsed time: {elapsed_time:.6f} seconds")
-            print(f"Data rate: {data_rate:.6f} bps")
-            print(f"Packets dropped: {drop_packets:.6f}")
+            logger.info("Elapsed time: %.6f seconds", elapsed_time)
+            logger.info("Data rate: %.6f bps", data_rate)
+            logger.info("Packets dropped: %d, duplicate frames: %d", drop_packets, receiver.duplicates)
             
-            print("receiver waiting for 5 seconds")
+            logger.info("receiver waiting for 5 seconds")
             time.sleep(5)
 
-            print("--------sending to transmitter-------")
+            logger.info("--------sending to transmitter-------")
             packet_data = f"receive ended"
             packet = bytes(packet_data, "utf-8")
             rfm9x.send_with_ack(packet)
 
-            print("------waiting for transmitter------")
+            logger.info("------waiting for transmitter------")
             packet = None
             packet = rfm9x.receive()
             while not packet:
-                print("no ack from transmitter")
+                logger.info("no ack from transmitter")
                 packet = rfm9x.receive()
-            print("Packet from tx: ", str(packet, "utf-8"))
+            logger.info("Packet from tx: %s", str(packet, "utf-8"))
             time.sleep(3)
             
\ No newline at end of file
@@ -1,14 +1,26 @@
+import os
+import sys
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from arq import ARQReceiver, MAX_PAYLOAD
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 coding_rate = [5, 6, 7, 8]
 signal_bandwidth = [125000, 250000, 500000]
 spreading_factor = [7, 8, 9, 10, 11, 12]
 num_packets = 100
-packet_size = 252
+packet_size = MAX_PAYLOAD  # 252 bytes minus the ARQ header
+timeout = 60  # Give up on a setting after this long without a frame
 timing_data = []
 
 # Setup
@@ -18,10 +30,10 @@ spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)  # SPI bus
 rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0)  # LoRa module
 
 # LoRa settings
-print(f"RX Power: {rfm9x.tx_power} dBm")
-print(f"Signal Bandwidth: {rfm9x.signal_bandwidth} Hz")
-print(f"Coding Rate: {rfm9x.coding_rate}")
-print(f"Spreading Factor: {rfm9x.spreading_factor}")
+logger.info("RX Power: %s dBm", rfm9x.tx_power)
+logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+logger.info("Coding Rate: %d", rfm9x.coding_rate)
+logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
 # Receiver loop
 for bw in signal_bandwidth:
@@ -36,46 +48,35 @@ for bw in signal_bandwidth:
             # print(f"Coding Rate: {rfm9x.coding_rate}")
             # print(f"Spreading Factor: {rfm9x.spreading_factor}")
 
-            print(f"RX Settings: p {rfm9x.tx_power} dBm, sb {rfm9x.signal_bandwidth} Hz, cr {rfm9x.coding_rate}, sf {rfm9x.spreading_factor}")
+            logger.info("RX Settings: p %s dBm, sb %d Hz, cr %d, sf %d", rfm9x.tx_power,
+                        rfm9x.signal_bandwidth, rfm9x.coding_rate, rfm9x.spreading_factor)
 
 
+            # Reliable transfer: reorder frames and ack each burst of the sender
+            receiver = ARQReceiver(rfm9x, clock=time.perf_counter)
             start_time = time.perf_counter()
-            timeout = 10  # Timeout in seconds
-            ack_sent = False
-            drop_packets = 0
-            packet_received = False
-
-            while True:
-                packet = rfm9x.receive(timeout=0.1)  # Poll every 100ms
-
-                if packet:
-                    print("Received data:", str(packet, "utf-8"))
-                    ack_message = b"ACK: Data received"
-                    rfm9x.send_with_ack(ack_message)
-                    print("Sent ACK to TX.")
-                    packet_received = True
-                elif time.perf_counter() - start_time > timeout:
-                    print("No packet received within timeout.")
-                    drop_packets += 1
-                    break
+            payloads = receiver.receive(num_packets, idle_timeout=timeout)
+            drop_packets = num_packets - len(payloads)
+            if drop_packets:
+                logger.warning("Transfer incomplete: %d/%d packets delivered.", len(payloads), num_packets)
+            logger.info("Duplicate frames: %d, acks sent: %d", receiver.duplicates, receiver.acks_sent)
 
-            # Calculate elapsed time and data rate
-            end_time = time.perf_counter()
-            elapsed_time = end_time - start_time
-            data_rate = packet_size * 8 * (num_packets - 1 - drop_packets) / elapsed_time
+            # Calculate elapsed time and data rate (lingering for a lost final ack excluded)
+            elapsed_time = receiver.last_delivery - start_time if payloads else time.perf_counter() - start_time
+            data_rate = packet_size * 8 * len(payloads) / elapsed_time
 
             timing_data.append({
                 "tx_power": rfm9x.tx_power,
                 "signal_bandwidth": rfm9x.signal_bandwidth,
                 "coding_rate": rfm9x.coding_rate,
                 "spreading_factor": rfm9x.spreading_factor,
-                "num_packets": num_packets - 1 - drop_packets,
+                "num_packets": len(payloads),
                 "elapsed_time": elapsed_time,
                 "data_rate": data_rate,
                 "drop_packets": drop_packets
             })
 
-            print(f"Elapsed time: {elapsed_time:.6f} seconds")
-            print(f"Data rate: {data_rate:.6f} bps")
-            print(f"Packets dropped: {drop_packets}")
-            print("------Waiting for next transmission------")
+            logger.info("Elapsed time: %.6f seconds", elapsed_time)
+            logger.info("Data rate: %.6f bps", data_rate)
+            logger.info("Packets dropped: %d", drop_packets)
+            logger.info("------Waiting for next transmission------")
@@ -1,9 +1,21 @@
+import os
+import sys
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from packet_view import PacketReceiver
+from rx_timeout import ReceiveTimeout
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 # LoRa settings
 coding_rate = [5, 6, 7, 8]
 signal_bandwidth = [125000, 250000, 500000]
@@ -19,18 +31,18 @@ spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
 rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0)  # Frequency 433 MHz
 
 rfm9x.tx_power = 13  # Default TX Power
+receiver = PacketReceiver(rfm9x)  # Receive without copying
+rx_timeout = ReceiveTimeout(interval=10.0, payload_len=packet_size)  # TX sends every 10 s
 
-# Function to process a received packet
+# Function to process a received packet (parses the timestamp in place, no decode)
 def process_packet(packet):
     if not packet:
         return None, None
 
-    try:
-        packet_data = str(packet, "utf-8")
-        timestamp, _ = packet_data.split("|", 1)
-        return int(timestamp), packet_data
-    except (ValueError, IndexError):
+    timestamp = packet.field_int(0)
+    if timestamp is None or packet.field_bounds(1) is None:
         return None, None
+    return timestamp, packet
 
 # Main loop through settings
 for bw in signal_bandwidth:
@@ -39,19 +51,21 @@ for bw in signal_bandwidth:
         rfm9x.coding_rate = cr
         for sf in spreading_factor:
             rfm9x.spreading_factor = sf
+            rx_timeout.set_settings(sf, bw, cr)
 
-            print(f"RX Settings: Power {rfm9x.tx_power} dBm, Bandwidth {bw} Hz, Coding Rate {cr}, Spreading Factor {sf}")
+            logger.info("RX Settings: Power %s dBm, Bandwidth %d Hz, Coding Rate %d, Spreading Factor %d",
+                        rfm9x.tx_power, bw, cr, sf)
 
             # --- Synchronization Step ---
-            print("Waiting for sync signal from transmitter...")
+            logger.info("Waiting for sync signal from transmitter...")
             sync_signal = None
             while not sync_signal:
                 sync_signal = rfm9x.receive(timeout=5.0)
             if sync_signal and sync_signal.decode() == "SYNC":
-                print("Sync signal received, sending READY...")
+                logger.info("Sync signal received, sending READY...")
                 rfm9x.send_with_ack("READY".encode())
             else:
-                print("Sync signal not received, skipping this configuration.")
+                logger.info("Sync signal not received, skipping this configuration.")
                 continue
             # ----------------------------
 
@@ -60,18 +74,22 @@ for bw in signal_bandwidth:
             start_time = None
 
             for i in range(num_packets):
-                print(f"Waiting for packet {i+1}/{num_packets}...")
-                packet = rfm9x.receive(timeout=10.0)  # Wait for packet with a 5-second timeout
+                logger.info("Waiting for packet %d/%d...", i + 1, num_packets)
+                packet = receiver.receive(timeout=rx_timeout.timeout())  # Airtime plus expected interval and jitter
 
                 if not packet:
-                    print("No packet received within timeout.")
+                    logger.info("No packet received within %.2f s timeout.", rx_timeout.timeout())
+                    rx_timeout.miss()
                     drop_packets += 1
                     continue
 
+                rx_timeout.arrival()
+
                 # Process the received packet
                 rx_timestamp, packet_data = process_packet(packet)
+                packet.release()
                 if rx_timestamp is None:
-                    print("Invalid packet received.")
+                    logger.info("Invalid packet received.")
                     drop_packets += 1
                     continue
 
@@ -79,22 +97,22 @@ for bw in signal_bandwidth:
                 time_diff = abs(current_time - rx_timestamp)
 
                 if time_diff > 1000:  # Check for out-of-sync packet
-                    print(f"Packet out of sync by {time_diff} ms. Dropping packet.")
+                    logger.info("Packet out of sync by %d ms. Dropping packet.", time_diff)
                     drop_packets += 1
                 else:
                     if valid_packets == 0:
                         start_time = time.perf_counter()  # Record start time of valid packet stream
                     valid_packets += 1
-                    print(f"Received valid packet {i+1}/{num_packets} with timestamp {rx_timestamp}")
+                    logger.info("Received valid packet %d/%d with timestamp %d", i + 1, num_packets, rx_timestamp)
 
             if start_time:
                 elapsed_time = time.perf_counter() - start_time
                 data_rate = packet_size * 8 * valid_packets / elapsed_time
-                print(f"Elapsed time: {elapsed_time:.6f} seconds")
-                print(f"Data rate: {data_rate:.6f} bps")
+                logger.info("Elapsed time: %.6f seconds", elapsed_time)
+                logger.info("Data rate: %.6f bps", data_rate)
             else:
-                print("No valid packets received in this configuration.")
+                logger.info("No valid packets received in this configuration.")
 
-            print(f"Packets dropped: {drop_packets}/{num_packets}")
-            print("------Waiting for next transmission------\n")
+            logger.info("Packets dropped: %d/%d", drop_packets, num_packets)
+            logger.info("------Waiting for next transmission------")
             time.sleep(2)  # Delay before switching settings
@@ -1,10 +1,20 @@
 # Imports
+import os
+import sys
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut, Direction, Pull
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 # Setup
 CS = DigitalInOut(board.CE1) # init CS pin for SPI
 RESET = DigitalInOut(board.D25) # init RESET pin for the RFM9x module
@@ -18,14 +28,14 @@ rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0) # init object for the radio
 # rfm9x.spreading_factor = 8
 # rfm9x.enable_crc = True
 
-print(rfm9x.tx_power)
-print(rfm9x.signal_bandwidth)
-print(rfm9x.coding_rate)
-print(rfm9x.spreading_factor)
+logger.info("TX Power: %s dBm", rfm9x.tx_power)
+logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+logger.info("Coding Rate: %d", rfm9x.coding_rate)
+logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
 # Send message in a loop
 while True:
     data=bytes("Hello world","utf-8")
     rfm9x.send(data)
-    print("data sent")
+    logger.info("data sent")
     time.sleep(2)
\ No newline at end of file
@@ -1,30 +1,61 @@
 # Imports
+import os
+import sys
 import time
-import busio
-import board
-import adafruit_rfm9x
-from digitalio import DigitalInOut, Direction, Pull
-
-# Setup
-CS = DigitalInOut(board.CE1) # init CS pin for SPI
-RESET = DigitalInOut(board.D25) # init RESET pin for the RFM9x module
-spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO) # init SPI
-rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0) # init object for the radio
-
-# LoRa settings
-rfm9x.tx_power = 23 # TX power in dBm (23 dBm = 0.2 W)
-rfm9x.signal_bandwidth = 125000 # high bandwidth => high data rate and low range
-rfm9x.coding_rate = 5
-rfm9x.spreading_factor = 7
-rfm9x.enable_crc = True
-
-# Attenuator setting in dB (just to keep track of the experiment)
-attenuation = 13*20
-
-# Send message in a loop
-while True:
-    message = str(rfm9x.tx_power) + ',' + str(rfm9x.signal_bandwidth) + ',' + str(rfm9x.coding_rate) + ',' + str(rfm9x.spreading_factor) + ',' + str(attenuation) + ','
-    data = bytes(message, 'utf-8') + bytes([0x41] * 200)
-    rfm9x.send(data)
-    print("data sent")
-    time.sleep(1)
\ No newline at end of file
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from async_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def run(rfm9x,
+        tx_power=23,
+        bandwidth=125000,
+        coding_rate=5,
+        spreading_factor=7,
+        attenuation=13*20,
+        count=None,
+        interval=1.0):
+    """
+    Send fixed-size test packets tagged with the radio settings
+
+    Args:
+        rfm9x: RFM9x radio
+        tx_power (int): TX power in dBm (23 dBm = 0.2 W)
+        bandwidth (int): Bandwidth in Hz; high bandwidth => high data rate and low range
+        coding_rate (int): Coding rate (5-8)
+        spreading_factor (int): Spreading factor (7-12)
+        attenuation (int): Attenuator setting in dB (just to keep track of the experiment)
+        count (int): Number of packets to send (None to send forever)
+        interval (float): Seconds between packets
+    """
+    # Console output goes through a writer thread; per-packet lines are rate-limited
+    setup_logging(format='%(asctime)s - %(message)s')
+
+    # LoRa settings
+    rfm9x.tx_power = tx_power
+    rfm9x.signal_bandwidth = bandwidth
+    rfm9x.coding_rate = coding_rate
+    rfm9x.spreading_factor = spreading_factor
+    rfm9x.enable_crc = True
+
+    # Send message in a loop
+    sent = 0
+    while count is None or sent < count:
+        # The sequence number lets the receiver count lost packets
+        message = str(rfm9x.tx_power) + ',' + str(rfm9x.signal_bandwidth) + ',' + str(rfm9x.coding_rate) + ',' + str(rfm9x.spreading_factor) + ',' + str(attenuation) + ',' + str(sent) + ','
+        data = bytes(message, 'utf-8') + bytes([0x41] * 200)
+        rfm9x.send(data)
+        logger.info("Sent packet %d", sent)
+        sent += 1
+        time.sleep(interval)
+
+
+def main():
+    from lora_adr_manager import create_radio
+    run(create_radio(433.0))
+
+if __name__ == "__main__":
+    main()
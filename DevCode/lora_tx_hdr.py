@@ -1,16 +1,28 @@
 # Imports
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut, Direction, Pull
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from arq import ARQSender, MAX_PAYLOAD
+from airtime import time_on_air
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 coding_rate = [5, 6, 7, 8]
 signal_bandwidth = [125000, 250000, 500000]
 spreading_factor = [7, 8, 9, 10, 11, 12]
 num_packets = 100
-packet_size = 252
+packet_size = MAX_PAYLOAD  # 252 bytes minus the ARQ header
+window = 8  # Unacknowledged packets in flight (1 = stop-and-wait)
 data = os.urandom(packet_size)
 timing_data = []
 
@@ -27,17 +39,17 @@ rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0) # init object for the radio
 # rfm9x.spreading_factor = 8
 rfm9x.enable_crc = True
 
-print(f"TX Power: {rfm9x.tx_power} dBm")
-print(f"Signal Bandwidth: {rfm9x.signal_bandwidth} Hz")
-print(f"Coding Rate: {rfm9x.coding_rate}")
-print(f"Spreading Factor: {rfm9x.spreading_factor}")
+logger.info("TX Power: %s dBm", rfm9x.tx_power)
+logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+logger.info("Coding Rate: %d", rfm9x.coding_rate)
+logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
 packet = None
 packet = rfm9x.receive()
 while not packet:
-    print("no ack from receiver")
+    logger.info("no ack from receiver")
     packet = rfm9x.receive()
-print(str(packet, "utf-8"))
+logger.info("%s", str(packet, "utf-8"))
 
 for bw in signal_bandwidth:
     rfm9x.signal_bandwidth = bw
@@ -46,31 +58,28 @@ for bw in signal_bandwidth:
         for sf in spreading_factor:
             rfm9x.spreading_factor = sf
 
-            print(f"TX Power: {rfm9x.tx_power} dBm")
-            print(f"Signal Bandwidth: {rfm9x.signal_bandwidth} Hz")
-            print(f"Coding Rate: {rfm9x.coding_rate}")
-            print(f"Spreading Factor: {rfm9x.spreading_factor}")
+            logger.info("TX Power: %s dBm", rfm9x.tx_power)
+            logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+            logger.info("Coding Rate: %d", rfm9x.coding_rate)
+            logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
             packet = None
             packet = rfm9x.receive()
             while not packet:
-                print("no ack from receiver")
+                logger.info("no ack from receiver")
                 packet = rfm9x.receive()
-            print("Packet from rx: ", str(packet, "utf-8"))
+            logger.info("Packet from rx: %s", str(packet, "utf-8"))
             time.sleep(3)
 
-            for i in range(num_packets):
-                if i == 0:
-                    print("sending stuff...")
-                    time_start = time.perf_counter()
-
-                rfm9x.send_with_ack(data)
-                time.sleep(0.3) # Added sleep
-                # print("data sent")
-            time_end = time.perf_counter()
+            # Reliable transfer: windowed bursts, selective retransmission
+            logger.info("sending stuff...")
+            sender = ARQSender(rfm9x, window=window,
+                               initial_rto=2 * time_on_air(packet_size, sf, bw, cr) + 0.5)
+            result = sender.transfer([data] * num_packets)
             # Calculate elapsed time
-            elapsed_time = time_end - time_start
-            data_rate = packet_size * 8 * num_packets / elapsed_time
+            elapsed_time = result['elapsed_s']
+            data_rate = result['goodput_bps']
+            logger.info("Retransmissions: %d, timeouts: %d", result['retransmissions'], result['timeouts'])
 
             timing_data.append({
                 "tx_power": rfm9x.tx_power,
@@ -82,21 +91,21 @@ for bw in signal_bandwidth:
                 "data_rate": data_rate
             })
 
-            print(f"Elapsed time: {elapsed_time:.6f} seconds")
-            print(f"Data rate: {data_rate:.6f} bps")
+            logger.info("Elapsed time: %.6f seconds", elapsed_time)
+            logger.info("Data rate: %.6f bps", data_rate)
 
-            print("------waiting for receiver------")
+            logger.info("------waiting for receiver------")
             packet = None
             packet = rfm9x.receive()
             while not packet:
-                print("no ack from receiver")
+                logger.info("no ack from receiver")
                 packet = rfm9x.receive()
-            print("Packet from rx: ", str(packet, "utf-8"))
+            logger.info("Packet from rx: %s", str(packet, "utf-8"))
 
-            print("transmitter waiting for 10 seconds")
+            logger.info("transmitter waiting for 10 seconds")
             time.sleep(10)
 
-            print("--------sending to receiver-------")
+            logger.info("--------sending to receiver-------")
             packet_data = f"transmission ended"
             packet = bytes(packet_data, "utf-8")
             rfm9x.send_with_ack(packet)
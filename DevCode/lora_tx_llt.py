@@ -1,15 +1,28 @@
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from arq import ARQSender, MAX_PAYLOAD
+from airtime import time_on_air
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 coding_rate = [5, 6, 7, 8]
 signal_bandwidth = [125000, 250000, 500000]
 spreading_factor = [7, 8, 9, 10, 11, 12]
 num_packets = 100
-packet_size = 252
+packet_size = MAX_PAYLOAD  # 252 bytes minus the ARQ header
+window = 8  # Unacknowledged packets in flight (1 = stop-and-wait)
+switch_delay = 2.0  # Seconds before switching settings
 data = os.urandom(packet_size)  # Random data to send
 timing_data = []
 
@@ -20,10 +33,10 @@ spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)  # SPI bus
 rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, 433.0)  # LoRa module
 
 # LoRa settings
-print(f"TX Power: {rfm9x.tx_power} dBm")
-print(f"Signal Bandwidth: {rfm9x.signal_bandwidth} Hz")
-print(f"Coding Rate: {rfm9x.coding_rate}")
-print(f"Spreading Factor: {rfm9x.spreading_factor}")
+logger.info("TX Power: %s dBm", rfm9x.tx_power)
+logger.info("Signal Bandwidth: %d Hz", rfm9x.signal_bandwidth)
+logger.info("Coding Rate: %d", rfm9x.coding_rate)
+logger.info("Spreading Factor: %d", rfm9x.spreading_factor)
 
 # Transmitter loop
 for bw in signal_bandwidth:
@@ -38,35 +51,22 @@ for bw in signal_bandwidth:
             # print(f"Coding Rate: {rfm9x.coding_rate}")
             # print(f"Spreading Factor: {rfm9x.spreading_factor}")
 
-            print(f"TX Settings: p {rfm9x.tx_power} dBm, sb {rfm9x.signal_bandwidth} Hz, cr {rfm9x.coding_rate}, sf {rfm9x.spreading_factor}")
-
-
-            ack_received = False
-            start_time = time.perf_counter()
-            timeout = 10  # Timeout in seconds
-            packet_sent = False
+            logger.info("TX Settings: p %s dBm, sb %d Hz, cr %d, sf %d", rfm9x.tx_power,
+                        rfm9x.signal_bandwidth, rfm9x.coding_rate, rfm9x.spreading_factor)
 
-            while not packet_sent:
-                rfm9x.send_with_ack(data)  # Send the data with acknowledgment request
-                print("Packet sent, waiting for ACK...")
 
-                # Poll for ACK with timeout
-                while not ack_received:
-                    ack_packet = rfm9x.receive(timeout=0.1)  # Poll every 100ms
-                    if ack_packet:
-                        print("Received ACK from RX:", str(ack_packet, "utf-8"))
-                        ack_received = True
-                    elif time.perf_counter() - start_time > timeout:
-                        print("No ACK received within timeout period.")
-                        packet_sent = True  # Move to the next iteration or exit
-                        break
-                    else:
-                        pass  # Continue polling if no ACK yet
+            # Reliable transfer: windowed bursts, selective retransmission
+            sender = ARQSender(rfm9x, window=window,
+                               initial_rto=2 * time_on_air(packet_size, sf, bw, cr) + 0.5)
+            result = sender.transfer([data] * num_packets)
+            if not result['complete']:
+                logger.warning("Receiver stopped acknowledging, moving to next settings.")
 
-            # Calculate elapsed time and data rate
-            end_time = time.perf_counter()
-            elapsed_time = end_time - start_time
-            data_rate = packet_size * 8 * num_packets / elapsed_time
+            elapsed_time = result['elapsed_s']
+            data_rate = result['goodput_bps']
+            logger.info("Frames sent: %d, retransmissions: %d, timeouts: %d, SRTT: %.3f s",
+                        result['frames_sent'], result['retransmissions'], result['timeouts'],
+                        result['srtt_s'] or 0)
 
             timing_data.append({
                 "tx_power": rfm9x.tx_power,
@@ -74,10 +74,12 @@ for bw in signal_bandwidth:
                 "coding_rate": rfm9x.coding_rate,
                 "spreading_factor": rfm9x.spreading_factor,
                 "num_packets": num_packets,
+                "retransmissions": result['retransmissions'],
                 "elapsed_time": elapsed_time,
                 "data_rate": data_rate
             })
 
-            print(f"Elapsed time: {elapsed_time:.6f} seconds")
-            print(f"Data rate: {data_rate:.6f} bps")
-            print("-------Waiting for next packet-------")
+            logger.info("Elapsed time: %.6f seconds", elapsed_time)
+            logger.info("Data rate: %.6f bps", data_rate)
+            logger.info("-------Waiting for next packet-------")
+            time.sleep(switch_delay)  # Let the receiver finish lingering before switching
@@ -1,9 +1,18 @@
 import time
+import logging
 import busio
 import board
 import adafruit_rfm9x
 from digitalio import DigitalInOut
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from async_logging import setup_logging
+
+# Console output goes through a writer thread; per-packet lines are rate-limited
+setup_logging(format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # LoRa settings
 coding_rate = [5, 6, 7, 8]
@@ -37,28 +46,29 @@ for bw in signal_bandwidth:
         for sf in spreading_factor:
             rfm9x.spreading_factor = sf
 
-            print(f"TX Settings: Power {rfm9x.tx_power} dBm, Bandwidth {bw} Hz, Coding Rate {cr}, Spreading Factor {sf}")
+            logger.info("TX Settings: Power %s dBm, Bandwidth %d Hz, Coding Rate %d, Spreading Factor %d",
+                        rfm9x.tx_power, bw, cr, sf)
 
             # --- Synchronization Step ---
             rfm9x.send_with_ack("SYNC".encode())
-            print("Sync signal sent, waiting for receiver acknowledgment...")
+            logger.info("Sync signal sent, waiting for receiver acknowledgment...")
             ack = None
             while not ack:
                 ack = rfm9x.receive(timeout=10.0)
             if ack and ack.decode() == "READY":
-                print("Receiver ready, starting transmission.")
+                logger.info("Receiver ready, starting transmission.")
             else:
-                print("Receiver not ready, aborting!")
+                logger.info("Receiver not ready, aborting!")
                 continue
             # ---------------------------
 
             # Transmit packets
             for i in range(num_packets):
                 packet, timestamp = create_packet()
-                print(f"Sending packet {i+1}/{num_packets} with timestamp {timestamp}")
+                logger.info("Sending packet %d/%d with timestamp %d", i + 1, num_packets, timestamp)
                 rfm9x.send(packet)  # No ACK in this method to simplify timing
                 
                 time.sleep(10)  # Brief delay between packets
 
-            print("Finished sending packets for this configuration.")
+            logger.info("Finished sending packets for this configuration.")
             time.sleep(2)  # Delay before switching settings
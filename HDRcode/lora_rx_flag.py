@@ -1,10 +1,17 @@
 # RX Code
+import os
+import sys
 import time
-import busio
-import board
-import adafruit_rfm9x
-from digitalio import DigitalInOut
 import csv
+import logging
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from radio_config import RadioConfigurator
+from sweep_plan import BEACON_PREFIX, SweepPlan, wait_until
+from async_logging import flush_logging, setup_logging
+
+logger = logging.getLogger(__name__)
 
 # Parameters
 num_packets = 100
@@ -12,6 +19,14 @@ frequency = 433.0  # MHz
 max_loops = 80  # Maximum number of settings loops to process
 output_file = 'rf_results.csv'
 
+# Settings combinations (must match the transmitter's; the plan hash is checked)
+bandwidths = [125000, 250000, 500000]  # Hz
+coding_rates = [5, 6, 7, 8]
+spreading_factors = [7, 8] #, 9, 10, 11, 12]
+
+# Results CSV columns; per_model fits PER curves from the packet counts and mean SNR
+fieldnames = ['Loop', 'Bandwidth (Hz)', 'Coding Rate', 'Spreading Factor', 'Dropped Packets', 'Received Packets', 'Elapsed Time (s)', 'Data Rate (kbps)', 'Mean SNR (dB)']
+
 # Function to print the results in a table
 def print_results_table(output_file):
     print("\nSummary of all loops:")
@@ -21,94 +36,115 @@ def print_results_table(output_file):
         for row in reader:
             print(f"{row['Loop']:<5}{row['Bandwidth (Hz)']:<15}{row['Coding Rate']:<12}{row['Spreading Factor']:<16}{row['Dropped Packets']:<15}{row['Received Packets']:<17}{row['Elapsed Time (s)']:<20}{row['Data Rate (kbps)']:<15}")
 
+def run(rfm9x,
+        bandwidths: List[int] = bandwidths,
+        coding_rates: List[int] = coding_rates,
+        spreading_factors: List[int] = spreading_factors,
+        num_packets: int = num_packets,
+        max_loops: int = max_loops,
+        output_file: str = output_file):
+    """
+    Follow the transmitter's settings sweep and log per-combination results
+
+    Both ends build the same SweepPlan; after the start beacon the receiver
+    switches settings on the plan's slots.
+
+    Args:
+        rfm9x: RFM9x radio
+        bandwidths (list): Bandwidths in Hz
+        coding_rates (list): Coding rates (5-8)
+        spreading_factors (list): Spreading factors (7-12)
+        num_packets (int): Data packets expected per combination
+        max_loops (int): Maximum number of plan entries to process
+        output_file (str): CSV file for the results
+    """
+    # Console output goes through a writer thread; per-packet lines are rate-limited
+    setup_logging(format='%(asctime)s - HDR RX - %(message)s')
+    radio_config = RadioConfigurator(rfm9x)
+    radio_config.sync_from_radio()
+
+    # Open the results CSV file to write results header
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+
+    plan = SweepPlan(bandwidths, coding_rates, spreading_factors, num_packets)
+    logger.info("Sweep plan %s: %d settings, %.1f s", plan.plan_hash, len(plan.entries), plan.duration)
+
+    # Wait for the start beacon on the first entry's settings
+    bw, cr, sf = plan.entries[0]
+    radio_config.apply(signal_bandwidth=bw, coding_rate=cr, spreading_factor=sf)
+    logger.info("Waiting for start beacon from transmitter...")
+    sweep_start = None
+    while sweep_start is None:
+        beacon = rfm9x.receive(timeout=15.0)
+        if not beacon:
+            logger.info("No start beacon received within timeout. Retrying...")
+            continue
+        sweep_start = plan.parse_beacon(beacon)
+        if sweep_start is None and beacon.startswith(BEACON_PREFIX.encode("utf-8")):
+            logger.info("Beacon for a different sweep plan ignored: %s", beacon.decode('utf-8', 'replace'))
+    logger.info("Sweep starts in %.2f s", sweep_start - time.time())
+
+    for loops_completed, (bw, cr, sf) in enumerate(plan.entries[:max_loops]):
+        first_send, last_send = plan.slot_window(loops_completed)
+        slot_end = sweep_start + last_send + plan.guard
+        wait_until(sweep_start + plan.slot_starts[loops_completed])
+        radio_config.apply(signal_bandwidth=bw, coding_rate=cr, spreading_factor=sf)
+        logger.info("RX Settings: Power %s dBm, Bandwidth %d Hz, Coding Rate %d, Spreading Factor %d",
+                    rfm9x.tx_power, bw, cr, sf)
+
+        # Receive data packets until the slot ends
+        received_packets = 0
+        received_bytes = 0
+        snr_sum = 0.0
+        start_time = sweep_start + first_send
+        while received_packets < num_packets:
+            remaining = slot_end - time.time()
+            if remaining <= 0:
+                break
+            packet = rfm9x.receive(timeout=remaining)
+            if packet and packet.startswith(b"Packet"):
+                received_packets += 1
+                received_bytes += len(packet)
+                snr_sum += rfm9x.last_snr
+                logger.info("Received packet %d/%d: %s", received_packets, num_packets,
+                            packet.decode('utf-8', 'replace'))
+        dropped_packets = num_packets - received_packets
+
+        end_time = min(time.time(), slot_end)
+        elapsed_time = end_time - start_time
+        data_rate = (received_bytes * 8) / elapsed_time / 1000 if received_packets > 0 else 0
+
+        # Store results in the CSV file
+        with open(output_file, 'a', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writerow({
+                'Loop': loops_completed + 1,
+                'Bandwidth (Hz)': bw,
+                'Coding Rate': cr,
+                'Spreading Factor': sf,
+                'Dropped Packets': dropped_packets,
+                'Received Packets': received_packets,
+                'Elapsed Time (s)': f"{elapsed_time:.2f}",
+                'Data Rate (kbps)':f"{data_rate:.2f}",
+                'Mean SNR (dB)': f"{snr_sum / received_packets:.2f}" if received_packets else "",
+            })
+
+        logger.info("Completed loop with settings: BW=%d, CR=%d, SF=%d", bw, cr, sf)
+        logger.info("Total packets dropped: %d/%d", dropped_packets, num_packets)
+        logger.info("Elapsed time: %.2f seconds", elapsed_time)
+        logger.info("Data rate: %.2f kbps", data_rate)
+
+    # Print a table of all results, after the queued log lines
+    flush_logging()
+    print_results_table(output_file)
+    print("Sweep plan completed. Exiting...")
+
+
+def main():
+    from lora_adr_manager import create_radio
+    run(create_radio(frequency))
 
-# Setup
-CS = DigitalInOut(board.CE1)
-RESET = DigitalInOut(board.D25)
-spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, frequency)
-
-# Open the results CSV file to write results header
-with open(output_file, 'w', newline='') as csvfile:
-    fieldnames = ['Loop', 'Bandwidth (Hz)', 'Coding Rate', 'Spreading Factor', 'Dropped Packets', 'Received Packets', 'Elapsed Time (s)', 'Data Rate (kbps)']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-loops_completed = 0
-
-while loops_completed < max_loops:
-    print("Waiting for sync signal from transmitter...")
-    sync_packet = None
-    while not sync_packet:
-        sync_packet = rfm9x.receive(timeout=15.0)
-        if sync_packet:
-            try:
-                sync_content = sync_packet.decode("utf-8")
-                if sync_content.startswith("SYNC"):
-                    _, bw, cr, sf = sync_content.split("|")
-                    rfm9x.signal_bandwidth = int(bw)
-                    rfm9x.coding_rate = int(cr)
-                    rfm9x.spreading_factor = int(sf)
-                    print(f"RX Settings: Power {rfm9x.tx_power} dBm, Bandwidth {bw} Hz, Coding Rate {cr}, Spreading Factor {sf}")
-
-                    # Send acknowledgment to TX
-                    ack_packet = "READY".encode("utf-8")
-                    rfm9x.send(ack_packet)
-                    print("Acknowledgment sent to transmitter.")
-                    break
-                elif sync_content == "TERMINATE":
-                    print("Termination signal received. Exiting...")
-                    print_results_table(output_file)
-                    exit(0)
-            except Exception as e:
-                print(f"Failed to process sync packet: {e}")
-        else:
-            print("No sync signal received within timeout. Retrying...")
-
-    # Receive data packets
-    print("Waiting for data packets...")
-    dropped_packets = 0
-    received_packets = 0
-    start_time = time.time()
-    for i in range(num_packets):
-        packet = rfm9x.receive(timeout=5.0)
-        if not packet:
-            print(f"No packet received for {i+1}/{num_packets}.")
-            dropped_packets += 1
-        else:
-            received_packets += 1
-            print(f"Received packet {i+1}/{num_packets}: {packet.decode('utf-8')}")
-
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    data_rate = (received_packets * len(packet.decode('utf-8')) * 8) / elapsed_time / 1000 if received_packets > 0 else 0
-
-    # Store results in the CSV file
-    with open(output_file, 'a', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=['Loop', 'Bandwidth (Hz)', 'Coding Rate', 'Spreading Factor', 'Dropped Packets', 'Received Packets', 'Elapsed Time (s)', 'Data Rate (kbps)'])
-        writer.writerow({
-            'Loop': loops_completed + 1,
-            'Bandwidth (Hz)': bw,
-            'Coding Rate': cr,
-            'Spreading Factor': sf,
-            'Dropped Packets': dropped_packets,
-            'Received Packets': received_packets,
-            'Elapsed Time (s)': f"{elapsed_time:.2f}",
-            'Data Rate (kbps)':f"{data_rate:.2f}",
-        })
-
-    print(f"Completed loop with settings: BW={bw}, CR={cr}, SF={sf}")
-    print(f"Total packets dropped: {dropped_packets}/{num_packets}")
-    print(f"Elapsed time: {elapsed_time:.2f} seconds")
-    print(f"Data rate: {data_rate:.2f} kbps\n")
-    loops_completed += 1
-
-# Print a table of all results
-print("\nSummary of all loops:")
-print(f"{'Loop':<5}{'Bandwidth (Hz)':<15}{'Coding Rate':<12}{'Spreading Factor':<16}{'Dropped Packets':<15}{'Received Packets':<17}{'Elapsed Time (s):<20'}{'Data Rate (kbps)':<15}")
-with open(output_file, 'r') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in header:
-        print(f"{row['Loop']:<5}{row['Bandwidth (Hz)']:<15}{row['Coding Rate']:<12}{row['Spreading Factor']:<16}{row['Dropped Packets']:<15}{row['Received Packets']:<17}{row['Elapsed Time (s)']:<20}{row['Data Rate (kbps)']:<15}")
-
-print("Maximum number of settings loops reached. Exiting...")
+if __name__ == "__main__":
+    main()
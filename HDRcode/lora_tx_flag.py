@@ -1,93 +1,116 @@
 # TX Code
+import os
+import sys
 import time
-import busio
-import board
-import adafruit_rfm9x
-from digitalio import DigitalInOut
+import logging
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from radio_config import RadioConfigurator
+from channel_access import ListenBeforeTalk
+from sweep_plan import SweepPlan, wait_until
+from async_logging import setup_logging
+
+logger = logging.getLogger(__name__)
 
 # Parameters
 num_packets = 100
 frequency = 433.0  # MHz
 tx_power = 13  # Transmission power
+listen_before_talk = None  # 'cad' or 'rssi' to sense the channel before each data packet
 
 # Settings combinations
 bandwidths = [125000, 250000, 500000]  # Hz
 coding_rates = [5, 6, 7, 8]
 spreading_factors = [7, 8] #, 9, 10, 11, 12]
 
-# Setup
-CS = DigitalInOut(board.CE1)
-RESET = DigitalInOut(board.D25)
-spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, frequency)
-rfm9x.tx_power = tx_power
-
-old_bw = []
-old_cr = []
-old_sf = []
-
-for bw in bandwidths:
-    for cr in coding_rates:
-        for sf in spreading_factors:
-            old_bw = rfm9x.signal_bandwidth
-            old_cr = rfm9x.coding_rate
-            old_sf = rfm9x.spreading_factor
-            # rfm9x.signal_bandwidth = bw
-            # rfm9x.coding_rate = cr
-            # rfm9x.spreading_factor = sf
-
-            print(f"TX Settings: Power {rfm9x.tx_power} dBm, Bandwidth {bw} Hz, Coding Rate {cr}, Spreading Factor {sf}")
-
-            # Sync with RX
-            sync_packet = f"SYNC|{bw}|{cr}|{sf}".encode("utf-8")
-            rfm9x.send(sync_packet)
-            print("Sync packet sent, waiting for receiver acknowledgment...")
-
-            rfm9x.signal_bandwidth = bw
-            rfm9x.coding_rate = cr
-            rfm9x.spreading_factor = sf
-
-            ack_received = False
-            for _ in range(5):  # Retry acknowledgment
-                ack = rfm9x.receive(timeout=2.0)
-                if ack and ack.decode("utf-8") == "READY":
-                    print("Receiver ready, starting transmission.")
-                    ack_received = True
-                    break
-                else:
-                    print("No acknowledgment from receiver. Retrying sync...")
-                    time.sleep(0.5)
-                    rfm9x.signal_bandwidth = old_bw
-                    rfm9x.coding_rate = old_cr
-                    rfm9x.spreading_factor
-                    rfm9x.send(sync_packet)
-                    rfm9x.signal_bandwidth = bw
-                    rfm9x.coding_rate = cr
-                    rfm9x.spreading_factor = sf
-
-            if not ack_received:
-                print("No acknowledgment from receiver. Moving to next settings.")
-                continue
-
-            # Transmit data packets
-            start_time = time.time()
-            for i in range(num_packets):
-                packet = f"Packet {i+1}/{num_packets}|TS:{int(time.time() * 1000)}".encode("utf-8")
-                rfm9x.send(packet)
-                print(f"Sent packet {i+1}/{num_packets} with timestamp {int(time.time() * 1000)}")
-                time.sleep(0.01)  # Adjust delay if needed
-
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-            data_rate = (num_packets * len(packet)) / elapsed_time
-
-            print(f"Completed loop with settings: BW={bw}, CR={cr}, SF={sf}")
-            print(f"Elapsed time: {elapsed_time:.2f} seconds")
-            print(f"Data rate: {data_rate:.2f} bytes/sec\n")
-
-# Notify RX to terminate
-terminate_signal = "TERMINATE".encode("utf-8")
-for _ in range(3):
-    rfm9x.send(terminate_signal)
-    print("Sent termination signal to receiver.")
-    time.sleep(1)
\ No newline at end of file
+
+def run(rfm9x,
+        bandwidths: List[int] = bandwidths,
+        coding_rates: List[int] = coding_rates,
+        spreading_factors: List[int] = spreading_factors,
+        num_packets: int = num_packets,
+        tx_power: int = tx_power,
+        listen_before_talk: Optional[str] = listen_before_talk):
+    """
+    Sweep all settings combinations on the slots of a shared SweepPlan
+
+    Args:
+        rfm9x: RFM9x radio
+        bandwidths (list): Bandwidths in Hz
+        coding_rates (list): Coding rates (5-8)
+        spreading_factors (list): Spreading factors (7-12)
+        num_packets (int): Data packets per combination
+        tx_power (int): Transmission power in dBm
+        listen_before_talk (str): 'cad' or 'rssi' to sense the channel before each data packet
+    """
+    # Console output goes through a writer thread; per-packet lines are rate-limited
+    setup_logging(format='%(asctime)s - HDR TX - %(message)s')
+    radio_config = RadioConfigurator(rfm9x)
+    radio_config.sync_from_radio()
+    radio_config.apply(tx_power=tx_power)
+    lbt = ListenBeforeTalk(rfm9x, method=listen_before_talk) if listen_before_talk else None
+
+    plan = SweepPlan(bandwidths, coding_rates, spreading_factors, num_packets)
+    logger.info("Sweep plan %s: %d settings, %.1f s", plan.plan_hash, len(plan.entries), plan.duration)
+
+    # Announce the start on the first entry's settings; from then on both
+    # ends follow the plan's clock without further handshakes
+    bw, cr, sf = plan.entries[0]
+    radio_config.apply(signal_bandwidth=bw, coding_rate=cr, spreading_factor=sf)
+    sweep_start = time.time() + plan.lead_time()
+    for _ in range(plan.beacon_repeats):
+        rfm9x.send(plan.beacon(sweep_start))
+        time.sleep(plan.beacon_interval)
+    logger.info("Start beacons sent.")
+
+    for index, (bw, cr, sf) in enumerate(plan.entries):
+        first_send, last_send = plan.slot_window(index)
+        wait_until(sweep_start + plan.slot_starts[index])
+        radio_config.apply(signal_bandwidth=bw, coding_rate=cr, spreading_factor=sf)
+        logger.info("TX Settings: Power %s dBm, Bandwidth %d Hz, Coding Rate %d, Spreading Factor %d",
+                    rfm9x.tx_power, bw, cr, sf)
+        wait_until(sweep_start + first_send)
+
+        # Transmit data packets, paced to the plan and never past the slot
+        start_time = time.time()
+        period = plan.packet_period(bw, cr, sf)
+        slot_end = sweep_start + last_send
+        sent = 0
+        sent_bytes = 0
+        for i in range(num_packets):
+            # Channel backoff must not push a send past the slot either
+            if time.time() > slot_end or (lbt and lbt.acquire(budget=slot_end - time.time()) is None):
+                logger.info("Slot ended after %d/%d packets.", sent, num_packets)
+                break
+            packet = f"Packet {i+1}/{num_packets}|TS:{int(time.time() * 1000)}".encode("utf-8")
+            rfm9x.send(packet)
+            sent += 1
+            sent_bytes += len(packet)
+            logger.info("Sent packet %d/%d with timestamp %d", i + 1, num_packets, int(time.time() * 1000))
+            wait_until(start_time + (i + 1) * period)
+
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        data_rate = sent_bytes / elapsed_time
+
+        logger.info("Completed loop with settings: BW=%d, CR=%d, SF=%d", bw, cr, sf)
+        logger.info("Elapsed time: %.2f seconds", elapsed_time)
+        logger.info("Data rate: %.2f bytes/sec", data_rate)
+
+    reconfig = radio_config.stats()
+    logger.info("Radio reconfigurations: %d, skipped writes: %d, mean latency: %.2f ms",
+                reconfig['reconfigurations'], reconfig['skipped_writes'],
+                reconfig['latency_mean_s'] * 1000)
+    if lbt:
+        access = lbt.stats()
+        logger.info("Channel access: %d deferrals, %d forced sends, %d sends dropped at slot end",
+                    access['deferrals'], access['forced'], access['expired'])
+
+
+def main():
+    from lora_adr_manager import create_radio
+    run(create_radio(frequency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# sweep_plan.py - Deterministic time-slotted settings sweep shared by the HDR transmitter and receiver
+import os
+import sys
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'ADRcode'))
+from airtime import time_on_air
+
+BEACON_PREFIX = "START"
+
+# Upper bound on the data packet "Packet 100/100|TS:<13-digit ms>"
+DEFAULT_PAYLOAD_LEN = 32
+
+
+class SweepPlan:
+    def __init__(self,
+                 bandwidths: List[int],
+                 coding_rates: List[int],
+                 spreading_factors: List[int],
+                 num_packets: int = 100,
+                 payload_len: int = DEFAULT_PAYLOAD_LEN,
+                 packet_gap: float = 0.05,
+                 guard: float = 0.2,
+                 beacon_repeats: int = 5,
+                 beacon_interval: float = 0.5):
+        """
+        Settings sweep in which both ends switch settings at agreed times
+
+        Entries are visited in the same bandwidth/coding rate/spreading
+        factor order as the original nested loops. Each entry gets a slot
+        long enough for num_packets packets at that entry's airtime plus
+        a guard at both ends, which absorbs reconfiguration time and clock
+        drift. The transmitter announces the start once with a short burst
+        of beacons on the first entry's settings; after that neither side
+        sends anything but data.
+
+        Args:
+            bandwidths (list): Bandwidths in Hz
+            coding_rates (list): Coding rates (5-8)
+            spreading_factors (list): Spreading factors (7-12)
+            num_packets (int): Data packets per entry
+            payload_len (int): Largest data payload in bytes
+            packet_gap (float): Time budgeted per packet on top of its airtime (send overhead and pacing)
+            guard (float): Idle time at the start and end of every slot in seconds
+            beacon_repeats (int): Number of start beacons
+            beacon_interval (float): Seconds between start beacons
+        """
+        self.bandwidths = list(bandwidths)
+        self.coding_rates = list(coding_rates)
+        self.spreading_factors = list(spreading_factors)
+        self.num_packets = num_packets
+        self.payload_len = payload_len
+        self.packet_gap = packet_gap
+        self.guard = guard
+        self.beacon_repeats = beacon_repeats
+        self.beacon_interval = beacon_interval
+
+        self.entries: List[Tuple[int, int, int]] = [
+            (bw, cr, sf)
+            for bw in self.bandwidths
+            for cr in self.coding_rates
+            for sf in self.spreading_factors
+        ]
+        self.slot_starts: List[float] = []
+        offset = 0.0
+        for bw, cr, sf in self.entries:
+            self.slot_starts.append(offset)
+            offset += self.slot_duration(bw, cr, sf)
+        self.duration = offset
+        self.plan_hash = hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:8]
+
+    def to_dict(self) -> Dict:
+        return {
+            'bandwidths': self.bandwidths,
+            'coding_rates': self.coding_rates,
+            'spreading_factors': self.spreading_factors,
+            'num_packets': self.num_packets,
+            'payload_len': self.payload_len,
+            'packet_gap': self.packet_gap,
+            'guard': self.guard,
+            'beacon_repeats': self.beacon_repeats,
+            'beacon_interval': self.beacon_interval,
+        }
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "SweepPlan":
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def packet_period(self, bw: int, cr: int, sf: int) -> float:
+        return time_on_air(self.payload_len, sf, bw, cr) + self.packet_gap
+
+    def slot_duration(self, bw: int, cr: int, sf: int) -> float:
+        return 2 * self.guard + self.num_packets * self.packet_period(bw, cr, sf)
+
+    def slot_window(self, index: int) -> Tuple[float, float]:
+        """
+        Send window of an entry relative to the sweep start
+
+        Args:
+            index (int): Entry index
+
+        Returns:
+            Tuple of (first send time, last send time) in seconds
+        """
+        start = self.slot_starts[index]
+        return start + self.guard, start + self.slot_duration(*self.entries[index]) - self.guard
+
+    def lead_time(self) -> float:
+        """
+        Delay between the first beacon and the sweep start
+        """
+        return self.beacon_repeats * self.beacon_interval + self.guard
+
+    def beacon(self, start: float, now: Optional[float] = None) -> bytes:
+        """
+        Start beacon carrying the plan hash and the time left until the start
+
+        Args:
+            start (float): Sweep start on the sender's clock (time.time())
+            now (float): Current time (default: time.time())
+
+        Returns:
+            Encoded beacon
+        """
+        now = time.time() if now is None else now
+        remaining_ms = max(0, int((start - now) * 1000))
+        return f"{BEACON_PREFIX}|{self.plan_hash}|{remaining_ms}".encode("utf-8")
+
+    def parse_beacon(self, packet: bytes, received_at: Optional[float] = None) -> Optional[float]:
+        """
+        Sweep start on the local clock from a received beacon
+
+        The beacon is timestamped before it goes on air and received after
+        its last symbol, so its airtime on the first entry's settings is
+        taken off the announced delay.
+
+        Args:
+            packet (bytes): Received packet
+            received_at (float): Local receive time (default: time.time())
+
+        Returns:
+            Local start time, or None if the packet is not a beacon for this plan
+        """
+        try:
+            prefix, plan_hash, remaining_ms = packet.decode("utf-8").split("|")
+            remaining = int(remaining_ms) / 1000
+        except (UnicodeDecodeError, ValueError):
+            return None
+        if prefix != BEACON_PREFIX or plan_hash != self.plan_hash:
+            return None
+        received_at = time.time() if received_at is None else received_at
+        bw, cr, sf = self.entries[0]
+        return received_at + remaining - time_on_air(len(packet), sf, bw, cr)
+
+
+def wait_until(deadline: float, sleep=time.sleep):
+    remaining = deadline - time.time()
+    if remaining > 0:
+        sleep(remaining)
@@ -1,5 +1,3 @@
-import pandas as pd
-
 def lora_datarate(bandwidth, spreading_factor, coding_rate):
     """
     Calculates the LoRa bitrate.
@@ -21,25 +19,55 @@ bw_list = [125000, 250000, 500000]  # Bandwidth in Hz
 sf_list = [7, 8, 9, 10, 11, 12]    # Spreading Factor
 cr_list = [5, 6, 7, 8]             # Coding Rate (4/5, 4/6, 4/7, 4/8)
 
-# Store the results
-results = []
 
-pd.set_option('display.max_rows', None)
+def datarate_table(bw_list=bw_list, sf_list=sf_list, cr_list=cr_list):
+    """
+    Theoretical data rate of every combination of BW, SF, and CR
+
+    Returns:
+    - List of dictionaries, one per combination
+    """
+    # Store the results
+    results = []
+
+    # Loop over all combinations of BW, SF, and CR
+    for bw in bw_list:
+        for sf in sf_list:
+            for cr in cr_list:
+                data_rate = lora_datarate(bw, sf, cr)  # Calculate data rate in kbps
+                results.append({
+                    "Bandwidth (Hz)": bw,
+                    "Spreading Factor": sf,
+                    "Coding Rate (4/x)": cr,
+                    "Theoretical Data Rate (kbps)": round(data_rate, 3)
+                })
+    return results
+
+
+def print_table(results, use_pandas=False):
+    """
+    Print the results of datarate_table
+
+    Parameters:
+    - results: Rows from datarate_table
+    - use_pandas: Print through a pandas DataFrame (imports pandas)
+    """
+    if use_pandas:
+        import pandas as pd
+
+        pd.set_option('display.max_rows', None)
+        # Convert the results to a DataFrame for better visualization
+        print(pd.DataFrame(results))
+        return
+
+    columns = list(results[0]) if results else []
+    print("".join(f"{c:>30}" for c in columns))
+    for row in results:
+        print("".join(f"{row[c]:>30}" for c in columns))
 
-# Loop over all combinations of BW, SF, and CR
-for bw in bw_list:
-    for sf in sf_list:
-        for cr in cr_list:
-            data_rate = lora_datarate(bw, sf, cr)  # Calculate data rate in kbps
-            results.append({
-                "Bandwidth (Hz)": bw,
-                "Spreading Factor": sf,
-                "Coding Rate (4/x)": cr,
-                "Theoretical Data Rate (kbps)": round(data_rate, 3)
-            })
 
-# Convert the results to a DataFrame for better visualization
-df = pd.DataFrame(results)
+def main():
+    print_table(datarate_table())
 
-# Print the table
-print(df)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# lora_cli.py - Single entry point for the HDR, ADR and characterization scripts
+#
+# Usage: python lora_cli.py [--config lora.ini] <command>
+#
+# Settings come from an INI file (see lora.ini). Each command imports only the
+# modules it needs, so radio drivers, numpy and pandas are never loaded for
+# commands that do not use them.
+import os
+import sys
+import argparse
+import configparser
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+for _folder in ('ADRcode', 'HDRcode', 'DevCode'):
+    sys.path.insert(0, os.path.join(ROOT, _folder))
+
+DEFAULT_CONFIG = 'lora.ini'
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.replace(',', ' ').split()]
+
+
+def optional(value: Optional[str]) -> Optional[str]:
+    return value if value and value.lower() != 'none' else None
+
+
+def load_config(path: str) -> configparser.ConfigParser:
+    """
+    Read the config file; missing sections and keys fall back to the script defaults
+
+    Args:
+        path (str): INI file path (a missing file gives an empty config)
+
+    Returns:
+        ConfigParser with at least the sections used by the commands
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    for section in ('radio', 'sweep', 'adr', 'characterize', 'datarate'):
+        if not config.has_section(section):
+            config.add_section(section)
+    return config
+
+
+def make_radio(config: configparser.ConfigParser):
+    from lora_adr_manager import create_radio
+
+    radio = config['radio']
+    return create_radio(radio.getfloat('frequency', 433.0),
+                        cs_pin=radio.get('cs_pin', 'CE1'),
+                        reset_pin=radio.get('reset_pin', 'D25'))
+
+
+def sweep_tx(config: configparser.ConfigParser):
+    import lora_tx_flag
+
+    sweep = config['sweep']
+    lora_tx_flag.run(
+        make_radio(config),
+        bandwidths=int_list(sweep.get('bandwidths', '125000 250000 500000')),
+        coding_rates=int_list(sweep.get('coding_rates', '5 6 7 8')),
+        spreading_factors=int_list(sweep.get('spreading_factors', '7 8')),
+        num_packets=sweep.getint('num_packets', lora_tx_flag.num_packets),
+        tx_power=sweep.getint('tx_power', lora_tx_flag.tx_power),
+        listen_before_talk=optional(sweep.get('listen_before_talk')),
+    )
+
+
+def sweep_rx(config: configparser.ConfigParser):
+    import lora_rx_flag
+
+    sweep = config['sweep']
+    lora_rx_flag.run(
+        make_radio(config),
+        bandwidths=int_list(sweep.get('bandwidths', '125000 250000 500000')),
+        coding_rates=int_list(sweep.get('coding_rates', '5 6 7 8')),
+        spreading_factors=int_list(sweep.get('spreading_factors', '7 8')),
+        num_packets=sweep.getint('num_packets', lora_rx_flag.num_packets),
+        max_loops=sweep.getint('max_loops', lora_rx_flag.max_loops),
+        output_file=sweep.get('output_file', lora_rx_flag.output_file),
+    )
+
+
+def adr_tx(config: configparser.ConfigParser):
+    from lora_adr_tx import LoRaTransmitter
+
+    adr = config['adr']
+    fec_group = adr.getint('fec_group', 0)
+    transmitter = LoRaTransmitter(
+        frequency=config['radio'].getfloat('frequency', 433.0),
+        initial_sf=adr.getint('initial_sf', 7),
+        initial_cr=adr.getint('initial_cr', 5),
+        initial_bw=adr.getint('initial_bw', 125000),
+        initial_tx_power=adr.getint('initial_tx_power', 13),
+        mission_duration=adr.getfloat('mission_duration', 3600.0),
+        duty_cycle=adr.getfloat('duty_cycle', 0.1),
+        fec_group=fec_group or None,
+        listen_before_talk=optional(adr.get('listen_before_talk')),
+        radio=make_radio(config),
+        link_index_file=optional(adr.get('link_index_file')),
+        state_file=optional(adr.get('state_file')),
+        objective=adr.get('objective', 'margin'),
+        per_model_file=optional(adr.get('per_model_file')),
+    )
+    transmitter.run_mission(num_packets=adr.getint('num_packets', 1000))
+
+
+def adr_rx(config: configparser.ConfigParser):
+    from lora_adr_rx import LoRaReceiver
+
+    adr = config['adr']
+    receiver = LoRaReceiver(
+        frequency=config['radio'].getfloat('frequency', 433.0),
+        initial_sf=adr.getint('initial_sf', 7),
+        initial_cr=adr.getint('initial_cr', 5),
+        initial_bw=adr.getint('initial_bw', 125000),
+        output_file=adr.get('output_file', 'adr_results.csv'),
+        radio=make_radio(config),
+        state_file=optional(adr.get('state_file')),
+        objective=adr.get('objective', 'margin'),
+        per_model_file=optional(adr.get('per_model_file')),
+    )
+    receiver.run_mission(timeout=adr.getfloat('mission_duration', 3600.0))
+
+
+def characterize(config: configparser.ConfigParser):
+    char = config['characterize']
+    role = char.get('role', 'rx')
+    if role == 'tx':
+        import lora_tx_characterization
+
+        count = char.getint('count', 0)
+        lora_tx_characterization.run(
+            make_radio(config),
+            tx_power=char.getint('tx_power', 23),
+            bandwidth=char.getint('bandwidth', 125000),
+            coding_rate=char.getint('coding_rate', 5),
+            spreading_factor=char.getint('spreading_factor', 7),
+            attenuation=char.getint('attenuation', 260),
+            count=count or None,
+            interval=char.getfloat('interval', 1.0),
+        )
+    elif role == 'rx':
+        import lora_rx_characterization
+
+        lora_rx_characterization.run(
+            make_radio(config),
+            num_packets=char.getint('num_packets', 100),
+            output_dir=char.get('output_dir', 'test_data'),
+        )
+    else:
+        raise ValueError(f"Unknown characterize role '{role}' (expected 'tx' or 'rx')")
+
+
+def datarate(config: configparser.ConfigParser):
+    import calc_datarate
+
+    table = config['datarate']
+    results = calc_datarate.datarate_table(
+        int_list(table.get('bandwidths', '125000 250000 500000')),
+        int_list(table.get('spreading_factors', '7 8 9 10 11 12')),
+        int_list(table.get('coding_rates', '5 6 7 8')),
+    )
+    calc_datarate.print_table(results, use_pandas=table.getboolean('pandas', False))
+
+
+COMMANDS = {
+    'sweep-tx': (sweep_tx, "HDR settings sweep, transmitter side"),
+    'sweep-rx': (sweep_rx, "HDR settings sweep, receiver side"),
+    'adr-tx': (adr_tx, "Adaptive data rate mission, transmitter side"),
+    'adr-rx': (adr_rx, "Adaptive data rate mission, receiver side"),
+    'characterize': (characterize, "RSSI/SNR characterization (role=tx or rx)"),
+    'datarate': (datarate, "Print theoretical data rates"),
+}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="LoRa HDR/ADR test tools")
+    parser.add_argument('--config', default=DEFAULT_CONFIG,
+                        help=f"INI settings file (default: {DEFAULT_CONFIG})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+
+    args = parser.parse_args(argv)
+    COMMANDS[args.command][0](load_config(args.config))
+
+if __name__ == "__main__":
+    main()